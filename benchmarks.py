@@ -0,0 +1,457 @@
+#!/usr/bin/env python
+# Tweepy
+# Copyright 2009-2010 Joshua Roesslein
+# See LICENSE for details.
+
+"""Micro benchmarks of client side overhead.
+
+Nothing here touches the network. Run all benchmarks with:
+
+    python benchmarks.py
+
+or only some of them by name:
+
+    python benchmarks.py bind
+"""
+
+import sys
+import re
+import time
+import timeit
+import locale
+import urllib
+from datetime import datetime
+
+from tweepy import API, BasicAuthHandler, IdentityMap, ColumnSet, utils, jsonlib, models
+from tweepy.identity import activate_identity_map
+from tweepy.models import Model, ModelFactory, CompactModelFactory, \
+        LazyModelFactory
+from tweepy.error import TweepError
+from tweepy.retry import RetryPolicy
+from tweepy.compression import ACCEPT_ENCODING
+from tweepy.utils import import_simplejson, convert_to_utf8_str
+
+json = import_simplejson()
+
+# A status as returned by statuses/home_timeline
+STATUS_JSON = '''{
+    "coordinates": null, "favorited": false, "truncated": false,
+    "created_at": "Wed Aug 25 18:27:03 +0000 2010", "id_str": "22092328373",
+    "in_reply_to_user_id_str": null, "contributors": null,
+    "text": "Tweepy 1.6 released, see the changelog for details",
+    "retweet_count": null, "in_reply_to_status_id_str": null,
+    "id": 22092328373, "retweeted": false, "in_reply_to_user_id": null,
+    "source": "<a href=\\"http://github.com/joshthecoder/tweepy\\" rel=\\"nofollow\\">tweepy</a>",
+    "place": null, "in_reply_to_screen_name": null, "geo": null,
+    "in_reply_to_status_id": null,
+    "user": {
+        "profile_use_background_image": true, "following": null,
+        "followers_count": 1012, "profile_sidebar_border_color": "C0DEED",
+        "description": "A python library for the Twitter API",
+        "time_zone": "Central Time (US & Canada)", "location": "",
+        "id_str": "82301637", "friends_count": 3, "verified": false,
+        "profile_background_color": "C0DEED", "listed_count": 76,
+        "statuses_count": 151, "show_all_inline_media": false,
+        "notifications": null, "profile_background_tile": false,
+        "follow_request_sent": null, "favourites_count": 0,
+        "profile_image_url": "http://a1.twimg.com/profile_images/482/tweepy_normal.png",
+        "contributors_enabled": false, "lang": "en", "protected": false,
+        "geo_enabled": false, "profile_text_color": "333333",
+        "name": "Tweepy", "url": "http://github.com/joshthecoder/tweepy",
+        "profile_background_image_url": "http://s.twimg.com/a/1282/images/themes/theme1/bg.png",
+        "profile_link_color": "0084B4", "id": 82301637,
+        "created_at": "Wed Oct 14 07:28:20 +0000 2009",
+        "utc_offset": -21600, "screen_name": "tweepy",
+        "profile_sidebar_fill_color": "DDEEF6"
+    }
+}'''
+
+
+class BindOnlyAPI(API):
+    """API whose calls stop after building the request URL"""
+
+    def execute(self, method):
+        return method.build_url()
+
+
+def best_of(func, number, repeat=7):
+    """Best time per call in microseconds"""
+    timer = timeit.Timer(func)
+    return min(timer.repeat(repeat, number)) / number * 1e6
+
+
+def model_size(obj):
+    """Bytes used by a model and the models nested in it,
+    not counting the field values they share"""
+    size = sys.getsizeof(obj)
+    fields = getattr(obj, '__dict__', None)
+    if fields is None:
+        fields = obj.__getstate__()
+        extra = object.__getattribute__(obj, '_extra')
+        if extra is not None:
+            size += sys.getsizeof(extra)
+    else:
+        size += sys.getsizeof(fields)
+    for value in fields.values():
+        if isinstance(value, Model) and value is not obj:
+            size += model_size(value)
+    return size
+
+
+re_path_template = re.compile('{\w+}')
+
+
+def baseline_bind_api(**config):
+    # bind_api as it was before call plans, with the per call options
+    # added since, for comparison. Only binds arguments and builds the
+    # URL like BindOnlyAPI.
+
+    class APIMethod(object):
+
+        path = config['path']
+        allowed_param = config.get('allowed_param', [])
+        require_auth = config.get('require_auth', False)
+        search_api = config.get('search_api', False)
+
+        def __init__(self, api, args, kargs):
+            if self.require_auth and not api.auth:
+                raise TweepError('Authentication required!')
+
+            self.api = api
+            self.hooks = api.hooks
+            self.post_data = kargs.pop('post_data', None)
+            self.retry_count = kargs.pop('retry_count', api.retry_count)
+            self.retry_delay = kargs.pop('retry_delay', api.retry_delay)
+            self.retry_errors = kargs.pop('retry_errors', api.retry_errors)
+            self.retry_policy = kargs.pop('retry_policy', api.retry_policy)
+            if self.retry_policy is None:
+                self.retry_policy = RetryPolicy(self.retry_count,
+                        self.retry_delay, self.retry_errors)
+            self.connect_timeout = kargs.pop('connect_timeout', api.connect_timeout)
+            self.read_timeout = kargs.pop('read_timeout', api.read_timeout)
+            self.deadline = kargs.pop('deadline', api.deadline)
+            self.incremental = kargs.pop('incremental', api.incremental)
+            self.identity_map = kargs.pop('identity_map', api.identity_map)
+            self.projection = kargs.pop('projection', api.projection)
+            self.headers = kargs.pop('headers', {})
+            self.build_parameters(args, kargs)
+
+            if self.search_api:
+                self.api_root = api.search_root
+            else:
+                self.api_root = api.api_root
+
+            self.build_path()
+
+            if api.secure:
+                self.scheme = 'https://'
+            else:
+                self.scheme = 'http://'
+
+            if self.search_api:
+                self.host = api.search_host
+            else:
+                self.host = api.host
+
+            self.headers['Host'] = self.host
+
+            if api.compression:
+                self.headers['Accept-Encoding'] = ACCEPT_ENCODING
+
+        def build_parameters(self, args, kargs):
+            self.parameters = {}
+            for idx, arg in enumerate(args):
+                try:
+                    self.parameters[self.allowed_param[idx]] = convert_to_utf8_str(arg)
+                except IndexError:
+                    raise TweepError('Too many parameters supplied!')
+
+            for k, arg in kargs.items():
+                if arg is None:
+                    continue
+                if k in self.parameters:
+                    raise TweepError('Multiple values for parameter %s supplied!' % k)
+                self.parameters[k] = convert_to_utf8_str(arg)
+
+        def build_path(self):
+            for variable in re_path_template.findall(self.path):
+                name = variable.strip('{}')
+                if name == 'user' and self.api.auth:
+                    value = self.api.auth.get_username()
+                else:
+                    try:
+                        value = urllib.quote(self.parameters[name])
+                    except KeyError:
+                        raise TweepError('No parameter value found for path variable: %s' % name)
+                    del self.parameters[name]
+                self.path = self.path.replace(variable, value)
+
+        def build_url(self):
+            url = self.api_root + self.path
+            if len(self.parameters):
+                url = '%s?%s' % (url, urllib.urlencode(self.parameters))
+            return url
+
+    def _call(api, *args, **kargs):
+        method = APIMethod(api, args, kargs)
+        return api.execute(method)
+
+    return _call
+
+
+class BaselineBindOnlyAPI(BindOnlyAPI):
+    """BindOnlyAPI with the benchmarked methods bound the old way"""
+
+    home_timeline = baseline_bind_api(
+        path = '/statuses/home_timeline.json',
+        allowed_param = ['since_id', 'max_id', 'count', 'page'],
+        require_auth = True
+    )
+
+    get_user = baseline_bind_api(
+        path = '/users/show.json',
+        allowed_param = ['id', 'user_id', 'screen_name']
+    )
+
+    list_timeline = baseline_bind_api(
+        path = '/{owner}/lists/{slug}/statuses.json',
+        allowed_param = ['owner', 'slug', 'since_id', 'max_id', 'count', 'page']
+    )
+
+    search = baseline_bind_api(
+        search_api = True,
+        path = '/search.json',
+        allowed_param = ['q', 'lang', 'locale', 'rpp', 'page', 'since_id', 'geocode', 'show_user']
+    )
+
+
+def bench_bind():
+    """Per call overhead of binding arguments and building the URL"""
+    auth = BasicAuthHandler('tweepy', 'secret')
+    results = []
+    for suffix, api in ((' before', BaselineBindOnlyAPI(auth)), ('', BindOnlyAPI(auth))):
+        results.append(('no path variables' + suffix,
+                best_of(lambda: api.home_timeline(count=20, page=2), 20000)))
+        results.append(('query parameter' + suffix,
+                best_of(lambda: api.get_user('tweepy'), 20000)))
+        results.append(('path variables' + suffix,
+                best_of(lambda: api.list_timeline('tweepy', 'dev', count=20), 20000)))
+        results.append(('search api' + suffix,
+                best_of(lambda: api.search(q='tweepy', rpp=50), 20000)))
+    return [(label, value, 'us') for label, value in results]
+
+
+def bench_models():
+    """Memory and parse time of a status with its user"""
+    status = json.loads(STATUS_JSON)
+    results = []
+    for label, factory in (('regular', ModelFactory), ('compact', CompactModelFactory)):
+        parse = factory.status.parse
+        results.append(('%s size' % label, model_size(parse(None, status)), 'bytes'))
+        results.append(('%s parse' % label, best_of(lambda: parse(None, status), 2000), 'us'))
+    return results
+
+
+def bench_lazy():
+    """Parsing a status and reading its id and text"""
+    status = json.loads(STATUS_JSON)
+    results = []
+    for label, factory in (('regular', ModelFactory), ('lazy', LazyModelFactory)):
+        parse = factory.status.parse
+        def read():
+            model = parse(None, status)
+            return model.id, model.text
+        def read_all():
+            model = parse(None, status)
+            return model.id, model.text, model.created_at, model.user.created_at, model.source_url
+        results.append(('%s id and text' % label, best_of(read, 2000), 'us'))
+        results.append(('%s all converted' % label, best_of(read_all, 2000), 'us'))
+    return results
+
+
+
+def bench_projection():
+    """Parsing a status with 5 of its fields"""
+    status = json.loads(STATUS_JSON)
+    projection = 'status: id, text, created_at, user; user: id, screen_name'
+    results = []
+    for factory in (ModelFactory, ModelFactory.project(projection)):
+        parse = factory.status.parse
+        if factory is ModelFactory:
+            label = 'all fields'
+        else:
+            label = 'projected'
+        results.append(('%s size' % label, model_size(parse(None, status)), 'bytes'))
+        results.append(('%s parse' % label, best_of(lambda: parse(None, status), 2000), 'us'))
+    return results
+
+
+def bench_interning():
+    """Repeated strings of 2000 statuses by 2000 users"""
+    page = [json.loads(STATUS_JSON) for i in range(2000)]
+    statuses = ModelFactory.status.parse_list(None, page)
+    names = ['source'] + sorted(models.INTERN_FIELDS)
+
+    def strings_size(objects):
+        values = {}
+        for obj in objects:
+            for name in names:
+                value = get(obj, name)
+                if isinstance(value, basestring):
+                    values[id(value)] = value
+        return sum([sys.getsizeof(value) for value in values.values()])
+
+    def get(obj, name):
+        if isinstance(obj, dict):
+            return obj.get(name)
+        return getattr(obj, name, None)
+
+    source = page[0]['source']
+    def parse_source():
+        return utils.parse_html_value(source), utils.parse_a_href(source)
+    return [
+        ('decoded json strings size', strings_size(page + [s['user'] for s in page]), 'bytes'),
+        ('interned strings size', strings_size(statuses + [s.user for s in statuses]), 'bytes'),
+        ('source parse', best_of(parse_source, 20000), 'us'),
+        ('source parse memoized', best_of(lambda: models.parse_source(source), 20000), 'us')
+    ]
+
+
+def bench_identity():
+    """A page of 200 statuses by 5 users"""
+    page = []
+    for i in range(200):
+        status = json.loads(STATUS_JSON)
+        status['user']['id'] = i % 5
+        page.append(status)
+    parse_list = ModelFactory.status.parse_list
+
+    def parse(identity_map):
+        previous = activate_identity_map(identity_map)
+        try:
+            return parse_list(None, page)
+        finally:
+            activate_identity_map(previous)
+
+    def users_size(statuses):
+        users = dict([(id(status.user), status.user) for status in statuses])
+        return sum([model_size(user) for user in users.values()])
+
+    def map_size(identity_map):
+        # entries the map keeps besides the shared users
+        return sum([sys.getsizeof(entry) + sys.getsizeof(entry[1])
+                for entry in identity_map.entries.values()])
+
+    identity_map = IdentityMap()
+    shared = parse(identity_map)
+
+    return [
+        ('plain users size', users_size(parse(None)), 'bytes'),
+        ('plain parse', best_of(lambda: parse(None), 50), 'us'),
+        ('identity map users size', users_size(shared) + map_size(identity_map), 'bytes'),
+        ('identity map parse', best_of(lambda: parse(IdentityMap()), 50), 'us')
+    ]
+
+def bench_columns():
+    """2000 statuses as models and as columns"""
+    page = []
+    for i in range(2000):
+        status = json.loads(STATUS_JSON)
+        status['id'] = i
+        status['retweet_count'] = i % 50
+        status['user']['followers_count'] = i * 7 % 1000
+        page.append(status)
+    statuses = ModelFactory.status.parse_list(None, page)
+    fields = ['id', 'created_at', 'retweet_count', 'user.followers_count']
+    columns = statuses.columns(fields)
+
+    def models_query():
+        popular = [s for s in statuses if s.user.followers_count > 500]
+        popular.sort(key=lambda s: s.retweet_count)
+        return [s.id for s in popular]
+
+    def columns_query():
+        return columns.where('user.followers_count', '>', 500).sort('retweet_count')['id']
+
+    def columns_size(columns):
+        return sum([sys.getsizeof(column) for column in columns.columns.values()])
+
+    return [
+        ('models size', sum([model_size(status) for status in statuses]), 'bytes'),
+        ('columns size', columns_size(columns), 'bytes'),
+        ('models from json', best_of(lambda: ModelFactory.status.parse_list(None, page), 5), 'us'),
+        ('columns from json', best_of(lambda: ColumnSet.from_json(page, fields), 5), 'us'),
+        ('columns from models', best_of(lambda: statuses.columns(fields), 5), 'us'),
+        ('models filter and sort', best_of(models_query, 50), 'us'),
+        ('columns filter and sort', best_of(columns_query, 50), 'us')
+    ]
+
+
+def bench_json():
+    """Decoding a 200 status timeline and stream messages per backend"""
+    status = json.loads(STATUS_JSON)
+    timeline = json.dumps([status] * 200)
+    message = json.dumps(status)
+    results = []
+    for name in jsonlib.available_backends():
+        loads = jsonlib.get_backend(name).loads
+        results.append(('%s timeline' % name, best_of(lambda: loads(timeline), 20), 'us'))
+        results.append(('%s stream message' % name, best_of(lambda: loads(message), 2000), 'us'))
+    # what decoding to unicode before parsing would add
+    loads = jsonlib.get_backend().loads
+    results.append(('default timeline from unicode',
+            best_of(lambda: loads(timeline.decode('utf-8')), 20), 'us'))
+    return results
+
+
+def strptime_datetime(string):
+    # parse_datetime as it was, for comparison
+    locale.setlocale(locale.LC_TIME, 'C')
+    date = datetime(*(time.strptime(string, '%a %b %d %H:%M:%S +0000 %Y')[0:6]))
+    locale.setlocale(locale.LC_TIME, '')
+    return date
+
+
+def bench_datetime():
+    """Parsing created_at timestamps"""
+    string = 'Wed Aug 25 18:27:03 +0000 2010'
+    search_string = 'Wed, 25 Aug 2010 18:27:03 +0000'
+    def uncached(parse, string):
+        def run():
+            utils._datetime_cache.clear()
+            utils._search_datetime_cache.clear()
+            return parse(string)
+        return run
+    return [
+        ('strptime with locale', best_of(lambda: strptime_datetime(string), 5000), 'us'),
+        ('parse_datetime uncached', best_of(uncached(utils.parse_datetime, string), 20000), 'us'),
+        ('parse_datetime cached', best_of(lambda: utils.parse_datetime(string), 50000), 'us'),
+        ('parse_search_datetime uncached',
+            best_of(uncached(utils.parse_search_datetime, search_string), 20000), 'us')
+    ]
+
+benchmarks = [
+    ('bind', bench_bind),
+    ('models', bench_models),
+    ('lazy', bench_lazy),
+    ('projection', bench_projection),
+    ('datetime', bench_datetime),
+    ('identity', bench_identity),
+    ('interning', bench_interning),
+    ('columns', bench_columns),
+    ('json', bench_json),
+]
+
+
+def main(names):
+    for name, bench in benchmarks:
+        if names and name not in names:
+            continue
+        print '%s: %s' % (name, bench.__doc__)
+        for label, value, unit in bench():
+            print '    %-30s %10.2f %s' % (label, value, unit)
+
+
+if __name__ == '__main__':
+
+    main(sys.argv[1:])
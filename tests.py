@@ -1,9 +1,15 @@
 import unittest
 import random
-from time import sleep
+from time import sleep, time
 import os
+import urllib
+import zlib
+import threading
+from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+from SocketServer import ThreadingMixIn
 
 from tweepy import *
+from tweepy import jsonlib
 
 """Configurations"""
 # Must supply twitter account credentials for tests
@@ -376,6 +382,1311 @@ class TweepyCacheTests(unittest.TestCase):
         os.rmdir('cache_test_dir')
 """
 
+class LocalRequestHandler(BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+    body = '{"id": 1, "screen_name": "tweepy"}'
+    status = 200
+
+    def do_GET(self):
+        self.server.requests.append((self.path, self.client_address))
+        self.send_response(self.status)
+        self.send_header('Content-Length', str(len(self.body)))
+        self.end_headers()
+        self.wfile.write(self.body)
+
+    def log_message(self, *args):
+        pass
+
+class LocalServer(ThreadingMixIn, HTTPServer):
+
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # clients giving up early is expected
+        pass
+
+def start_local_server(handler=LocalRequestHandler):
+    server = LocalServer(('127.0.0.1', 0), handler)
+    server.requests = []
+    t = threading.Thread(target=server.serve_forever)
+    t.setDaemon(True)
+    t.start()
+    return server, '127.0.0.1:%i' % server.server_address[1]
+
+class DroppingRequestHandler(LocalRequestHandler):
+
+    def do_POST(self):
+        self.server.requests.append((self.path, self.client_address))
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if len(self.server.requests) == 2:
+            # seen, then dropped without an answer
+            self.close_connection = 1
+            return
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(self.body)))
+        self.end_headers()
+        self.wfile.write(self.body)
+
+class TweepyPoolTests(unittest.TestCase):
+
+    def setUp(self):
+        self.server, self.host = start_local_server()
+
+    def tearDown(self):
+        self.server.shutdown()
+
+    def testkeepalive(self):
+        api = API(host=self.host)
+        for i in range(0, 3):
+            user = api.get_user('tweepy')
+            self.assertEqual(user.screen_name, 'tweepy')
+        self.assertEqual(api.connection_pool.count(), 1)
+        clients = set([client for path, client in self.server.requests])
+        self.assertEqual(len(clients), 1, 'Connection was not reused')
+
+    def testidletimeout(self):
+        pool = ConnectionPool(idle_timeout=0.5)
+        api = API(host=self.host, connection_pool=pool)
+        api.get_user('tweepy')
+        sleep(0.5)
+        api.get_user('tweepy')
+        clients = set([client for path, client in self.server.requests])
+        self.assertEqual(len(clients), 2, 'Expired connection was reused')
+
+    def testnoresend(self):
+        server, host = start_local_server(DroppingRequestHandler)
+        try:
+            api = API(BasicAuthHandler('user', 'pass'), host=host, retry_count=2)
+            api.update_status('one')
+            self.assertRaises(TweepError, api.update_status, 'two')
+            self.assertEqual(len(server.requests), 2)
+        finally:
+            server.shutdown()
+
+    def testmaxsize(self):
+        pool = ConnectionPool(max_size=1)
+        conns = [pool.get(self.host) for i in range(0, 3)]
+        for conn in conns:
+            conn.connect()
+            pool.put(conn)
+        self.assertEqual(pool.count(), 1)
+        pool.clear()
+        self.assertEqual(pool.count(), 0)
+
+class SlowRequestHandler(LocalRequestHandler):
+
+    def do_GET(self):
+        sleep(1.0)
+        LocalRequestHandler.do_GET(self)
+
+class ErrorRequestHandler(LocalRequestHandler):
+
+    status = 500
+
+class TweepyTimeoutTests(unittest.TestCase):
+
+    def testreadtimeout(self):
+        server, host = start_local_server(SlowRequestHandler)
+        api = API(host=host, read_timeout=0.2)
+        self.assertRaises(TweepTimeout, api.get_user, 'tweepy')
+        self.assertRaises(TweepTimeout, API(host=host).get_user, 'tweepy', deadline=0.2)
+        server.shutdown()
+
+    def testdeadline(self):
+        server, host = start_local_server(ErrorRequestHandler)
+        api = API(host=host, retry_count=5, retry_delay=1.0, deadline=0.5)
+        self.assertRaises(TweepTimeout, api.get_user, 'tweepy')
+        self.assertEqual(len(server.requests), 1)
+        server.shutdown()
+
+class RetryAfterRequestHandler(ErrorRequestHandler):
+
+    status = 503
+
+    def end_headers(self):
+        self.send_header('Retry-After', '0')
+        ErrorRequestHandler.end_headers(self)
+
+class TweepyRetryTests(unittest.TestCase):
+
+    def testretrycount(self):
+        server, host = start_local_server(ErrorRequestHandler)
+        api = API(host=host, retry_count=2)
+        self.assertRaises(TweepError, api.get_user, 'tweepy')
+        self.assertEqual(len(server.requests), 3)
+        server.shutdown()
+
+    def testbackoff(self):
+        policy = ExponentialBackoff(base_delay=1.0, max_delay=4.0)
+        for attempt in range(0, 5):
+            delay = policy.delay(attempt)
+            self.assert_(0 <= delay <= min(4.0, 2 ** attempt))
+        policy.jitter = False
+        self.assertEqual([policy.delay(i) for i in range(0, 4)], [1.0, 2.0, 4.0, 4.0])
+
+    def testretryafter(self):
+        server, host = start_local_server(RetryAfterRequestHandler)
+        api = API(host=host, retry_policy=ExponentialBackoff(retry_count=2, base_delay=30))
+        self.assertRaises(TweepError, api.get_user, 'tweepy', deadline=5)
+        self.assertEqual(len(server.requests), 3)
+        server.shutdown()
+
+    def testconnectionerrors(self):
+        server, host = start_local_server()
+        server.shutdown()
+        server.socket.close()
+        api = API(host=host, retry_count=2)
+        self.assertRaises(TweepError, api.get_user, 'tweepy')
+
+class RateLimitRequestHandler(LocalRequestHandler):
+
+    def do_GET(self):
+        if self.path.startswith('/1/account/rate_limit_status.json'):
+            self.body = '{"hourly_limit": 150, "remaining_hits": 2, ' \
+                        '"reset_time_in_seconds": %i}' % (time() + 3600)
+        LocalRequestHandler.do_GET(self)
+
+    def end_headers(self):
+        self.send_header('X-RateLimit-Limit', '150')
+        self.send_header('X-RateLimit-Remaining', '1')
+        self.send_header('X-RateLimit-Reset', str(int(time()) + 3600))
+        LocalRequestHandler.end_headers(self)
+
+class TweepyRateLimitTests(unittest.TestCase):
+
+    def setUp(self):
+        self.server, self.host = start_local_server(RateLimitRequestHandler)
+
+    def tearDown(self):
+        self.server.shutdown()
+
+    def testheaders(self):
+        limiter = RateLimiter(blocking=False, auto_seed=False)
+        api = API(host=self.host, rate_limiter=limiter)
+        api.get_user('tweepy')
+        self.assertEqual(limiter.budget(None, '/users/show.json')[1], 1)
+        api.get_user('tweepy')
+        self.assertRaises(TweepError, api.get_user, 'tweepy')
+        self.assertEqual(len(self.server.requests), 2)
+
+    def testseed(self):
+        limiter = RateLimiter(blocking=False)
+        api = API(host=self.host, rate_limiter=limiter)
+        api.get_status(1)
+        # the call took the last hit of the credential wide budget,
+        # the same window reporting 1 left does not hand it back
+        self.assertEqual(limiter.budget(None)[0:2], (150, 0))
+        self.assertEqual(limiter.budget(None, '/statuses/show.json')[1], 1)
+
+    def testsharedbudget(self):
+        server, host = start_local_server(SharedBudgetRequestHandler)
+        try:
+            limiter = RateLimiter(blocking=False, auto_seed=False)
+            api = API(host=host, rate_limiter=limiter)
+            api.get_user('tweepy')
+            api.get_status(1)
+            api.get_user('tweepy')
+            api.get_user('tweepy')
+            self.assertRaises(TweepError, api.get_user, 'tweepy')
+            # its own endpoint budget is left but the shared one is spent
+            self.assertRaises(TweepError, api.get_status, 1)
+            self.assertEqual(len(server.requests), 4)
+        finally:
+            server.shutdown()
+
+    def testacquire(self):
+        limiter = RateLimiter()
+        limiter.update('user', None, 150, 1, int(time()) + 3600)
+        self.assert_(limiter.acquire('user', blocking=False))
+        self.failIf(limiter.acquire('user', blocking=False))
+        self.failIf(limiter.acquire('user', timeout=0.1))
+        limiter.update('user', None, 150, 0, int(time()) + 1)
+        self.assert_(limiter.acquire('user', timeout=3))
+
+class SharedBudgetRequestHandler(LocalRequestHandler):
+
+    # one budget for all endpoints, like Twitter's per credential budget
+    budget = 4
+    reset = int(time()) + 3600
+
+    def do_GET(self):
+        self.remaining = self.budget - len(self.server.requests) - 1
+        if self.remaining < 0:
+            self.status = 400
+            self.body = '{"error": "Rate limit exceeded"}'
+        LocalRequestHandler.do_GET(self)
+
+    def end_headers(self):
+        self.send_header('X-RateLimit-Limit', str(self.budget))
+        self.send_header('X-RateLimit-Remaining', str(max(self.remaining, 0)))
+        self.send_header('X-RateLimit-Reset', str(self.reset))
+        LocalRequestHandler.end_headers(self)
+
+class TweepySharedRateLimitTests(unittest.TestCase):
+
+    path = 'ratelimit_test_state'
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def testshared(self):
+        a = SharedRateLimiter(self.path, slots=8)
+        b = SharedRateLimiter(self.path, slots=8)
+        a.update('user', '/statuses/show.json', 150, 20, int(time()) + 3600)
+        self.assertEqual(b.budget('user', '/statuses/show.json')[1], 20)
+        self.assertEqual(b.budget('other', '/statuses/show.json'), None)
+
+        # reserve from several processes at once
+        children = []
+        for i in range(0, 4):
+            pid = os.fork()
+            if pid == 0:
+                c = SharedRateLimiter(self.path, slots=8)
+                hits = 0
+                while c.acquire('user', '/statuses/show.json', blocking=False):
+                    hits += 1
+                os._exit(hits)
+            children.append(pid)
+        hits = [os.WEXITSTATUS(os.waitpid(pid, 0)[1]) for pid in children]
+        self.assertEqual(sum(hits), 20)
+        self.assertEqual(a.budget('user', '/statuses/show.json')[1], 0)
+        a.close()
+        b.close()
+
+class CursorRequestHandler(LocalRequestHandler):
+
+    def do_GET(self):
+        if 'cursor=-1' in self.path:
+            self.body = '{"users": [{"id": 1}, {"id": 2}], "previous_cursor": 0, "next_cursor": 5}'
+        else:
+            self.body = '{"users": [{"id": 3}], "previous_cursor": 5, "next_cursor": 0}'
+        LocalRequestHandler.do_GET(self)
+
+class TweepyAsyncTests(unittest.TestCase):
+
+    def testconcurrent(self):
+        server, host = start_local_server(SlowRequestHandler)
+        api = AsyncAPI(host=host)
+        results = [api.get_user('tweepy') for i in range(0, 10)]
+        started = time()
+        api.run()
+        self.assert_(time() - started < 5, 'Requests did not run concurrently')
+        for result in results:
+            self.assertEqual(result.get().screen_name, 'tweepy')
+        server.shutdown()
+
+    def testerrors(self):
+        server, host = start_local_server(ErrorRequestHandler)
+        api = AsyncAPI(host=host, retry_count=2)
+        self.assertRaises(TweepError, api.get_user('tweepy').get)
+        self.assertEqual(len(server.requests), 3)
+        server.shutdown()
+
+    def testtimeout(self):
+        server, host = start_local_server(SlowRequestHandler)
+        api = AsyncAPI(host=host, read_timeout=0.2)
+        self.assertRaises(TweepTimeout, api.get_user('tweepy').get)
+        server.shutdown()
+
+    def testdeadline(self):
+        server, host = start_local_server(SlowRequestHandler)
+        api = AsyncAPI(host=host, deadline=0.4)
+        started = time()
+        self.assertRaises(TweepTimeout, api.get_user('tweepy').get)
+        self.assert_(time() - started < 0.7, 'Request outlived its deadline')
+        server.shutdown()
+
+    def testcursor(self):
+        server, host = start_local_server(CursorRequestHandler)
+        api = AsyncAPI(host=host)
+        ids = []
+        count = AsyncCursor(api.followers, 'twitter').items(lambda u: ids.append(u.id))
+        self.assertEqual(count.get(), 3)
+        self.assertEqual(ids, [1, 2, 3])
+        server.shutdown()
+
+class IdRequestHandler(LocalRequestHandler):
+
+    def do_GET(self):
+        id = int(self.path.split('id=')[1])
+        if id % 3 == 0:
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        sleep(0.01 * (id % 5))
+        self.body = '{"id": %i, "text": "status %i"}' % (id, id)
+        LocalRequestHandler.do_GET(self)
+
+class TweepyBatchTests(unittest.TestCase):
+
+    def setUp(self):
+        self.server, self.host = start_local_server(IdRequestHandler)
+
+    def tearDown(self):
+        self.server.shutdown()
+
+    def _check(self, api):
+        items = list(api.batch(api.get_status, range(1, 31)))
+        self.assertEqual([item.index for item in items], range(0, 30))
+        for item in items:
+            if item.args % 3 == 0:
+                self.assert_(isinstance(item.error, TweepError))
+            else:
+                self.assertEqual(item.result.id, item.args)
+
+        items = list(api.batch('get_status', [{'id': i} for i in range(1, 11)], ordered=False))
+        self.assertEqual(sorted([item.index for item in items]), range(0, 10))
+
+        results = api.map(api.get_status, [(1,), (3,)])
+        self.assertEqual(results[0].id, 1)
+        self.assert_(isinstance(results[1], TweepError))
+
+    def testthreaded(self):
+        self._check(API(host=self.host))
+
+    def testasync(self):
+        self._check(AsyncAPI(host=self.host))
+
+class LookupRequestHandler(LocalRequestHandler):
+
+    def do_GET(self):
+        query = self.path.split('?')[1]
+        params = dict([p.split('=') for p in query.split('&')])
+        users = []
+        for id in urllib.unquote(params.get('user_id', '')).split(','):
+            if id and int(id) % 7:
+                users.append('{"id": %s, "screen_name": "user%s"}' % (id, id))
+        for name in urllib.unquote(params.get('screen_name', '')).split(','):
+            if name and name != 'nobody':
+                users.append('{"id": %s, "screen_name": "%s"}' % (name[4:], name))
+        if not users:
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self.body = '[%s]' % ','.join(users)
+        LocalRequestHandler.do_GET(self)
+
+class TweepyLookupTests(unittest.TestCase):
+
+    def testlookupusers(self):
+        server, host = start_local_server(LookupRequestHandler)
+        api = API(BasicAuthHandler('user', 'pass'), host=host)
+        ids = range(250, 0, -1) + [7, 8]
+        users = api.lookup_users(user_ids=ids, screen_names=['user1', 'nobody'])
+        self.assertEqual(len(server.requests), 4)
+        expected = [i for i in range(250, 0, -1) if i % 7]
+        self.assertEqual([u.id for u in users], expected + [1])
+        self.assertEqual(users.missing, [i for i in range(250, 0, -1) if i % 7 == 0] + ['nobody'])
+
+        users = api.hydrate_users(([14, 15], (0, 0)))
+        self.assertEqual([u.id for u in users], [15])
+        self.assertEqual(users.missing, [14])
+
+        from tweepy.parsers import JSONParser, RawParser
+        api = API(BasicAuthHandler('user', 'pass'), host=host, parser=JSONParser())
+        users = api.lookup_users(user_ids=[15, 14, 8], screen_names=['user1'])
+        self.assertEqual([u['id'] for u in users], [15, 8, 1])
+        self.assertEqual(users.missing, [14])
+
+        api = API(BasicAuthHandler('user', 'pass'), host=host, parser=RawParser())
+        users = api.lookup_users(user_ids=[15, 8])
+        self.assertEqual(users, ['[{"id": 15, "screen_name": "user15"},{"id": 8, "screen_name": "user8"}]'])
+        self.assertEqual(users.missing, None)
+        server.shutdown()
+
+def gzip_compress(data):
+    compressor = zlib.compressobj(9, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush()
+
+class GzipRequestHandler(LocalRequestHandler):
+
+    body = '[%s]' % ','.join(['{"id": %i, "text": "compressible status"}' % i for i in range(0, 50)])
+
+    def do_GET(self):
+        self.send_response(200)
+        body = self.body
+        if 'gzip' in self.headers.get('Accept-Encoding', ''):
+            body = gzip_compress(body)
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        self.send_response(200)
+        self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        compressor = zlib.compressobj(9, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        for i in range(0, 3):
+            status = '{"id": %i, "text": "hello", "in_reply_to_status_id": null}' % i
+            data = compressor.compress('%i\n%s\r\n' % (len(status), status))
+            data += compressor.flush(zlib.Z_SYNC_FLUSH)
+            self.wfile.write('%x\r\n%s\r\n' % (len(data), data))
+        self.wfile.write('0\r\n\r\n')
+
+class CollectListener(StreamListener):
+
+    def __init__(self, stop_after):
+        StreamListener.__init__(self)
+        self.stop_after = stop_after
+        self.statuses = []
+
+    def on_status(self, status):
+        self.statuses.append(status)
+        if len(self.statuses) == self.stop_after:
+            return False
+
+class TweepyCompressionTests(unittest.TestCase):
+
+    def setUp(self):
+        self.server, self.host = start_local_server(GzipRequestHandler)
+
+    def tearDown(self):
+        self.server.shutdown()
+
+    def testrest(self):
+        api = API(host=self.host, compression=True)
+        statuses = api.public_timeline()
+        self.assertEqual(len(statuses), 50)
+        self.assert_(api.transfer_stats.wire_bytes < api.transfer_stats.decoded_bytes)
+        self.assertEqual(api.transfer_stats.decoded_bytes, len(GzipRequestHandler.body))
+
+        api = API(host=self.host)
+        api.public_timeline()
+        self.assertEqual(api.transfer_stats.saved(), 0)
+
+    def teststream(self):
+        listener = CollectListener(3)
+        stream = Stream('user', 'pass', listener, compression=True)
+        stream.host = self.host
+        stream.sample()
+        self.assertEqual([s.id for s in listener.statuses], [0, 1, 2])
+        self.assert_(stream.stats.decoded_bytes > 0)
+
+class ETagRequestHandler(LocalRequestHandler):
+
+    def do_GET(self):
+        self.server.requests.append((self.path, self.client_address))
+        if self.headers.get('If-None-Match') == '"v1"':
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('ETag', '"v1"')
+        self.send_header('Content-Length', str(len(self.body)))
+        self.end_headers()
+        self.wfile.write(self.body)
+
+class TweepyRevalidationTests(unittest.TestCase):
+
+    def setUp(self):
+        self.server, self.host = start_local_server(ETagRequestHandler)
+
+    def tearDown(self):
+        self.server.shutdown()
+
+    def _run_tests(self, cache):
+        api = API(host=self.host, cache=cache)
+        user = api.get_user('tweepy')
+        self.assertEqual(user.screen_name, 'tweepy')
+        sleep(0.3)
+        user = api.get_user('tweepy')
+        self.assertEqual(user.screen_name, 'tweepy')
+        self.assertEqual(api.last_response.status, 304)
+        # 304 extends the life of the entry
+        api.get_user('tweepy')
+        self.assertEqual(len(self.server.requests), 2)
+
+    def testmemorycache(self):
+        self._run_tests(MemoryCache(timeout=0.2))
+
+    def testcustomcache(self):
+        class DictCache(Cache):
+            # only implements the interface from before validators
+            def __init__(self):
+                Cache.__init__(self)
+                self.entries = {}
+            def store(self, key, value):
+                self.entries[key] = value
+            def get(self, key, timeout=None):
+                return self.entries.get(key)
+
+        cache = DictCache()
+        api = API(host=self.host, cache=cache)
+        self.assertEqual(api.get_user('tweepy').screen_name, 'tweepy')
+        self.assertEqual(api.get_user('tweepy').screen_name, 'tweepy')
+        self.assertEqual(len(cache.entries), 1)
+        self.assertEqual(len(self.server.requests), 1)
+
+    def testlegacypickle(self):
+        import pickle
+        cache = MemoryCache(timeout=0.2)
+        cache._entries['old'] = (time() - 1, 'value')
+        cache = pickle.loads(pickle.dumps(cache))
+        self.assertEqual(cache.get('old'), None)
+        self.assertEqual(cache.get_stale('old'), None)
+        self.assertEqual(cache.count(), 0)
+
+    def testfilecache(self):
+        cache = FileCache('revalidation_test_dir', 0.2)
+        try:
+            self._run_tests(cache)
+        finally:
+            cache.flush()
+            os.rmdir('revalidation_test_dir')
+
+class TweepySingleFlightTests(unittest.TestCase):
+
+    def setUp(self):
+        self.server, self.host = start_local_server(SlowRequestHandler)
+
+    def tearDown(self):
+        self.server.shutdown()
+
+    def testcoalesce(self):
+        flights = SingleFlight()
+        api = API(host=self.host, single_flight=flights)
+        results = api.map(api.get_user, ['tweepy'] * 5 + ['other'], workers=6)
+        for result in results:
+            self.assertEqual(result.screen_name, 'tweepy')
+        # five identical calls share one request, the sixth differs
+        self.assertEqual(len(self.server.requests), 2)
+        self.assertEqual(flights.hits, 4)
+        self.assertEqual(flights.misses, 2)
+        self.assertEqual(flights.in_flight(), 0)
+
+        # once the first call is done the next one goes out again
+        api.get_user('tweepy')
+        self.assertEqual(len(self.server.requests), 3)
+
+    def testerror(self):
+        flights = SingleFlight()
+        def fail():
+            raise TweepError('failed')
+        self.assertRaises(TweepError, flights.do, 'key', fail)
+        self.assertEqual(flights.in_flight(), 0)
+        self.assertEqual(flights.hit_rate(), 0.0)
+
+class TweepyBindTests(unittest.TestCase):
+
+    def testcompilepath(self):
+        from tweepy.binder import compile_path
+        self.assertEqual(compile_path('/users/show.json'),
+                (('/users/show.json', None),))
+        self.assertEqual(compile_path('/{user}/lists/{id}.json'),
+                (('/', 'user'), ('/lists/', 'id'), ('.json', None)))
+
+    def testbuildurl(self):
+        class BindOnlyAPI(API):
+            def execute(self, method):
+                return method.build_url()
+        api = BindOnlyAPI(BasicAuthHandler('tweepy', 'secret'))
+        self.assertEqual(api.get_user('tweepy'), '/1/users/show.json?id=tweepy')
+        self.assertEqual(api.list_timeline('tweepy', 'a b', count=5),
+                '/1/tweepy/lists/a%20b/statuses.json?count=5')
+        self.assertEqual(api.home_timeline(page=2, count=20, since_id=1),
+                '/1/statuses/home_timeline.json?count=20&page=2&since_id=1')
+        self.assertEqual(api.search(q='a b', rpp=5), '/search.json?q=a+b&rpp=5')
+
+class TweepyTransportTests(unittest.TestCase):
+
+    path = 'transport_test.pickle'
+
+    def tearDown(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def testreplay(self):
+        server, host = start_local_server()
+        transport = RecordingTransport(self.path)
+        api = API(host=host, transport=transport)
+        api.get_user('tweepy')
+        transport.close()
+
+        # recordings already in the file are kept
+        transport = RecordingTransport(self.path)
+        api = API(host=host, transport=transport)
+        api.get_user('tweepy')
+        api.get_user('twitter')
+        transport.close()
+        server.shutdown()
+
+        transport = ReplayTransport(self.path)
+        self.assertEqual(sum([len(r) for r in transport.recordings.values()]), 3)
+        api = API(host=host, transport=transport)
+        user = api.get_user('tweepy')
+        self.assertEqual(user.screen_name, 'tweepy')
+        self.assertEqual(api.last_response.status, 200)
+        self.assertRaises(TweepError, api.get_user, 'other')
+
+        # save() compacts the file to one dict
+        transport = RecordingTransport(self.path)
+        transport.save()
+        self.assertEqual(ReplayTransport(self.path).recordings, transport.recordings)
+
+    def testrealtime(self):
+        server, host = start_local_server(SlowRequestHandler)
+        api = API(host=host, transport=RecordingTransport(self.path))
+        api.get_user('tweepy')
+        server.shutdown()
+
+        api = API(host=host, transport=ReplayTransport(self.path))
+        t = time()
+        api.get_user('tweepy')
+        self.assert_(time() - t < 0.5)
+
+        api = API(host=host, transport=ReplayTransport(self.path, realtime=True))
+        t = time()
+        api.get_user('tweepy')
+        self.assert_(time() - t >= 0.9)
+        self.assertRaises(TweepTimeout, api.get_user, 'tweepy', read_timeout=0.2)
+
+    def teststream(self):
+        server, host = start_local_server(GzipRequestHandler)
+        listener = CollectListener(2)
+        stream = Stream('user', 'pass', listener, compression=True,
+                transport=RecordingTransport(self.path))
+        stream.host = host
+        stream.sample()
+        server.shutdown()
+
+        listener = CollectListener(2)
+        stream = Stream('user', 'pass', listener, compression=True,
+                transport=ReplayTransport(self.path))
+        stream.host = host
+        stream.sample()
+        self.assertEqual([s.id for s in listener.statuses], [0, 1])
+
+class TweepyHookTests(unittest.TestCase):
+
+    def setUp(self):
+        self.events = []
+
+    def _api(self, handler, **kargs):
+        self.server, host = start_local_server(handler)
+        api = API(host=host, **kargs)
+        api.add_hook(self.events.append)
+        return api
+
+    def tearDown(self):
+        self.server.shutdown()
+
+    def phases(self):
+        phases = [e.phase for e in self.events]
+        self.events[:] = []
+        return phases
+
+    def testphases(self):
+        api = self._api(LocalRequestHandler, cache=MemoryCache())
+        api.get_user('tweepy')
+        read = self.events[4]
+        self.assertEqual(self.phases(), ['cache_lookup', 'connect', 'send',
+                'first_byte', 'read', 'decode', 'build', 'cache_store', 'complete'])
+        self.assertEqual(read.bytes, len(LocalRequestHandler.body))
+        self.assertEqual(read.status, 200)
+        self.assertEqual(read.endpoint, '/users/show.json')
+
+        api.get_user('tweepy')
+        self.assert_(self.events[0].cache_hit)
+        self.assertEqual(self.phases(), ['cache_lookup', 'complete'])
+
+        # connection is reused
+        api.get_user('other')
+        self.assertEqual(self.phases()[1], 'send')
+
+        api.remove_hook(self.events.append)
+        api.get_user('another')
+        self.assertEqual(self.phases(), [])
+
+    def testerror(self):
+        api = self._api(ErrorRequestHandler, retry_count=1)
+        self.assertRaises(TweepError, api.get_user, 'tweepy')
+        complete = self.events[-1]
+        self.assertEqual(complete.phase, 'complete')
+        self.assertEqual(complete.status, 500)
+        self.assertEqual(complete.retries, 1)
+        self.assert_(isinstance(complete.error, TweepError))
+        self.assert_('retry_wait' in self.phases())
+
+class TweepyMetricsTests(unittest.TestCase):
+
+    def testapi(self):
+        server, host = start_local_server()
+        metrics = Metrics()
+        api = API(BasicAuthHandler('user', 'pass'), host=host,
+                cache=MemoryCache(), metrics=metrics)
+        api.get_user('tweepy')
+        api.get_user('tweepy')
+        self.assertRaises(TweepError, api.update_status, 'hello')
+        server.shutdown()
+
+        users = metrics.snapshot()['endpoints']['/users/show.json']
+        self.assertEqual(users['requests'], 2)
+        self.assertEqual(users['statuses'], {200: 1})
+        self.assertEqual(users['cache_hits'], 1)
+        self.assertEqual(users['cache_misses'], 1)
+        self.assertEqual(users['bytes_in'], len(LocalRequestHandler.body))
+        self.assertEqual(users['latency']['buckets'][-1], (float('inf'), 2))
+
+        # POST is not served by the local server
+        update = metrics.snapshot()['endpoints']['/statuses/update.json']
+        self.assertEqual(update['errors'], 1)
+        self.assertEqual(update['statuses'], {501: 1})
+        self.assertEqual(update['bytes_out'], len('/1/statuses/update.json?status=hello'))
+
+        text = metrics.prometheus()
+        self.assert_('# TYPE tweepy_request_duration_seconds histogram' in text)
+        self.assert_('tweepy_request_duration_seconds_bucket{endpoint="/users/show.json",le="+Inf"} 2' in text)
+        self.assert_('tweepy_responses_total{endpoint="/users/show.json",status="200"} 1' in text)
+        self.assert_('tweepy_cache_hits_total{endpoint="/users/show.json"} 1' in text)
+
+    def testasync(self):
+        server, host = start_local_server()
+        metrics = Metrics()
+        api = AsyncAPI(BasicAuthHandler('user', 'pass'), host=host,
+                cache=MemoryCache(), metrics=metrics)
+        api.get_user('tweepy').get()
+        api.get_user('tweepy').get()
+        self.assertRaises(TweepError, api.update_status('hello').get)
+        server.shutdown()
+
+        users = metrics.snapshot()['endpoints']['/users/show.json']
+        self.assertEqual(users['requests'], 2)
+        self.assertEqual(users['statuses'], {200: 1})
+        self.assertEqual(users['cache_hits'], 1)
+        self.assertEqual(users['cache_misses'], 1)
+        self.assertEqual(users['bytes_in'], len(LocalRequestHandler.body))
+
+        update = metrics.snapshot()['endpoints']['/statuses/update.json']
+        self.assertEqual(update['errors'], 1)
+        self.assertEqual(update['statuses'], {501: 1})
+        self.assertEqual(update['bytes_out'], len('/1/statuses/update.json?status=hello'))
+
+    def teststream(self):
+        server, host = start_local_server(GzipRequestHandler)
+        metrics = Metrics()
+        stream = Stream('user', 'pass', CollectListener(2), compression=True,
+                metrics=metrics)
+        stream.host = host
+        stream.sample()
+        server.shutdown()
+
+        sample = metrics.snapshot()['streams']['/1/statuses/sample.json']
+        self.assertEqual(sample['messages'], 2)
+        self.assertEqual(sample['reconnects'], 0)
+        self.assert_(sample['bytes_in'] > 0)
+        self.assert_('tweepy_stream_messages_total{stream="/1/statuses/sample.json"} 2'
+                in metrics.prometheus())
+
+class SplitRequestHandler(LocalRequestHandler):
+
+    def do_GET(self):
+        items = ','.join(['{"id": %i, "text": "status \\u00e9 %i"}' % (i, i) for i in range(0, 2000)])
+        if self.path.startswith('/1/statuses/friends.json'):
+            body = '{"users": [%s], "next_cursor": 7, "previous_cursor": 0}' % items
+        else:
+            body = '[%s]' % items
+        half = len(body) / 2
+        parts = [body[:half], body[half:]]
+
+        self.send_response(200)
+        if 'gzip' in self.headers.get('Accept-Encoding', ''):
+            compressor = zlib.compressobj(9, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+            parts = [compressor.compress(parts[0]) + compressor.flush(zlib.Z_SYNC_FLUSH),
+                    compressor.compress(parts[1]) + compressor.flush()]
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(parts[0]) + len(parts[1])))
+        self.end_headers()
+        self.wfile.write(parts[0])
+        self.wfile.flush()
+        sleep(0.5)
+        self.wfile.write(parts[1])
+
+class TweepyIncrementalTests(unittest.TestCase):
+
+    def setUp(self):
+        self.server, self.host = start_local_server(SplitRequestHandler)
+
+    def tearDown(self):
+        self.server.shutdown()
+
+    def _check(self, api):
+        t = time()
+        statuses = api.public_timeline(incremental=True)
+        first = statuses.next()
+        self.assert_(time() - t < 0.4)
+        self.assertEqual(first.id, 0)
+        self.assertEqual(first.text, u'status \u00e9 0')
+        self.assertEqual([s.id for s in statuses], range(1, 2000))
+        self.assertEqual(api.connection_pool.count(), 1)
+
+        users = api.friends(incremental=True)
+        self.assertEqual(len(list(users)), 2000)
+        self.assertEqual(users.next_cursor, 7)
+
+        # abandoned responses are not reused
+        users = api.friends(incremental=True)
+        self.assertEqual(api.connection_pool.count(), 0)
+        users.next()
+        users.close()
+        self.assertEqual(api.connection_pool.count(), 0)
+
+    def testplain(self):
+        self._check(API(host=self.host))
+
+    def testcompressed(self):
+        api = API(host=self.host, compression=True)
+        self._check(api)
+        self.assert_(api.transfer_stats.saved() > 0)
+
+    def testcursor(self):
+        server, host = start_local_server(CursorRequestHandler)
+        try:
+            api = API(host=host, incremental=True)
+            ids = [u.id for u in Cursor(api.followers, 'twitter').items()]
+            self.assertEqual(ids, [1, 2, 3])
+        finally:
+            server.shutdown()
+
+        server, host = start_local_server(PageRequestHandler)
+        try:
+            api = API(host=host, incremental=True)
+            ids = [s.id for s in Cursor(api.user_timeline).items()]
+            self.assertEqual(ids, [1, 2])
+        finally:
+            server.shutdown()
+
+    def testreader(self):
+        from tweepy.jsonstream import JSONArrayReader
+        payload = '{"a": [1], "results": [{"id": 1}, {"id": 22}], "max_id": 12345}'
+        for size in (1, 3, 100):
+            chunks = [payload[i:i + size] for i in range(0, len(payload), size)]
+            reader = JSONArrayReader(lambda n: chunks and chunks.pop(0) or '')
+            self.assertEqual(list(reader), [{'id': 1}, {'id': 22}])
+            self.assertEqual(reader.members, {'a': [1], 'max_id': 12345})
+
+        chunks = ['[{"id": 1}, {"id"']
+        reader = JSONArrayReader(lambda n: chunks and chunks.pop(0) or '')
+        self.assertRaises(TweepError, list, reader)
+
+class TweepyCompactModelTests(unittest.TestCase):
+
+    status = {
+        'id': 1, 'text': 'hello', 'created_at': 'Wed Aug 25 18:27:03 +0000 2010',
+        'source': '<a href="http://tweepy.org" rel="nofollow">tweepy</a>',
+        'new_field': [1, 2],
+        'user': {'id': 2, 'screen_name': 'tweepy', 'following': None},
+        'retweeted_status': {'id': 3, 'text': 'original', 'user': {'id': 4}}
+    }
+
+    def testparse(self):
+        status = CompactModelFactory.status.parse(None, self.status)
+        regular = ModelFactory.status.parse(None, self.status)
+        self.assertFalse(hasattr(status, '__dict__'))
+        self.assertFalse(hasattr(status.user, '__dict__'))
+        for name in ('id', 'text', 'created_at', 'source', 'source_url', 'new_field'):
+            self.assertEqual(getattr(status, name), getattr(regular, name))
+        self.assert_(status.author is status.user)
+        self.assertEqual(status.user.following, False)
+        self.assertEqual(status.retweeted_status.user.id, 4)
+        self.assertRaises(AttributeError, getattr, status, 'favorited')
+
+    def testpickle(self):
+        import pickle
+        status = CompactModelFactory.status.parse(None, self.status)
+        for protocol in (0, pickle.HIGHEST_PROTOCOL):
+            copy = pickle.loads(pickle.dumps(status, protocol))
+            self.assertEqual(copy.text, 'hello')
+            self.assertEqual(copy.new_field, [1, 2])
+            self.assertEqual(copy.user.screen_name, 'tweepy')
+            self.assertEqual(copy.retweeted_status.text, 'original')
+
+class TweepyLazyModelTests(unittest.TestCase):
+
+    status = TweepyCompactModelTests.status
+
+    def testparse(self):
+        status = LazyModelFactory.status.parse(None, self.status)
+        regular = ModelFactory.status.parse(None, self.status)
+        self.assert_(isinstance(status, Status))
+        self.assertEqual(status.text, 'hello')
+        self.assertFalse('created_at' in status.__dict__)
+        self.assertFalse('user' in status.__dict__)
+        for name in ('id', 'text', 'created_at', 'source', 'source_url', 'new_field'):
+            self.assertEqual(getattr(status, name), getattr(regular, name))
+        self.assert_(status.created_at is status.created_at)
+        self.assert_(status.author is status.user)
+        self.assertEqual(status.user.following, False)
+        self.assertEqual(status.retweeted_status.user.id, 4)
+        self.assertRaises(AttributeError, getattr, status, 'favorited')
+        self.assertRaises(AttributeError, getattr, status.retweeted_status, 'source_url')
+
+        status.text = 'changed'
+        self.assertEqual(status.text, 'changed')
+
+    def testsearchresult(self):
+        json = {'id': 1, 'created_at': 'Wed, 25 Aug 2010 18:27:03 +0000',
+                'source': '&lt;a href=&quot;http://tweepy.org&quot;&gt;tweepy&lt;/a&gt;'}
+        result = LazyModelFactory.search_result.parse(None, json)
+        regular = ModelFactory.search_result.parse(None, json)
+        self.assertEqual(result.created_at, regular.created_at)
+        self.assertEqual(result.source, 'tweepy')
+
+    def testpickle(self):
+        import pickle
+        status = LazyModelFactory.status.parse(None, self.status)
+        status.user
+        for protocol in (0, pickle.HIGHEST_PROTOCOL):
+            copy = pickle.loads(pickle.dumps(status, protocol))
+            self.assertEqual(copy.user.screen_name, 'tweepy')
+            self.assertEqual(copy.created_at, status.created_at)
+            self.assertEqual(copy.retweeted_status.text, 'original')
+
+class TweepyDatetimeTests(unittest.TestCase):
+
+    def testparse(self):
+        from datetime import datetime
+        from tweepy.utils import parse_datetime, parse_search_datetime
+        self.assertEqual(parse_datetime('Wed Aug 25 18:27:03 +0000 2010'),
+                datetime(2010, 8, 25, 18, 27, 3))
+        self.assertEqual(parse_datetime('Mon Jan 04 00:00:09 +0000 2010'),
+                datetime(2010, 1, 4, 0, 0, 9))
+        self.assertEqual(parse_search_datetime('Sun, 31 Oct 2010 23:59:59 +0000'),
+                datetime(2010, 10, 31, 23, 59, 59))
+        for string in ('Wed Aug 25 18:27:03 +0200 2010', 'Wed Foo 25 18:27:03 +0000 2010',
+                'Wed Aug 25 18:27 +0000 2010', 'Wed Feb 30 18:27:03 +0000 2010', ''):
+            self.assertRaises(ValueError, parse_datetime, string)
+        self.assertRaises(ValueError, parse_search_datetime, 'Wed Aug 25 18:27:03 +0000 2010')
+
+    def testcache(self):
+        from tweepy import utils
+        utils._datetime_cache.clear()
+        for second in range(utils.DATETIME_CACHE_SIZE + 10):
+            string = 'Wed Aug 25 18:27:03 +0000 %i' % (2000 + second % 8000)
+            utils.parse_datetime(string)
+        self.assert_(len(utils._datetime_cache) <= utils.DATETIME_CACHE_SIZE)
+        date = utils.parse_datetime('Wed Aug 25 18:27:03 +0000 2010')
+        self.assert_(utils.parse_datetime('Wed Aug 25 18:27:03 +0000 2010') is date)
+
+class TimelineRequestHandler(LocalRequestHandler):
+
+    body = '[%s]' % ','.join(['{"id": %i, "text": "status", "user": '
+            '{"id": %i, "screen_name": "user%i", "followers_count": 10}}' % (i, i % 2, i % 2)
+            for i in range(0, 10)])
+
+class TweepyIdentityMapTests(unittest.TestCase):
+
+    def setUp(self):
+        self.server, self.host = start_local_server(TimelineRequestHandler)
+
+    def tearDown(self):
+        self.server.shutdown()
+
+    def testcall(self):
+        api = API(host=self.host)
+        statuses = api.public_timeline()
+        self.assert_(statuses[0].user is not statuses[2].user)
+
+        statuses = api.public_timeline(identity_map=True)
+        self.assert_(statuses[0].user is statuses[2].user)
+        self.assert_(statuses[0].author is statuses[8].user)
+        self.assert_(statuses[1].user is not statuses[0].user)
+        self.assert_(api.public_timeline(identity_map=True)[0].user is not statuses[0].user)
+
+    def testapi(self):
+        import gc
+        identity_map = IdentityMap()
+        api = API(host=self.host, identity_map=identity_map)
+        statuses = api.public_timeline()
+        user = statuses[0].user
+        self.assert_(api.public_timeline()[4].user is user)
+        self.assertEqual(identity_map.misses, 2)
+        self.assertEqual(identity_map.hits, 18)
+
+        # newer snapshots update the shared user
+        TimelineRequestHandler.body = TimelineRequestHandler.body.replace('10', '11')
+        try:
+            api.public_timeline()
+        finally:
+            TimelineRequestHandler.body = TimelineRequestHandler.body.replace('11', '10')
+        self.assertEqual(user.followers_count, 11)
+
+        del statuses, user
+        gc.collect()
+        self.assertEqual(len(identity_map), 0)
+
+    def testmodels(self):
+        from tweepy.parsers import ModelParser
+        identity_map = IdentityMap(weak=False)
+        for factory in (CompactModelFactory, LazyModelFactory):
+            api = API(host=self.host, parser=ModelParser(factory), identity_map=identity_map)
+            statuses = api.public_timeline()
+            self.assert_(statuses[0].user is statuses[2].user)
+            self.assertEqual(statuses[1].user.screen_name, 'user1')
+
+class TweepyColumnTests(unittest.TestCase):
+
+    fields = ['id', 'created_at', 'retweet_count', 'text', 'truncated',
+            'geo', 'user.id', 'user.screen_name']
+
+    def setUp(self):
+        self.json = []
+        for i in range(0, 6):
+            self.json.append({'id': i, 'created_at': 'Wed Aug 25 18:27:0%i +0000 2010' % i,
+                    'retweet_count': i % 3, 'text': 'status', 'truncated': i == 4,
+                    'geo': None, 'user': {'id': i % 2, 'screen_name': 'user%i' % (i % 2)}})
+        self.statuses = ModelFactory.status.parse_list(None, self.json)
+
+    def testbuild(self):
+        from array import array
+        columns = self.statuses.columns(self.fields)
+        self.assertEqual(len(columns), 6)
+        self.assert_(isinstance(columns['id'], array))
+        self.assert_(isinstance(columns['created_at'], array))
+        self.assertEqual(columns.kinds['geo'], 'object')
+        self.assert_(columns['user.screen_name'][0] is columns['user.screen_name'][2])
+        self.assertEqual(columns.values('created_at'), [s.created_at for s in self.statuses])
+
+        from_json = ColumnSet.from_json(self.json, self.fields)
+        for field in self.fields:
+            self.assertEqual(from_json.values(field), columns.values(field))
+
+    def testquery(self):
+        columns = ColumnSet.from_json(self.json, self.fields)
+        self.assertEqual(list(columns.where('retweet_count', '>', 0)['id']), [1, 2, 4, 5])
+        self.assertEqual(list(columns.where('created_at', '<=',
+                self.statuses[1].created_at)['id']), [0, 1])
+        self.assertEqual(list(columns.filter(columns.values('truncated'))['id']), [4])
+        self.assertEqual(list(columns.sort('retweet_count')['id']), [0, 3, 1, 4, 2, 5])
+        self.assertEqual(list(columns.sort('id', reverse=True)['id']), [5, 4, 3, 2, 1, 0])
+        groups = columns.group_by('user.screen_name')
+        self.assertEqual(sorted(groups.keys()), ['user0', 'user1'])
+        self.assertEqual(list(groups['user1']['id']), [1, 3, 5])
+        self.assertRaises(TweepError, columns.where, 'id', '=~', 1)
+
+        # selections share the columns until one is used
+        selected = columns.where('retweet_count', '>', 0).sort('retweet_count', reverse=True)
+        self.assert_(selected.base is columns.base)
+        self.assertEqual(list(selected['id']), [2, 5, 1, 4])
+        self.assertEqual(list(selected.where('user.id', '==', 1)['id']), [5, 1])
+        self.assertEqual(list(selected.take([3, 0])['id']), [4, 2])
+        self.assertEqual(selected.row(1)['id'], 5)
+        self.assertEqual(selected.values('truncated'), [False, False, False, True])
+
+    def testmodels(self):
+        columns = ColumnSet.from_json(self.json, self.fields)
+        statuses = columns.where('id', '==', 4).to_models()
+        self.assertEqual(len(statuses), 1)
+        status = statuses[0]
+        self.assert_(isinstance(status, Status))
+        self.assertEqual(status.created_at, self.statuses[4].created_at)
+        self.assertEqual(status.truncated, True)
+        self.assertEqual(status.user.screen_name, 'user0')
+        self.assert_(status.author is status.user)
+
+class TweepyJSONBackendTests(unittest.TestCase):
+
+    def tearDown(self):
+        jsonlib.set_default_backend(None)
+        jsonlib.BACKENDS.pop('counting', None)
+        if 'counting' in jsonlib.AUTO_ORDER:
+            jsonlib.AUTO_ORDER.remove('counting')
+
+    def testregistry(self):
+        from tweepy.parsers import JSONParser
+        from tweepy.jsonstream import JSONArrayReader
+        self.assert_('json' in jsonlib.available_backends())
+        self.assertEqual(jsonlib.get_backend('json').loads('[1]'), [1])
+        self.assertRaises(TweepError, jsonlib.get_backend, 'nosuchbackend')
+
+        import json
+        calls = []
+        def loads(payload):
+            calls.append(payload)
+            return json.loads(payload)
+        jsonlib.register_backend('counting',
+                lambda: jsonlib.JSONBackend('counting', loads, json.dumps))
+        self.assertEqual(jsonlib.get_backend().name, jsonlib.available_backends()[0])
+
+        jsonlib.set_default_backend('counting')
+        self.assertEqual(JSONParser().json_lib.name, 'counting')
+        listener = StreamListener(API())
+        listener.on_data('{"delete": {"status": {"id": 1, "user_id": 2}}}')
+        self.assertEqual(len(calls), 1)
+        # no raw_decode, incremental results fall back to json
+        self.assertEqual(list(JSONArrayReader(lambda n: '').decoder.raw_decode('[2]')[0]), [2])
+
+    def testparser(self):
+        from tweepy.parsers import ModelParser
+        server, host = start_local_server()
+        try:
+            api = API(host=host, parser=ModelParser(json_lib='json'))
+            self.assertEqual(api.parser.json_lib.name, 'json')
+            self.assertEqual(api.get_user('tweepy').screen_name, 'tweepy')
+        finally:
+            server.shutdown()
+
+class PageRequestHandler(LocalRequestHandler):
+
+    def do_GET(self):
+        if 'page=1' in self.path:
+            self.body = '[{"id": 1}, {"id": 2}]'
+        else:
+            self.body = '[ ]'
+        LocalRequestHandler.do_GET(self)
+
+class TweepyRawParserTests(unittest.TestCase):
+
+    def testcursor(self):
+        from tweepy.parsers import RawParser
+        server, host = start_local_server(CursorRequestHandler)
+        try:
+            api = API(host=host, parser=RawParser(), cache=MemoryCache())
+            pages = list(Cursor(api.followers, 'twitter').pages())
+            self.assertEqual(pages, [
+                '{"users": [{"id": 1}, {"id": 2}], "previous_cursor": 0, "next_cursor": 5}',
+                '{"users": [{"id": 3}], "previous_cursor": 5, "next_cursor": 0}'])
+            self.assertEqual(pages[0].next_cursor, 5)
+
+            # served from the cache
+            page, cursors = api.followers('twitter', cursor=-1)
+            self.assertEqual(page, pages[0])
+            self.assertEqual(cursors, (0, 5))
+            self.assertEqual(len(server.requests), 2)
+        finally:
+            server.shutdown()
+
+    def testpages(self):
+        from tweepy.parsers import RawParser
+        server, host = start_local_server(PageRequestHandler)
+        try:
+            api = API(host=host, parser=RawParser())
+            pages = list(Cursor(api.user_timeline).pages())
+            self.assertEqual(pages, ['[{"id": 1}, {"id": 2}]'])
+        finally:
+            server.shutdown()
+
+    def testjsoncache(self):
+        from tweepy.parsers import JSONParser
+        server, host = start_local_server(CursorRequestHandler)
+        try:
+            api = API(host=host, parser=JSONParser(), cache=MemoryCache())
+            for i in range(0, 2):
+                users, cursors = api.followers('twitter', cursor=-1)
+                self.assertEqual(users['users'][0]['id'], 1)
+            self.assertEqual(len(server.requests), 1)
+        finally:
+            server.shutdown()
+
+    def teststream(self):
+        received = []
+        class Listener(StreamListener):
+            def on_raw(self, payload):
+                received.append(payload)
+            def on_status(self, status):
+                self.fail('status was decoded')
+        listener = Listener(API(), raw=True)
+        listener.on_data('{"in_reply_to_status_id": null}')
+        self.assertEqual(received, ['{"in_reply_to_status_id": null}'])
+
+class TweepyProjectionTests(unittest.TestCase):
+
+    status = TweepyCompactModelTests.status
+
+    def testparse(self):
+        for factory in (ModelFactory, CompactModelFactory, LazyModelFactory):
+            projected = factory.project('status: id, created_at, user; user: screen_name')
+            status = projected.status.parse(None, self.status)
+            self.assert_(isinstance(status, factory.status))
+            self.assertEqual(status.id, 1)
+            self.assertEqual(status.created_at, ModelFactory.status.parse(None, self.status).created_at)
+            self.assertEqual(status.user.screen_name, 'tweepy')
+            for obj, name in ((status, 'text'), (status, 'source'), (status, 'retweeted_status'),
+                    (status.user, 'id')):
+                self.assertFalse(hasattr(obj, name))
+            self.assert_(factory.project('user: screen_name;status: user,created_at,id') is projected)
+
+    def testkeepraw(self):
+        projected = ModelFactory.project(Projection({'status': ['id', 'created_at']}, keep_raw=True))
+        status = projected.status.parse(None, self.status)
+        self.assertEqual(status.created_at.year, 2010)
+        self.assertEqual(status.source, self.status['source'])
+        self.assertEqual(status.user, self.status['user'])
+
+    def testnested(self):
+        # statuses nest projected users without being projected
+        projected = ModelFactory.project('user: id')
+        status = projected.status.parse(None, self.status)
+        self.assertEqual(status.text, 'hello')
+        self.assertFalse(hasattr(status.user, 'screen_name'))
+        self.assertEqual(status.retweeted_status.user.id, 4)
+        self.assertFalse(hasattr(status.retweeted_status.user, 'screen_name'))
+
+    def testpickle(self):
+        import pickle
+        projected = CompactModelFactory.project('status: id, user; user: screen_name')
+        status = projected.status.parse(None, self.status)
+        for protocol in (0, pickle.HIGHEST_PROTOCOL):
+            copy = pickle.loads(pickle.dumps(status, protocol))
+            self.assertEqual(copy.id, 1)
+            self.assertEqual(copy.user.screen_name, 'tweepy')
+
+    def testapi(self):
+        server, host = start_local_server(TimelineRequestHandler)
+        try:
+            api = API(host=host, projection='status: id, user; user: id')
+            status = api.public_timeline()[3]
+            self.assertEqual(status.user.id, 1)
+            self.assertFalse(hasattr(status, 'text'))
+            self.assertFalse(hasattr(status.user, 'screen_name'))
+
+            status = api.public_timeline(projection='status: text')[3]
+            self.assertEqual(status.text, 'status')
+            self.assertFalse(hasattr(status, 'id'))
+
+            self.assertRaises(TweepError, api.public_timeline, projection='status')
+        finally:
+            server.shutdown()
+
+class TweepyInterningTests(unittest.TestCase):
+
+    def testshared(self):
+        import json
+        payload = '{"id": 1, "source": "<a href=\\"http://tweepy.org\\">tweepy</a>", ' \
+                '"user": {"id": 2, "lang": "en", "time_zone": "Tokyo", "location": null}}'
+        for factory in (ModelFactory, CompactModelFactory, LazyModelFactory):
+            a = factory.status.parse(None, json.loads(payload))
+            b = factory.status.parse(None, json.loads(payload))
+            self.assertEqual(a.source, 'tweepy')
+            self.assertEqual(a.source_url, 'http://tweepy.org')
+            self.assert_(a.source is b.source)
+            self.assert_(a.source_url is b.source_url)
+            self.assert_(a.user.time_zone is b.user.time_zone)
+            self.assert_(a.user.lang is b.user.lang)
+            self.assertEqual(a.user.location, None)
+
+        payload = '{"id": 1, "iso_language_code": "en", "source": "web"}'
+        for factory in (ModelFactory, LazyModelFactory):
+            a = factory.search_result.parse(None, json.loads(payload))
+            b = factory.search_result.parse(None, json.loads(payload))
+            self.assert_(a.iso_language_code is b.iso_language_code)
+
+        a = ModelFactory.status.parse(None, {'source': 'web'})
+        self.assertEqual(a.source, 'web')
+        self.assertFalse(hasattr(a, 'source_url'))
+
+    def testbounded(self):
+        from tweepy import models
+        for i in range(0, models.INTERN_CACHE_SIZE + 10):
+            models.intern_value(str(i))
+            models.parse_source(str(i))
+        self.assert_(len(models._interned) <= models.INTERN_CACHE_SIZE)
+        self.assert_(len(models._sources) <= models.INTERN_CACHE_SIZE)
+
 if __name__ == '__main__':
 
     unittest.main()
@@ -9,13 +9,24 @@ __version__ = '1.6'
 __author__ = 'Joshua Roesslein'
 __license__ = 'MIT'
 
-from tweepy.models import Status, User, DirectMessage, Friendship, SavedSearch, SearchResult, ModelFactory
-from tweepy.error import TweepError
+from tweepy.models import Status, User, DirectMessage, Friendship, SavedSearch, SearchResult, ModelFactory, \
+        CompactModelFactory, LazyModelFactory, Projection
+from tweepy.error import TweepError, TweepTimeout
 from tweepy.api import API
 from tweepy.cache import Cache, MemoryCache, FileCache
+from tweepy.pool import ConnectionPool
+from tweepy.transport import Transport, RecordingTransport, ReplayTransport
+from tweepy.retry import RetryPolicy, ExponentialBackoff
+from tweepy.ratelimit import RateLimiter, SharedRateLimiter
+from tweepy.singleflight import SingleFlight
+from tweepy.identity import IdentityMap
+from tweepy.columns import ColumnSet
+from tweepy.hooks import RequestEvent
+from tweepy.metrics import Metrics
 from tweepy.auth import BasicAuthHandler, OAuthHandler
 from tweepy.streaming import Stream, StreamListener
 from tweepy.cursor import Cursor
+from tweepy.asyncapi import AsyncAPI, AsyncCursor, AsyncResult, EventLoop
 
 # Global, unauthenticated instance of API
 api = API()
@@ -6,9 +6,13 @@ import os
 import mimetypes
 
 from tweepy.binder import bind_api
+from tweepy.batch import run_batch
+from tweepy.compression import TransferStats
 from tweepy.error import TweepError
 from tweepy.parsers import ModelParser
-from tweepy.utils import list_to_csv
+from tweepy.pool import ConnectionPool
+from tweepy.models import ResultSet
+from tweepy.utils import list_to_csv, unique_list
 
 
 class API(object):
@@ -18,7 +22,11 @@ class API(object):
             host='api.twitter.com', search_host='search.twitter.com',
              cache=None, secure=False, api_root='/1', search_root='',
             retry_count=0, retry_delay=0, retry_errors=None,
-            parser=None):
+            parser=None, connection_pool=None,
+            connect_timeout=None, read_timeout=None, deadline=None,
+            retry_policy=None, rate_limiter=None, compression=False,
+            single_flight=None, transport=None, metrics=None,
+            incremental=False, identity_map=None, projection=None):
         self.auth = auth_handler
         self.host = host
         self.search_host = search_host
@@ -29,7 +37,62 @@ class API(object):
         self.retry_count = retry_count
         self.retry_delay = retry_delay
         self.retry_errors = retry_errors
+        self.retry_policy = retry_policy
         self.parser = parser or ModelParser()
+        self.connection_pool = connection_pool or ConnectionPool()
+        self.transport = transport or self.connection_pool
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.deadline = deadline
+        self.rate_limiter = rate_limiter
+        self.compression = compression
+        self.incremental = incremental
+        self.identity_map = identity_map
+        self.projection = projection
+        self.single_flight = single_flight
+        self.transfer_stats = TransferStats()
+        self.hooks = []
+        self.metrics = metrics
+        if metrics is not None:
+            self.add_hook(metrics.observe)
+
+    def add_hook(self, hook):
+        """Call hook(event) with a RequestEvent as each phase of a call ends"""
+        # copy on write, calls in flight keep the list they started with
+        self.hooks = self.hooks + [hook]
+
+    def remove_hook(self, hook):
+        hooks = list(self.hooks)
+        hooks.remove(hook)
+        self.hooks = hooks
+
+    def execute(self, method):
+        """Send the request of a bound API method and return its result"""
+        return method.execute()
+
+    def batch(self, method, arg_list, workers=8, ordered=True):
+        """Call method once per entry of arg_list on a pool of threads.
+
+        method is a bound API method (or its name) and each entry of
+        arg_list a tuple of positional arguments, a dict of keyword
+        arguments or a single argument. Yields a BatchItem holding the
+        result or error of each call, in input order unless ordered is
+        False. Retry policy and rate limiter apply to every call.
+        """
+        if isinstance(method, basestring):
+            method = getattr(self, method)
+        return run_batch(method, arg_list, workers, ordered)
+
+    def map(self, method, arg_list, workers=8):
+        """Like batch() but return a list of results in input order.
+        Calls that failed have their TweepError in place of a result."""
+        results = []
+        for item in self.batch(method, arg_list, workers):
+            if item.error is not None:
+                results.append(item.error)
+            else:
+                results.append(item.result)
+        return results
 
     """ statuses/public_timeline """
     public_timeline = bind_api(
@@ -144,8 +207,79 @@ class API(object):
     )
 
     """ Perform bulk look up of users from user ID or screenname """
-    def lookup_users(self, user_ids=None, screen_names=None):
-        return self._lookup_users(list_to_csv(user_ids), list_to_csv(screen_names))
+    def lookup_users(self, user_ids=None, screen_names=None, workers=4):
+        """Look up any number of users, 100 per request with up to
+        workers requests in flight. Users are returned in input order,
+        ids and names that were not found are listed in .missing.
+        Undecoded payloads of a raw parser are returned as they are,
+        one per request, and missing is None."""
+        user_ids = unique_list(user_ids)
+        screen_names = unique_list(screen_names)
+        size = self.lookup_chunk_size
+        chunks = []
+        for i in range(0, len(user_ids), size):
+            chunks.append({'user_ids': user_ids[i:i + size]})
+        for i in range(0, len(screen_names), size):
+            chunks.append({'screen_names': screen_names[i:i + size]})
+
+        pages = []
+        for item in self.batch(self._lookup_users_chunk, chunks, workers):
+            if item.error is not None:
+                # Twitter answers 404 if none of the users exist
+                response = getattr(item.error, 'response', None)
+                if response is not None and response.status == 404:
+                    continue
+                raise item.error
+            pages.append(item.result)
+
+        results = ResultSet()
+        for page in pages:
+            if not isinstance(page, list):
+                # raw payloads can not be merged
+                results.extend(pages)
+                results.missing = None
+                return results
+
+        by_id = {}
+        by_name = {}
+        for page in pages:
+            for user in page:
+                # models, or dicts from JSONParser
+                if isinstance(user, dict):
+                    user_id, screen_name = user['id'], user['screen_name']
+                else:
+                    user_id, screen_name = user.id, user.screen_name
+                by_id[str(user_id)] = user
+                by_name[screen_name.lower()] = user
+
+        results.missing = []
+        for user_id in user_ids:
+            user = by_id.get(str(user_id))
+            if user is None:
+                results.missing.append(user_id)
+            else:
+                results.append(user)
+        for screen_name in screen_names:
+            user = by_name.get(screen_name.lower())
+            if user is None:
+                results.missing.append(screen_name)
+            else:
+                results.append(user)
+        return results
+
+    """ Turn the output of followers_ids / friends_ids into User models """
+    def hydrate_users(self, user_ids, workers=4):
+        if isinstance(user_ids, tuple):
+            # cursored ids, (ids, (previous_cursor, next_cursor))
+            user_ids = user_ids[0]
+        return self.lookup_users(user_ids=user_ids, workers=workers)
+
+    """ Internal use only """
+    lookup_chunk_size = 100
+
+    def _lookup_users_chunk(self, user_ids=None, screen_names=None):
+        return self._lookup_users(user_id=list_to_csv(user_ids),
+                screen_name=list_to_csv(screen_names))
 
     _lookup_users = bind_api(
         path = '/users/lookup.json',
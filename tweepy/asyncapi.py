@@ -0,0 +1,754 @@
+# Tweepy
+# Copyright 2009-2010 Joshua Roesslein
+# See LICENSE for details.
+
+import asyncore
+import socket
+import heapq
+import time
+import sys
+import mimetools
+from cStringIO import StringIO
+from timeit import default_timer as timer
+
+try:
+    import ssl
+except ImportError:
+    # python 2.5, no https support
+    ssl = None
+
+from tweepy.api import API
+from tweepy.batch import BatchItem, call_with
+from tweepy.error import TweepError, TweepTimeout
+
+
+class AsyncResult(object):
+    """Result of an asynchronous API call, filled in by the event loop"""
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.done = False
+        self.result = None
+        self.error = None
+        self._callbacks = []
+        loop.pending += 1
+
+    def add_callback(self, callback):
+        """Call callback(async_result) once the call has completed"""
+        if self.done:
+            callback(self)
+        else:
+            self._callbacks.append(callback)
+
+    def set_result(self, result):
+        self._complete(result, None)
+
+    def set_error(self, error):
+        self._complete(None, error)
+
+    def _complete(self, result, error):
+        if self.done:
+            return
+        self.done = True
+        self.result = result
+        self.error = error
+        self.loop.pending -= 1
+        callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback(self)
+
+    def get(self):
+        """Run the event loop until the call completes and return its result"""
+        self.loop.run(until=self)
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class EventLoop(object):
+    """select() based loop that drives many requests from a single thread"""
+
+    def __init__(self):
+        self.map = {}
+        self.pending = 0
+        self._timers = []
+        self._seq = 0
+
+    def call_later(self, delay, callback, *args):
+        """Schedule callback(*args) to run in delay seconds"""
+        self._seq += 1
+        timer = [time.time() + delay, self._seq, callback, args]
+        heapq.heappush(self._timers, timer)
+        return timer
+
+    def cancel(self, timer):
+        timer[2] = None
+
+    def _run_timers(self):
+        now = time.time()
+        while self._timers and self._timers[0][0] <= now:
+            when, seq, callback, args = heapq.heappop(self._timers)
+            if callback is not None:
+                callback(*args)
+
+    def step(self):
+        """Run due timers and wait once for socket events"""
+        self._run_timers()
+        timeout = 1.0
+        if self._timers:
+            timeout = max(0, min(timeout, self._timers[0][0] - time.time()))
+        if self.map:
+            asyncore.loop(timeout, map=self.map, count=1)
+        else:
+            time.sleep(timeout)
+        self._run_timers()
+
+    def run(self, until=None):
+        """Run until every AsyncResult (or just until if given) is done"""
+        while True:
+            if until is None and self.pending == 0:
+                break
+            if until is not None and until.done:
+                break
+            if not self.map and not self._timers:
+                if until is not None:
+                    raise TweepError('Event loop ran out of work before call completed')
+                break
+            self.step()
+
+
+class AsyncResponse(object):
+    """Fully read response, mimics the parts of httplib.HTTPResponse we use"""
+
+    def __init__(self, status, reason, msg, body):
+        self.status = status
+        self.reason = reason
+        self.msg = msg
+        self.body = body
+
+    def getheader(self, name, default=None):
+        return self.msg.getheader(name, default)
+
+    def getheaders(self):
+        return self.msg.items()
+
+    def read(self):
+        return self.body
+
+
+class ResponseReader(object):
+    """Incremental HTTP/1.1 response parser"""
+
+    def __init__(self, method):
+        self.method = method
+        self.buffer = ''
+        self.parts = []
+        self.msg = None
+        self.length = None
+        self.received = 0
+        self.chunked = False
+        self.chunk_left = None
+        self.will_close = False
+        self.complete = False
+
+    def feed(self, data):
+        """Feed data read from the socket, returns True once complete"""
+        self.buffer += data
+        if self.msg is None and not self._read_head():
+            return False
+        if self.chunked:
+            self._read_chunks()
+        elif self.length is not None:
+            self.parts.append(self.buffer)
+            self.received += len(self.buffer)
+            self.buffer = ''
+            self.complete = self.received >= self.length
+        else:
+            self.parts.append(self.buffer)
+            self.buffer = ''
+        return self.complete
+
+    def _read_head(self):
+        end = self.buffer.find('\r\n\r\n')
+        if end < 0:
+            return False
+        head, self.buffer = self.buffer[:end], self.buffer[end + 4:]
+        lines = head.split('\r\n', 1)
+        status_line = lines[0].split(None, 2)
+        self.version = status_line[0]
+        self.status = int(status_line[1])
+        if len(status_line) > 2:
+            self.reason = status_line[2]
+        else:
+            self.reason = ''
+        if len(lines) > 1:
+            self.msg = mimetools.Message(StringIO(lines[1] + '\r\n\r\n'))
+        else:
+            self.msg = mimetools.Message(StringIO('\r\n'))
+
+        connection = (self.msg.getheader('connection') or '').lower()
+        self.will_close = connection == 'close' or \
+                (self.version == 'HTTP/1.0' and connection != 'keep-alive')
+
+        if self.method == 'HEAD' or self.status in (204, 304) or self.status < 200:
+            self.length = 0
+        elif (self.msg.getheader('transfer-encoding') or '').lower() == 'chunked':
+            self.chunked = True
+        elif self.msg.getheader('content-length'):
+            self.length = int(self.msg.getheader('content-length'))
+        else:
+            # body ends when the server closes the connection
+            self.will_close = True
+        self.complete = self.length == 0
+        return True
+
+    def _read_chunks(self):
+        while True:
+            if self.chunk_left is None:
+                end = self.buffer.find('\r\n')
+                if end < 0:
+                    return
+                size = int(self.buffer[:end].split(';')[0], 16)
+                if size == 0:
+                    # last chunk, wait for the (empty) trailer
+                    trailer = self.buffer.find('\r\n\r\n', end)
+                    if trailer < 0:
+                        return
+                    self.buffer = self.buffer[trailer + 4:]
+                    self.complete = True
+                    return
+                self.buffer = self.buffer[end + 2:]
+                self.chunk_left = size
+            if len(self.buffer) < self.chunk_left + 2:
+                return
+            self.parts.append(self.buffer[:self.chunk_left])
+            self.buffer = self.buffer[self.chunk_left + 2:]
+            self.chunk_left = None
+
+    def close(self):
+        """Connection closed by server, returns True if that ends the body"""
+        if self.msg is not None and not self.chunked and self.length is None:
+            self.complete = True
+        return self.complete
+
+    def get_response(self):
+        return AsyncResponse(self.status, self.reason, self.msg, ''.join(self.parts))
+
+
+class AsyncConnection(asyncore.dispatcher):
+    """Non-blocking keep-alive connection driven by an EventLoop"""
+
+    def __init__(self, pool, key):
+        asyncore.dispatcher.__init__(self, map=pool.loop.map)
+        self.pool = pool
+        self.pool_key = key
+        scheme, host = key
+        self.secure = scheme == 'https'
+        if ':' in host:
+            hostname, port = host.split(':', 1)
+            port = int(port)
+        elif self.secure:
+            hostname, port = host, 443
+        else:
+            hostname, port = host, 80
+
+        self.outbuf = ''
+        self.reader = None
+        self.callback = None
+        self._handshaking = False
+        self._want_write = False
+        self.create_socket(socket.AF_INET, socket.SOCK_STREAM)
+        try:
+            self.connect((hostname, port))
+        except:
+            self.close()
+            raise
+
+    def send_request(self, data, method, callback):
+        """Send raw request data, callback(resp, error) is called once done"""
+        self.outbuf = data
+        self.reader = ResponseReader(method)
+        self.callback = callback
+
+    def writable(self):
+        return not self.connected or self._want_write or \
+                (len(self.outbuf) > 0 and not self._handshaking)
+
+    def handle_connect(self):
+        if self.secure:
+            if ssl is None:
+                raise TweepError('https requires the ssl module')
+            self.socket = ssl.wrap_socket(self.socket, do_handshake_on_connect=False)
+            self._handshaking = True
+            self._handshake()
+
+    def _handshake(self):
+        try:
+            self.socket.do_handshake()
+        except ssl.SSLError, e:
+            self._want_write = e.args[0] == ssl.SSL_ERROR_WANT_WRITE
+            if e.args[0] not in (ssl.SSL_ERROR_WANT_READ, ssl.SSL_ERROR_WANT_WRITE):
+                raise
+            return
+        self._handshaking = False
+        self._want_write = False
+
+    def handle_write(self):
+        if self._handshaking:
+            self._handshake()
+            return
+        if self.outbuf:
+            sent = self.send(self.outbuf)
+            self.outbuf = self.outbuf[sent:]
+
+    def handle_read(self):
+        if self._handshaking:
+            self._handshake()
+            return
+        while True:
+            try:
+                data = self.recv(65536)
+            except socket.error, e:
+                if ssl and isinstance(e, ssl.SSLError) and \
+                        e.args[0] == ssl.SSL_ERROR_WANT_READ:
+                    return
+                raise
+            if not data:
+                return
+            if self.reader is None:
+                # nothing was asked, the server is talking nonsense
+                self.close()
+                return
+            if self.reader.feed(data):
+                self._complete()
+                return
+            if not (self.secure and self.socket.pending()):
+                return
+
+    def _complete(self):
+        resp = self.reader.get_response()
+        reusable = not self.reader.will_close
+        callback = self.callback
+        self.reader = self.callback = None
+        self.pool.release(self, reusable)
+        callback(resp, None)
+
+    def fail(self, error):
+        """Close connection and report error to whoever is waiting on it"""
+        callback = self.callback
+        self.reader = self.callback = None
+        self.close()
+        self.pool.release(self, False)
+        if callback is not None:
+            callback(None, error)
+
+    def handle_close(self):
+        if self.reader is not None and self.reader.close():
+            self.close()
+            self._complete()
+        else:
+            self.fail(TweepError('Connection closed by server'))
+
+    def handle_error(self):
+        error = sys.exc_info()[1]
+        self.fail(TweepError('Failed to send request: %s' % error))
+
+
+class AsyncConnectionPool(object):
+    """Keep-alive connections for AsyncAPI, bounded per (scheme, host)"""
+
+    def __init__(self, loop, max_size=10, max_connections=100):
+        """Initialize the pool
+            max_size: max number of idle connections kept per (scheme, host)
+            max_connections: max number of open connections per (scheme, host),
+                             further requests are queued
+        """
+        self.loop = loop
+        self.max_size = max_size
+        self.max_connections = max_connections
+        self._idle = {}
+        self._open = {}
+        self._pending = {}
+
+    def request(self, host, secure, method, data, callback):
+        """Send raw request data, callback(resp, error) is called once done.
+        Returns a handle that can be passed to abort()."""
+        if secure:
+            key = ('https', host)
+        else:
+            key = ('http', host)
+        handle = [key, data, method, callback, None]
+        self._pending.setdefault(key, []).append(handle)
+        self._dispatch(key)
+        return handle
+
+    def _dispatch(self, key):
+        pending = self._pending.get(key)
+        while pending:
+            idle = self._idle.get(key)
+            if idle:
+                conn = idle.pop()
+            elif self._open.get(key, 0) < self.max_connections:
+                try:
+                    conn = AsyncConnection(self, key)
+                except socket.error, e:
+                    handle = pending.pop(0)
+                    handle[3](None, TweepError('Failed to send request: %s' % e))
+                    continue
+                self._open[key] = self._open.get(key, 0) + 1
+            else:
+                return
+            handle = pending.pop(0)
+            handle[4] = conn
+            conn.send_request(handle[1], handle[2], handle[3])
+
+    def release(self, conn, reusable):
+        """Called by a connection once its response is complete or it failed"""
+        key = conn.pool_key
+        idle = self._idle.setdefault(key, [])
+        if conn in idle:
+            # idle connection closed by server
+            idle.remove(conn)
+            reusable = False
+        if reusable and len(idle) < self.max_size:
+            idle.append(conn)
+        else:
+            if conn.socket is not None:
+                conn.close()
+            self._open[key] -= 1
+        self._dispatch(key)
+
+    def abort(self, handle, error):
+        """Give up on a request, closing its connection if already sent"""
+        key, data, method, callback, conn = handle
+        if conn is None:
+            pending = self._pending.get(key, [])
+            if handle in pending:
+                pending.remove(handle)
+                callback(None, error)
+        elif conn.callback is callback:
+            conn.fail(error)
+
+    def count(self):
+        """Get count of idle connections currently pooled"""
+        c = 0
+        for idle in self._idle.values():
+            c += len(idle)
+        return c
+
+    def clear(self):
+        """Close all idle connections"""
+        for key, idle in self._idle.items():
+            for conn in idle:
+                conn.close()
+                self._open[key] -= 1
+        self._idle.clear()
+
+
+def build_request(method, url, headers, body):
+    lines = ['%s %s HTTP/1.1' % (method, url)]
+    headers = dict(headers)
+    if body is not None:
+        headers['Content-Length'] = str(len(body))
+    elif method in ('POST', 'PUT'):
+        headers['Content-Length'] = '0'
+    for k, v in headers.items():
+        lines.append('%s: %s' % (k, v))
+    lines.append('')
+    lines.append(body or '')
+    return '\r\n'.join(lines)
+
+
+class AsyncCall(object):
+    """Drives one bound API method through the event loop.
+
+    Phases are reported to the API hooks like for blocking calls,
+    except rate_limit, which never waits, connect and first_byte:
+    send ends once the request is queued on the pool and read once
+    the whole response arrived.
+    """
+
+    def __init__(self, api, method, result):
+        self.api = api
+        self.method = method
+        self.result = result
+        self.timer = None
+        self.handle = None
+
+    def start(self):
+        method = self.method
+        method.started = time.time()
+        if method.hooks:
+            method.last_mark = self.call_started = timer()
+        method.url = self.url = method.build_url()
+        self.credential = method.get_credential()
+        self.retries_performed = 0
+        try:
+            cache_result = method.get_cached(self.url)
+        except TweepError, e:
+            self.set_error(e)
+            return
+        if self.api.cache and method.cacheable:
+            method.cache_hit = bool(cache_result)
+            method.mark('cache_lookup')
+        if cache_result:
+            self.set_result(cache_result)
+            return
+        self.send()
+
+    def set_result(self, result):
+        if self.method.hooks:
+            self.method.mark('complete', since=self.call_started)
+        self.result.set_result(result)
+
+    def set_error(self, error):
+        if self.method.hooks:
+            self.method.error = error
+            self.method.mark('complete', since=self.call_started)
+        self.result.set_error(error)
+
+    def send(self):
+        method = self.method
+        try:
+            # Wait for rate limit budget without blocking the loop
+            limiter = self.api.rate_limiter
+            if limiter and not limiter.acquire(self.credential, method.endpoint,
+                    blocking=False):
+                budget = limiter.budget(self.credential, method.endpoint)
+                if budget is None:
+                    delay = 0
+                else:
+                    delay = budget[2] - time.time()
+                self.retry_later(delay, TweepError('Rate limit exhausted for %s' % method.endpoint))
+                return
+
+            # Apply authentication
+            if self.api.auth:
+                self.api.auth.apply_auth(
+                        method.scheme + method.host + self.url,
+                        method.method, method.headers, method.parameters
+                )
+                method.mark('auth')
+
+            connect_timeout, read_timeout = method.build_timeouts()
+            remaining = method.time_left()
+            data = build_request(method.method, self.url, method.headers,
+                    method.post_data)
+        except TweepError, e:
+            self.set_error(e)
+            return
+
+        self.handle = self.api.async_pool.request(method.host,
+                self.api.secure, method.method, data, self.on_response)
+        method.mark('send', len(self.url) + len(method.post_data or ''))
+        timeout = None
+        for t in (connect_timeout, read_timeout):
+            if t is not None:
+                timeout = t + (timeout or 0)
+        # Both timeouts are clamped to the deadline, so is their sum
+        if remaining is not None and (timeout is None or timeout > remaining):
+            timeout = remaining
+        if timeout is not None:
+            self.timer = self.api.loop.call_later(timeout,
+                    self.api.async_pool.abort, self.handle,
+                    TweepTimeout('Request timed out'))
+
+    def retry_later(self, delay, error):
+        # Schedule another attempt unless it would run past the deadline
+        try:
+            remaining = self.method.time_left()
+        except TweepTimeout, e:
+            self.set_error(e)
+            return
+        if remaining is not None and remaining <= delay:
+            if self.method.deadline is not None:
+                error = TweepTimeout('Request deadline of %s seconds exceeded' % self.method.deadline)
+            self.set_error(error)
+            return
+        self.api.loop.call_later(delay, self.retry)
+
+    def retry(self):
+        self.method.mark('retry_wait')
+        self.send()
+
+    def on_response(self, resp, error):
+        if self.timer is not None:
+            self.api.loop.cancel(self.timer)
+            self.timer = None
+        if resp is not None:
+            self.method.status = resp.status
+            self.method.mark('read', len(resp.body))
+        try:
+            self.handle_response(resp, error)
+        except Exception, e:
+            if not isinstance(e, TweepError):
+                e = TweepError(e)
+            self.set_error(e)
+
+    def handle_response(self, resp, error):
+        method = self.method
+        policy = method.retry_policy
+        limiter = self.api.rate_limiter
+        if error is None and limiter:
+            limiter.update_from_response(self.credential, method.endpoint, resp)
+
+        if error is not None:
+            # No response, only retry if safe to resend
+            if not policy.should_retry(method, self.retries_performed, error=error):
+                self.set_error(error)
+                return
+            delay = policy.delay(self.retries_performed)
+        else:
+            if not policy.should_retry(method, self.retries_performed, resp=resp):
+                self.set_result(method.build_result(self.url, resp, resp.read()))
+                return
+            delay = policy.delay(self.retries_performed, resp)
+            error = TweepError('Twitter error response: status code = %s' % resp.status, resp)
+
+        self.retries_performed += 1
+        method.retries = self.retries_performed
+        self.retry_later(delay, error)
+
+
+class AsyncAPI(API):
+    """Twitter API for event driven programs.
+
+    Every method takes the same arguments as its API counterpart but
+    returns an AsyncResult right away. Requests progress while the event
+    loop runs, so one thread can keep many calls in flight:
+
+        api = AsyncAPI(auth)
+        results = [api.get_status(id) for id in ids]
+        api.run()
+
+    Helpers which catch TweepError to return False (verify_credentials,
+    exists_block, test...) instead report the error through the result.
+    """
+
+    def __init__(self, *args, **kargs):
+        self.loop = kargs.pop('loop', None) or EventLoop()
+        async_pool = kargs.pop('async_pool', None)
+        API.__init__(self, *args, **kargs)
+        self.async_pool = async_pool or AsyncConnectionPool(self.loop)
+
+    def execute(self, method):
+        result = AsyncResult(self.loop)
+        AsyncCall(self, method, result).start()
+        return result
+
+    def run(self):
+        """Run the event loop until all calls have completed"""
+        self.loop.run()
+
+    def batch(self, method, arg_list, workers=100, ordered=True):
+        """Same as API.batch, but calls run on the event loop with at
+        most workers of them in flight instead of on threads."""
+        if isinstance(method, basestring):
+            method = getattr(self, method)
+        tasks = enumerate(arg_list)
+        completed = []
+        state = {'in_flight': 0}
+
+        def finish(call, index, args):
+            state['in_flight'] -= 1
+            completed.append(BatchItem(index, args, call.result, call.error))
+
+        def issue():
+            while state['in_flight'] < workers:
+                try:
+                    index, args = tasks.next()
+                except StopIteration:
+                    return
+                try:
+                    call = call_with(method, args)
+                except Exception, e:
+                    completed.append(BatchItem(index, args, error=e))
+                    continue
+                state['in_flight'] += 1
+                call.add_callback(lambda call, index=index, args=args: finish(call, index, args))
+
+        waiting = {}
+        next_index = 0
+        issue()
+        while completed or state['in_flight']:
+            if not completed:
+                self.loop.step()
+            while completed:
+                item = completed.pop(0)
+                if not ordered:
+                    yield item
+                    continue
+                waiting[item.index] = item
+                while next_index in waiting:
+                    yield waiting.pop(next_index)
+                    next_index += 1
+            issue()
+
+
+class AsyncCursor(object):
+    """Pagination helper for AsyncAPI methods"""
+
+    def __init__(self, method, *args, **kargs):
+        if not hasattr(method, 'pagination_mode'):
+            raise TweepError('This method does not perform pagination')
+        self.method = method
+        self.args = args
+        self.kargs = kargs
+
+    def pages(self, callback, limit=0):
+        """Call callback(page) for each page as it arrives.
+        Returning False from callback stops paging. Returns an AsyncResult
+        that completes with the number of pages once paging is over."""
+        loop = self.method.im_self.loop
+        done = AsyncResult(loop)
+        state = {'page': 0, 'cursor': -1}
+
+        def fetch():
+            state['page'] += 1
+            if self.method.pagination_mode == 'cursor':
+                call = self.method(cursor=state['cursor'], *self.args, **self.kargs)
+            else:
+                call = self.method(page=state['page'], *self.args, **self.kargs)
+            call.add_callback(on_page)
+
+        def on_page(call):
+            if call.error is not None:
+                done.set_error(call.error)
+                return
+            data = call.result
+            if self.method.pagination_mode == 'cursor':
+                data, cursors = data
+                state['cursor'] = cursors[1]
+            if len(data) == 0:
+                done.set_result(state['page'] - 1)
+                return
+            if callback(data) is False or (limit and state['page'] >= limit) \
+                    or state['cursor'] == 0:
+                done.set_result(state['page'])
+                return
+            fetch()
+
+        fetch()
+        return done
+
+    def items(self, callback, limit=0):
+        """Call callback(item) for each item as pages arrive.
+        Returning False from callback stops. Returns an AsyncResult
+        that completes with the number of items seen."""
+        state = {'count': 0}
+
+        def on_page(page):
+            for item in page:
+                state['count'] += 1
+                if callback(item) is False or (limit and state['count'] >= limit):
+                    return False
+
+        done = AsyncResult(self.method.im_self.loop)
+        pages = self.pages(on_page)
+        def finish(call):
+            if call.error is not None:
+                done.set_error(call.error)
+            else:
+                done.set_result(state['count'])
+        pages.add_callback(finish)
+        return done
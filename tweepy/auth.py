@@ -2,12 +2,13 @@
 # Copyright 2009-2010 Joshua Roesslein
 # See LICENSE for details.
 
-from urllib2 import Request, urlopen
+from urlparse import urlparse
 import base64
 
 from tweepy import oauth
 from tweepy.error import TweepError
 from tweepy.api import API
+from tweepy.pool import ConnectionPool
 
 
 class AuthHandler(object):
@@ -20,6 +21,10 @@ class AuthHandler(object):
         """Return the username of the authenticated user"""
         raise NotImplementedError
 
+    def get_identity(self):
+        """Return a key identifying the credentials, without network access"""
+        return id(self)
+
 
 class BasicAuthHandler(AuthHandler):
 
@@ -33,6 +38,9 @@ class BasicAuthHandler(AuthHandler):
     def get_username(self):
         return self.username
 
+    def get_identity(self):
+        return self.username
+
 
 class OAuthHandler(AuthHandler):
     """OAuth authentication handler"""
@@ -40,7 +48,8 @@ class OAuthHandler(AuthHandler):
     OAUTH_HOST = 'twitter.com'
     OAUTH_ROOT = '/oauth/'
 
-    def __init__(self, consumer_key, consumer_secret, callback=None, secure=False):
+    def __init__(self, consumer_key, consumer_secret, callback=None, secure=False,
+            connection_pool=None):
         self._consumer = oauth.OAuthConsumer(consumer_key, consumer_secret)
         self._sigmethod = oauth.OAuthSignatureMethod_HMAC_SHA1()
         self.request_token = None
@@ -48,6 +57,7 @@ class OAuthHandler(AuthHandler):
         self.callback = callback
         self.username = None
         self.secure = secure
+        self.connection_pool = connection_pool or ConnectionPool()
 
     def _get_oauth_url(self, endpoint, secure=False):
         if self.secure or secure:
@@ -57,6 +67,28 @@ class OAuthHandler(AuthHandler):
 
         return prefix + self.OAUTH_HOST + self.OAUTH_ROOT + endpoint
 
+    def _fetch_token(self, url, headers=None, post_data=None):
+        scheme, host, path, params, query = urlparse(url)[0:5]
+        if query:
+            path += '?' + query
+        headers = dict(headers or {})
+        if post_data is None:
+            method = 'GET'
+        else:
+            method = 'POST'
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        conn, resp = self.connection_pool.request(host, method, path,
+                post_data, headers, scheme == 'https')
+        try:
+            payload = resp.read()
+        except:
+            self.connection_pool.discard(conn)
+            raise
+        self.connection_pool.put(conn)
+        if resp.status != 200:
+            raise TweepError('OAuth token request failed: status code = %s' % resp.status)
+        return oauth.OAuthToken.from_string(payload)
+
     def apply_auth(self, url, method, headers, parameters):
         request = oauth.OAuthRequest.from_consumer_and_token(
             self._consumer, http_url=url, http_method=method,
@@ -72,8 +104,7 @@ class OAuthHandler(AuthHandler):
                 self._consumer, http_url=url, callback=self.callback
             )
             request.sign_request(self._sigmethod, self._consumer, None)
-            resp = urlopen(Request(url, headers=request.to_header()))
-            return oauth.OAuthToken.from_string(resp.read())
+            return self._fetch_token(url, headers=request.to_header())
         except Exception, e:
             raise TweepError(e)
 
@@ -119,8 +150,7 @@ class OAuthHandler(AuthHandler):
             request.sign_request(self._sigmethod, self._consumer, self.request_token)
 
             # send request
-            resp = urlopen(Request(url, headers=request.to_header()))
-            self.access_token = oauth.OAuthToken.from_string(resp.read())
+            self.access_token = self._fetch_token(url, headers=request.to_header())
             return self.access_token
         except Exception, e:
             raise TweepError(e)
@@ -145,12 +175,16 @@ class OAuthHandler(AuthHandler):
             )
             request.sign_request(self._sigmethod, self._consumer, None)
 
-            resp = urlopen(Request(url, data=request.to_postdata()))
-            self.access_token = oauth.OAuthToken.from_string(resp.read())
+            self.access_token = self._fetch_token(url, post_data=request.to_postdata())
             return self.access_token
         except Exception, e:
             raise TweepError(e)
 
+    def get_identity(self):
+        if self.access_token:
+            return self.access_token.key
+        return self._consumer.key
+
     def get_username(self):
         if self.username is None:
             api = API(self)
@@ -0,0 +1,90 @@
+# Tweepy
+# Copyright 2009-2010 Joshua Roesslein
+# See LICENSE for details.
+
+import threading
+import Queue
+
+
+class BatchItem(object):
+    """Outcome of one call made by a batch"""
+
+    def __init__(self, index, args, result=None, error=None):
+        self.index = index
+        self.args = args
+        self.result = result
+        self.error = error
+
+    def __repr__(self):
+        if self.error is not None:
+            return '<BatchItem %i error=%r>' % (self.index, self.error)
+        return '<BatchItem %i result=%r>' % (self.index, self.result)
+
+
+def call_with(func, args):
+    """Call func with a batch argument: a tuple of positional arguments,
+    a dict of keyword arguments or a single positional argument."""
+    if isinstance(args, tuple):
+        return func(*args)
+    elif isinstance(args, dict):
+        return func(**args)
+    return func(args)
+
+
+def run_batch(func, arg_list, workers=8, ordered=True):
+    """Call func once for each entry of arg_list on a pool of threads.
+
+    Yields a BatchItem per call, in input order if ordered is True,
+    otherwise as the calls complete. Errors raised by a call are
+    stored on its item instead of aborting the batch. arg_list is
+    consumed lazily, so it may be a generator.
+    """
+    tasks = enumerate(arg_list)
+    task_lock = threading.Lock()
+    results = Queue.Queue()
+    stopped = threading.Event()
+
+    def worker():
+        while not stopped.isSet():
+            task_lock.acquire()
+            try:
+                try:
+                    index, args = tasks.next()
+                except StopIteration:
+                    break
+            finally:
+                task_lock.release()
+
+            try:
+                item = BatchItem(index, args, result=call_with(func, args))
+            except Exception, e:
+                item = BatchItem(index, args, error=e)
+            results.put(item)
+        results.put(None)
+
+    threads = []
+    for i in range(0, workers):
+        t = threading.Thread(target=worker)
+        t.setDaemon(True)
+        t.start()
+        threads.append(t)
+
+    try:
+        running = len(threads)
+        waiting = {}
+        next_index = 0
+        while running:
+            item = results.get()
+            if item is None:
+                running -= 1
+                continue
+            if not ordered:
+                yield item
+                continue
+            waiting[item.index] = item
+            while next_index in waiting:
+                yield waiting.pop(next_index)
+                next_index += 1
+    finally:
+        # consumer may stop early, let workers wind down
+        stopped.set()
@@ -2,22 +2,46 @@
 # Copyright 2009-2010 Joshua Roesslein
 # See LICENSE for details.
 
-import httplib
 import urllib
 import time
+import sys
 import re
-
-from tweepy.error import TweepError
+import socket
+
+from tweepy.error import TweepError, TweepTimeout
+from tweepy.retry import RetryPolicy
+from tweepy.compression import ACCEPT_ENCODING, Decompressor, decode_payload
+from tweepy.jsonstream import JSONArrayReader, ResultIterator
+from tweepy.hooks import RequestEvent, timer
+from tweepy.models import Model
 from tweepy.utils import convert_to_utf8_str
 
 re_path_template = re.compile('{\w+}')
 
 
+def compile_path(path):
+    """Split a path template into (literal, variable) segments.
+    variable is None for the trailing literal."""
+    literals = re_path_template.split(path)
+    variables = [v.strip('{}') for v in re_path_template.findall(path)]
+    return tuple(zip(literals, variables + [None]))
+
+
+def encode_parameters(parameters, quoted_names={}):
+    """URL encode a dict of utf-8 string parameters. Keys are
+    sorted so equal calls map to the same URL and cache key.
+    quoted_names maps known parameter names to their encoding."""
+    quote_plus = urllib.quote_plus
+    return '&'.join([(quoted_names.get(k) or quote_plus(k)) + '=' + quote_plus(v)
+            for k, v in sorted(parameters.iteritems())])
+
+
 def bind_api(**config):
 
     class APIMethod(object):
 
         path = config['path']
+        endpoint = config['path']
         payload_type = config.get('payload_type', None)
         payload_list = config.get('payload_list', False)
         allowed_param = config.get('allowed_param', [])
@@ -25,6 +49,29 @@ def bind_api(**config):
         require_auth = config.get('require_auth', False)
         search_api = config.get('search_api', False)
 
+        # Call plan, compiled once per endpoint so a call
+        # only has to bind and encode its arguments.
+        path_segments = compile_path(path)
+        path_variables = len(path_segments) > 1
+        quoted_params = dict([(name, urllib.quote_plus(name))
+                for name in allowed_param])
+        cacheable = method == 'GET'
+        call_options = frozenset(['retry_count', 'retry_delay', 'retry_errors',
+                'retry_policy', 'connect_timeout', 'read_timeout', 'deadline',
+                'incremental', 'identity_map', 'projection'])
+        if search_api:
+            root_attr, host_attr = 'search_root', 'search_host'
+        else:
+            root_attr, host_attr = 'api_root', 'host'
+
+        # Progress of the call, reported to hooks
+        url = None
+        status = None
+        retries = 0
+        cache_hit = False
+        error = None
+        last_mark = None
+
         def __init__(self, api, args, kargs):
             # If authentication is required and no credentials
             # are provided, throw an error.
@@ -32,31 +79,41 @@ def bind_api(**config):
                 raise TweepError('Authentication required!')
 
             self.api = api
+            self.hooks = api.hooks
             self.post_data = kargs.pop('post_data', None)
-            self.retry_count = kargs.pop('retry_count', api.retry_count)
-            self.retry_delay = kargs.pop('retry_delay', api.retry_delay)
-            self.retry_errors = kargs.pop('retry_errors', api.retry_errors)
             self.headers = kargs.pop('headers', {})
-            self.build_parameters(args, kargs)
 
-            # Pick correct URL root to use
-            if self.search_api:
-                self.api_root = api.search_root
-            else:
-                self.api_root = api.api_root
+            # Per call options default to the API settings
+            self.retry_count = api.retry_count
+            self.retry_delay = api.retry_delay
+            self.retry_errors = api.retry_errors
+            self.retry_policy = api.retry_policy
+            self.connect_timeout = api.connect_timeout
+            self.read_timeout = api.read_timeout
+            self.deadline = api.deadline
+            self.incremental = api.incremental
+            self.identity_map = api.identity_map
+            self.projection = api.projection
+            if kargs:
+                for name in self.call_options.intersection(kargs):
+                    setattr(self, name, kargs.pop(name))
+            if self.retry_policy is None:
+                self.retry_policy = RetryPolicy(self.retry_count,
+                        self.retry_delay, self.retry_errors)
 
-            # Perform any path variable substitution
-            self.build_path()
+            self.build_parameters(args, kargs)
 
+            # Pick correct URL root and host to use
+            self.api_root = getattr(api, self.root_attr)
+            self.host = getattr(api, self.host_attr)
             if api.secure:
                 self.scheme = 'https://'
             else:
                 self.scheme = 'http://'
 
-            if self.search_api:
-                self.host = api.search_host
-            else:
-                self.host = api.host
+            # Perform any path variable substitution
+            if self.path_variables:
+                self.build_path()
 
             # Manually set Host header to fix an issue in python 2.5
             # or older where Host is set including the 443 port.
@@ -64,6 +121,9 @@ def bind_api(**config):
             # See Issue http://github.com/joshthecoder/tweepy/issues/#issue/12
             self.headers['Host'] = self.host
 
+            if api.compression:
+                self.headers['Accept-Encoding'] = ACCEPT_ENCODING
+
         def build_parameters(self, args, kargs):
             self.parameters = {}
             for idx, arg in enumerate(args):
@@ -82,50 +142,204 @@ def bind_api(**config):
                 self.parameters[k] = convert_to_utf8_str(arg)
 
         def build_path(self):
-            for variable in re_path_template.findall(self.path):
-                name = variable.strip('{}')
+            path = []
+            for literal, name in self.path_segments:
+                path.append(literal)
+                if name is None:
+                    continue
 
                 if name == 'user' and self.api.auth:
                     value = self.api.auth.get_username()
                 else:
                     try:
-                        value = urllib.quote(self.parameters[name])
+                        value = urllib.quote(self.parameters.pop(name))
                     except KeyError:
                         raise TweepError('No parameter value found for path variable: %s' % name)
-                    del self.parameters[name]
-
-                self.path = self.path.replace(variable, value)
+                path.append(value)
+
+            self.path = ''.join(path)
+
+        def time_left(self):
+            """Seconds left before the deadline, None if there is none"""
+            if self.deadline is None:
+                return None
+            remaining = self.started + self.deadline - time.time()
+            if remaining <= 0:
+                raise TweepTimeout('Request deadline of %s seconds exceeded' % self.deadline)
+            return remaining
+
+        def build_timeouts(self):
+            # Clamp socket timeouts so no attempt outlives the deadline
+            remaining = self.time_left()
+            connect_timeout, read_timeout = self.connect_timeout, self.read_timeout
+            if remaining is not None:
+                if connect_timeout is None or connect_timeout > remaining:
+                    connect_timeout = remaining
+                if read_timeout is None or read_timeout > remaining:
+                    read_timeout = remaining
+            return connect_timeout, read_timeout
+
+        def acquire_rate_limit(self, credential):
+            limiter = self.api.rate_limiter
+            if limiter.auto_seed and not limiter.is_seeded(credential):
+                limiter.seed(self.api)
+            if limiter.acquire(credential, self.endpoint, timeout=self.time_left()):
+                return
+            if limiter.blocking:
+                raise TweepTimeout('Request deadline of %s seconds exceeded' % self.deadline)
+            raise TweepError('Rate limit exhausted for %s' % self.endpoint)
+
+        def mark(self, phase, bytes=None, since=None):
+            """Report the phase that just ended to the API hooks"""
+            if not self.hooks or self.last_mark is None:
+                return
+            now = timer()
+            if since is None:
+                since = self.last_mark
+            event = RequestEvent(self, phase, since, now, bytes)
+            self.last_mark = now
+            for hook in self.hooks:
+                hook(event)
+
+        def trace(self, phase):
+            # Progress reported by the transport, a send
+            # carries the size of the request target and body.
+            if phase == 'send':
+                self.mark(phase, len(self.url) + len(self.post_data or ''))
+            else:
+                self.mark(phase)
 
-        def execute(self):
-            # Build the request URL
+        def build_url(self):
             url = self.api_root + self.path
-            if len(self.parameters):
-                url = '%s?%s' % (url, urllib.urlencode(self.parameters))
-
+            if self.parameters:
+                url = '%s?%s' % (url, encode_parameters(self.parameters, self.quoted_params))
+            return url
+
+        def restore_api(self, cache_result):
+            # must restore api reference, results of other
+            # parsers are dicts, strings or numbers
+            if isinstance(cache_result, (list, tuple)):
+                for result in cache_result:
+                    self.restore_api(result)
+            elif isinstance(cache_result, Model):
+                cache_result._api = self.api
+            return cache_result
+
+        def get_cached(self, url):
             # Query the cache if one is available
             # and this request uses a GET method.
-            if self.api.cache and self.method == 'GET':
+            self.stale_result = None
+            if self.api.cache and self.cacheable:
                 cache_result = self.api.cache.get(url)
                 # if cache result found and not expired, return it
                 if cache_result:
-                    # must restore api reference
-                    if isinstance(cache_result, list):
-                        for result in cache_result:
-                            result._api = self.api
-                    else:
-                        cache_result._api = self.api
-                    return cache_result
+                    return self.restore_api(cache_result)
+
+                # If an expired entry has validators, ask the server
+                # to only send the payload again if it changed.
+                stale = self.api.cache.get_stale(url)
+                if stale:
+                    self.stale_result, validators = stale
+                    if validators.get('etag'):
+                        self.headers['If-None-Match'] = validators['etag']
+                    if validators.get('last-modified'):
+                        self.headers['If-Modified-Since'] = validators['last-modified']
+            return None
+
+        def get_credential(self):
+            if self.api.auth:
+                return self.api.auth.get_identity()
+            return None
+
+        def build_result(self, url, resp, payload):
+            self.api.last_response = resp
+            self.status = resp.status
+            payload = decode_payload(resp, payload, self.api.transfer_stats)
+
+            # Stale cache entry is still current, reuse it without parsing
+            if resp.status == 304 and self.stale_result:
+                self.api.cache.touch(url)
+                return self.restore_api(self.stale_result)
+
+            # If an error was returned, throw an exception
+            if resp.status != 200:
+                try:
+                    error_msg = self.api.parser.parse_error(payload)
+                except Exception:
+                    error_msg = "Twitter error response: status code = %s" % resp.status
+                raise TweepError(error_msg, resp)
+
+            # Parse the response payload
+            result = self.api.parser.parse(self, payload)
 
+            # Store result into cache if one is available.
+            if self.api.cache and self.cacheable and result:
+                validators = {}
+                if self.api.cache.keeps_validators():
+                    for header in ('etag', 'last-modified'):
+                        value = resp.getheader(header)
+                        if value:
+                            validators[header] = value
+                if validators:
+                    self.api.cache.store(url, result, validators)
+                else:
+                    # caches written before validators only take two
+                    self.api.cache.store(url, result)
+                self.mark('cache_store')
+
+            return result
+
+        def execute(self):
+            self.started = time.time()
+            if self.hooks:
+                self.last_mark = call_started = timer()
+
+            # Build the request URL
+            self.url = url = self.build_url()
+
+            try:
+                result = self.get_result(url)
+            except Exception:
+                if self.hooks:
+                    # hooks may raise and catch their own errors
+                    exc_type, self.error, tb = sys.exc_info()
+                    self.mark('complete', since=call_started)
+                    raise exc_type, self.error, tb
+                raise
+
+            if self.hooks:
+                self.mark('complete', since=call_started)
+            return result
+
+        def get_result(self, url):
+            cache_result = self.get_cached(url)
+            if self.api.cache and self.cacheable:
+                self.cache_hit = bool(cache_result)
+                self.mark('cache_lookup')
+            if cache_result:
+                return cache_result
+
+            # Share the result of an identical GET already in flight
+            flights = self.api.single_flight
+            if flights and self.method == 'GET' and not self.incremental:
+                key = (self.scheme, self.host, url, self.get_credential())
+                return flights.do(key, lambda: self.send(url), self.time_left())
+            return self.send(url)
+
+        def send(self, url):
             # Continue attempting request until successful
-            # or maximum number of retries is reached.
+            # or the retry policy gives up.
+            transport = self.api.transport
+            policy = self.retry_policy
+            limiter = self.api.rate_limiter
+            credential = self.get_credential()
+            trace = self.hooks and self.trace or None
             retries_performed = 0
-            while retries_performed < self.retry_count + 1:
-                # Open connection
-                # FIXME: add timeout
-                if self.api.secure:
-                    conn = httplib.HTTPSConnection(self.host)
-                else:
-                    conn = httplib.HTTPConnection(self.host)
+            while True:
+                # Wait for rate limit budget
+                if limiter:
+                    self.acquire_rate_limit(credential)
+                    self.mark('rate_limit')
 
                 # Apply authentication
                 if self.api.auth:
@@ -133,49 +347,108 @@ def bind_api(**config):
                             self.scheme + self.host + url,
                             self.method, self.headers, self.parameters
                     )
+                    self.mark('auth')
 
-                # Execute request
+                # Execute request over the transport
+                connect_timeout, read_timeout = self.build_timeouts()
                 try:
-                    conn.request(self.method, url, headers=self.headers, body=self.post_data)
-                    resp = conn.getresponse()
+                    conn, resp = transport.request(self.host, self.method, url,
+                            self.post_data, self.headers, self.api.secure,
+                            connect_timeout, read_timeout, trace)
+                except socket.timeout:
+                    error = TweepTimeout('Request timed out')
                 except Exception, e:
-                    raise TweepError('Failed to send request: %s' % e)
-
-                # Exit request loop if non-retry error code
-                if self.retry_errors:
-                    if resp.status not in self.retry_errors: break
+                    error = TweepError('Failed to send request: %s' % e)
                 else:
-                    if resp.status == 200: break
-
-                # Sleep before retrying request again
-                time.sleep(self.retry_delay)
+                    error = None
+                    self.status = resp.status
+                    self.mark('first_byte')
+                    if limiter:
+                        limiter.update_from_response(credential, self.endpoint, resp)
+
+                if error is not None:
+                    # No response, only retry if safe to resend
+                    if not policy.should_retry(self, retries_performed, error=error):
+                        raise error
+                    delay = policy.delay(retries_performed)
+                else:
+                    # Exit request loop if policy does not retry this response
+                    if not policy.should_retry(self, retries_performed, resp=resp):
+                        break
+                    delay = policy.delay(retries_performed, resp)
+
+                    # Drain the failed response so the connection can be reused
+                    self.read_response(conn, resp)
+
+                # Sleep before retrying request again,
+                # unless doing so would run past the deadline.
+                remaining = self.time_left()
+                if remaining is not None and remaining <= delay:
+                    raise TweepTimeout('Request deadline of %s seconds exceeded' % self.deadline)
+                time.sleep(delay)
                 retries_performed += 1
+                self.retries = retries_performed
+                self.mark('retry_wait')
 
-            # If an error was returned, throw an exception
-            self.api.last_response = resp
-            if resp.status != 200:
-                try:
-                    error_msg = self.api.parser.parse_error(resp.read())
-                except Exception:
-                    error_msg = "Twitter error response: status code = %s" % resp.status
-                raise TweepError(error_msg, resp)
-
-            # Parse the response payload
-            result = self.api.parser.parse(self, resp.read())
-
-            conn.close()
+            if self.incremental and self.payload_list and resp.status == 200:
+                return self.iter_result(conn, resp)
+            payload = self.read_response(conn, resp)
+            return self.build_result(url, resp, payload)
 
-            # Store result into cache if one is available.
-            if self.api.cache and self.method == 'GET' and result:
-                self.api.cache.store(url, result)
+        def iter_result(self, conn, resp):
+            # Build results as list items arrive instead of
+            # reading and decoding the whole payload first.
+            self.api.last_response = resp
+            transport = self.api.transport
+            stats = self.api.transfer_stats
+            decoder = Decompressor(resp.getheader('content-encoding'))
 
-            return result
+            def read(size):
+                while True:
+                    try:
+                        data = resp.read(size)
+                    except socket.timeout:
+                        raise TweepTimeout('Request timed out')
+                    except Exception, e:
+                        raise TweepError('Failed to read response: %s' % e)
+                    if not data:
+                        return decoder.flush()
+                    decoded = decoder.decompress(data)
+                    stats.add(len(data), len(decoded))
+                    if decoded:
+                        return decoded
+
+            def release(complete):
+                # Only a fully read response leaves the connection reusable
+                if complete and resp.isclosed():
+                    transport.put(conn)
+                else:
+                    transport.discard(conn)
+
+            reader = JSONArrayReader(read, json_lib=getattr(self.api.parser, 'json_lib', None))
+            items = self.api.parser.parse_incremental(self, reader)
+            return ResultIterator(items, reader, release)
+
+        def read_response(self, conn, resp):
+            # Read the whole body and hand the connection back to the transport
+            transport = self.api.transport
+            try:
+                payload = resp.read()
+            except socket.timeout:
+                transport.discard(conn)
+                raise TweepTimeout('Request timed out')
+            except Exception, e:
+                transport.discard(conn)
+                raise TweepError('Failed to read response: %s' % e)
+            transport.put(conn)
+            self.mark('read', len(payload))
+            return payload
 
 
     def _call(api, *args, **kargs):
 
         method = APIMethod(api, args, kargs)
-        return method.execute()
+        return api.execute(method)
 
 
     # Set pagination mode
@@ -30,10 +30,12 @@ class Cache(object):
         """
         self.timeout = timeout
 
-    def store(self, key, value):
+    def store(self, key, value, validators=None):
         """Add new record to cache
             key: entry key
             value: data of entry
+            validators: dict of ETag / Last-Modified headers used to
+                        revalidate the entry once expired [optional]
         """
         raise NotImplementedError
 
@@ -44,6 +46,21 @@ class Cache(object):
         """
         raise NotImplementedError
 
+    def get_stale(self, key):
+        """Get (value, validators) of an entry even if expired.
+        Returns None if there is no entry or it has no validators.
+        Caches that do not keep validators need not implement it.
+        """
+        return None
+
+    def touch(self, key):
+        """Mark entry as fresh again, extending its life by another timeout"""
+        pass
+
+    def keeps_validators(self):
+        """True if store() takes validators, which get_stale returns"""
+        return type(self).get_stale.im_func is not Cache.get_stale.im_func
+
     def count(self):
         """Get count of entries currently stored in cache"""
         raise NotImplementedError
@@ -72,15 +89,21 @@ class MemoryCache(Cache):
     def __setstate__(self, state):
         # unpickle
         self.lock = threading.Lock()
-        self._entries = state['entries']
+        # entries pickled before validators were introduced
+        # only hold (created_time, value)
+        entries = state['entries']
+        for key, entry in entries.items():
+            if len(entry) == 2:
+                entries[key] = entry + (None,)
+        self._entries = entries
         self.timeout = state['timeout']
 
     def _is_expired(self, entry, timeout):
         return timeout > 0 and (time.time() - entry[0]) >= timeout
 
-    def store(self, key, value):
+    def store(self, key, value, validators=None):
         self.lock.acquire()
-        self._entries[key] = (time.time(), value)
+        self._entries[key] = (time.time(), value, validators)
         self.lock.release()
 
     def get(self, key, timeout=None):
@@ -100,7 +123,9 @@ class MemoryCache(Cache):
             # make sure entry is not expired
             if self._is_expired(entry, timeout):
                 # entry expired, delete and return nothing
-                del self._entries[key]
+                # unless it can still be revalidated.
+                if not entry[2]:
+                    del self._entries[key]
                 return None
 
             # entry found and not expired, return it
@@ -108,6 +133,25 @@ class MemoryCache(Cache):
         finally:
             self.lock.release()
 
+    def get_stale(self, key):
+        self.lock.acquire()
+        try:
+            entry = self._entries.get(key)
+            if not entry or not entry[2]:
+                return None
+            return entry[1], entry[2]
+        finally:
+            self.lock.release()
+
+    def touch(self, key):
+        self.lock.acquire()
+        try:
+            entry = self._entries.get(key)
+            if entry:
+                self._entries[key] = (time.time(), entry[1], entry[2])
+        finally:
+            self.lock.release()
+
     def count(self):
         return len(self._entries)
 
@@ -194,8 +238,10 @@ class FileCache(Cache):
         if os.path.exists(path + '.lock'):
             os.remove(path + '.lock')
 
-    def store(self, key, value):
-        path = self._get_path(key)
+    def store(self, key, value, validators=None):
+        self._store(self._get_path(key), value, validators)
+
+    def _store(self, path, value, validators):
         self.lock.acquire()
         try:
             # acquire lock and open file
@@ -203,7 +249,7 @@ class FileCache(Cache):
             datafile = open(path, 'wb')
 
             # write data
-            pickle.dump((time.time(), value), datafile)
+            pickle.dump((time.time(), value, validators), datafile)
 
             # close and unlock file
             datafile.close()
@@ -214,34 +260,58 @@ class FileCache(Cache):
     def get(self, key, timeout=None):
         return self._get(self._get_path(key), timeout)
 
+    def _load(self, path):
+        # read pickled entry, files written before validators
+        # were introduced only hold (created_time, value)
+        f_lock = self._lock_file(path, False)
+        datafile = open(path, 'rb')
+        entry = pickle.load(datafile)
+        datafile.close()
+        self._unlock_file(f_lock)
+        if len(entry) == 2:
+            entry = entry + (None,)
+        return entry
+
     def _get(self, path, timeout):
         if os.path.exists(path) is False:
             # no record
             return None
         self.lock.acquire()
         try:
-            # acquire lock and open
-            f_lock = self._lock_file(path, False)
-            datafile = open(path, 'rb')
-
-            # read pickled object
-            created_time, value = pickle.load(datafile)
-            datafile.close()
+            created_time, value, validators = self._load(path)
 
             # check if value is expired
             if timeout is None:
                 timeout = self.timeout
             if timeout > 0 and (time.time() - created_time) >= timeout:
-                # expired! delete from cache
+                # expired! delete from cache unless it
+                # can still be revalidated.
                 value = None
-                self._delete_file(path)
+                if not validators:
+                    self._delete_file(path)
 
-            # unlock and return result
-            self._unlock_file(f_lock)
             return value
         finally:
             self.lock.release()
 
+    def get_stale(self, key):
+        path = self._get_path(key)
+        if os.path.exists(path) is False:
+            return None
+        self.lock.acquire()
+        try:
+            created_time, value, validators = self._load(path)
+        finally:
+            self.lock.release()
+        if not validators:
+            return None
+        return value, validators
+
+    def touch(self, key):
+        stale = self.get_stale(key)
+        if stale:
+            self._store(self._get_path(key), stale[0], stale[1])
+
     def count(self):
         c = 0
         for entry in os.listdir(self.cache_dir):
@@ -254,7 +324,10 @@ class FileCache(Cache):
         for entry in os.listdir(self.cache_dir):
             if entry.endswith('.lock'):
                 continue
-            self._get(os.path.join(self.cache_dir, entry), None)
+            path = os.path.join(self.cache_dir, entry)
+            if self._get(path, None) is None and os.path.exists(path):
+                # expired entry kept around for revalidation
+                self._delete_file(path)
 
     def flush(self):
         for entry in os.listdir(self.cache_dir):
@@ -0,0 +1,311 @@
+# Tweepy
+# Copyright 2009-2010 Joshua Roesslein
+# See LICENSE for details.
+
+from array import array
+from datetime import datetime
+from itertools import izip
+import calendar
+import operator
+
+try:
+    import numpy
+except ImportError:
+    # Optional, only speeds up where and sort
+    numpy = None
+
+from tweepy.error import TweepError
+from tweepy.models import ResultSet, Status
+from tweepy.utils import parse_datetime, parse_search_datetime
+
+OPERATORS = {
+    '==': operator.eq, '!=': operator.ne,
+    '<': operator.lt, '<=': operator.le,
+    '>': operator.gt, '>=': operator.ge
+}
+
+# Array type codes by column kind, other kinds are lists
+TYPECODES = {'int': 'l', 'float': 'd', 'bool': 'B', 'datetime': 'd'}
+
+MAX_INT = 2 ** (array('l').itemsize * 8 - 1) - 1
+MIN_INT = -MAX_INT - 1
+
+
+def encode_datetime(value):
+    # Twitter dates are naive UTC
+    return calendar.timegm(value.timetuple()) + value.microsecond / 1e6
+
+
+def decode_datetime(value):
+    return datetime.utcfromtimestamp(value)
+
+
+def column_kind(values):
+    kinds = set([type(value) for value in values])
+    if not kinds or type(None) in kinds:
+        return 'object'
+    if kinds == set([bool]):
+        return 'bool'
+    if kinds <= set([int, long]):
+        if min(values) >= MIN_INT and max(values) <= MAX_INT:
+            return 'int'
+        return 'object'
+    if kinds == set([float]):
+        return 'float'
+    if kinds == set([datetime]):
+        return 'datetime'
+    if kinds <= set([str, unicode]):
+        return 'str'
+    return 'object'
+
+
+def make_column(kind, values, strings):
+    if kind == 'datetime':
+        return array('d', [encode_datetime(value) for value in values])
+    if kind in TYPECODES:
+        return array(TYPECODES[kind], values)
+    if kind == 'str':
+        # repeated strings share one object
+        return [strings.setdefault(value, value) for value in values]
+    return list(values)
+
+
+def get_path(obj, path, default=None):
+    for name in path:
+        if isinstance(obj, dict):
+            obj = obj.get(name, default)
+        else:
+            obj = getattr(obj, name, default)
+        if obj is None:
+            break
+    return obj
+
+
+def json_value(path, value):
+    if path[-1] == 'created_at' and isinstance(value, basestring):
+        try:
+            return parse_datetime(value)
+        except ValueError:
+            return parse_search_datetime(value)
+    return value
+
+
+class ColumnSet(object):
+    """Columnar view of results, one column per field.
+
+    Numbers, booleans and timestamps are kept in arrays, strings in
+    lists sharing repeated values. Columns holding missing values or
+    other types are plain lists. Fields of nested models are named
+    with a dot, like user.followers_count. If numpy is installed,
+    where() and sort() use it and to_numpy() gives columns as numpy
+    arrays.
+
+    where(), sort(), filter() and take() share the columns and only
+    select rows, a column of the selection is built when it is used.
+    """
+
+    def __init__(self, columns, kinds, length, model=Status, api=None, index=None):
+        self.base = columns
+        self.kinds = kinds
+        self.model = model
+        self.api = api
+        # positions of the rows in the base columns, None for all
+        self.index = index
+        if index is None:
+            self.length = length
+        else:
+            self.length = len(index)
+        self.selected = {}
+
+    @classmethod
+    def from_rows(cls, rows, fields, value=get_path, model=Status, api=None):
+        kinds = {}
+        columns = {}
+        strings = {}
+        for field in fields:
+            path = field.split('.')
+            values = [value(row, path) for row in rows]
+            kinds[field] = kind = column_kind(values)
+            columns[field] = make_column(kind, values, strings)
+        return cls(columns, kinds, len(rows), model, api)
+
+    @classmethod
+    def from_models(cls, results, fields):
+        """Build columns of fields from a list of models"""
+        results = list(results)
+        if results:
+            model, api = type(results[0]), getattr(results[0], '_api', None)
+        else:
+            model, api = Status, None
+        return cls.from_rows(results, fields, get_path, model, api)
+
+    @classmethod
+    def from_json(cls, items, fields, model=Status, api=None):
+        """Build columns of fields from decoded JSON objects,
+        skipping models entirely. Dates are parsed."""
+        def value(item, path):
+            return json_value(path, get_path(item, path))
+        return cls.from_rows(list(items), fields, value, model, api)
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, field):
+        """Stored column, timestamps are seconds since the epoch"""
+        if self.index is None:
+            return self.base[field]
+        column = self.selected.get(field)
+        if column is None:
+            base = self.base[field]
+            rows = map(base.__getitem__, self.index)
+            if isinstance(base, array):
+                column = array(base.typecode, rows)
+            else:
+                column = rows
+            self.selected[field] = column
+        return column
+
+    @property
+    def columns(self):
+        """Dict of field to stored column"""
+        columns = {}
+        for field in self.base:
+            columns[field] = self[field]
+        return columns
+
+    def fields(self):
+        return self.base.keys()
+
+    def values(self, field):
+        """Column as a list of the values of the models"""
+        kind = self.kinds[field]
+        column = self[field]
+        if kind == 'datetime':
+            return [decode_datetime(value) for value in column]
+        if kind == 'bool':
+            return [bool(value) for value in column]
+        return list(column)
+
+    def to_numpy(self, field):
+        """Column as a numpy array, shared with the column if it is an array"""
+        if numpy is None:
+            raise TweepError('numpy is not installed')
+        column = self[field]
+        if isinstance(column, array) and len(column):
+            return numpy.frombuffer(column, dtype=column.typecode)
+        return numpy.array(column)
+
+    def rows(self):
+        """Positions of the rows in the base columns"""
+        if self.index is None:
+            return xrange(self.length)
+        return self.index
+
+    def select(self, index):
+        """New ColumnSet of the base rows at positions index"""
+        return ColumnSet(self.base, self.kinds, self.length, self.model, self.api, index)
+
+    def base_numpy(self, field):
+        # numpy array of the whole base column, None if numpy can not help
+        column = self.base[field]
+        if numpy is None or not isinstance(column, array) or not len(column):
+            return None
+        return numpy.frombuffer(column, dtype=column.typecode)
+
+    def take(self, indices):
+        """New ColumnSet of the rows at indices, in that order"""
+        if self.index is None:
+            return self.select(list(indices))
+        return self.select(map(self.index.__getitem__, indices))
+
+    def filter(self, mask):
+        """Keep the rows whose entry in mask is true"""
+        return self.select([i for i, keep in izip(self.rows(), mask) if keep])
+
+    def where(self, field, op, value):
+        """Keep the rows where the field compares to value with op,
+        one of == != < <= > >="""
+        try:
+            compare = OPERATORS[op]
+        except KeyError:
+            raise TweepError('Unknown operator %s' % op)
+        if self.kinds[field] == 'datetime':
+            value = encode_datetime(value)
+        column = self.base_numpy(field)
+        if column is not None:
+            if self.index is None:
+                return self.select(numpy.flatnonzero(compare(column, value)).tolist())
+            index = numpy.array(self.index, dtype=numpy.intp)
+            return self.select(index[compare(column[index], value)].tolist())
+        column = self.base[field]
+        return self.select([i for i in self.rows() if compare(column[i], value)])
+
+    def sort(self, field, reverse=False):
+        """Rows ordered by field, ties keep their order"""
+        column = self.base_numpy(field)
+        if column is not None and not reverse:
+            if self.index is None:
+                index = numpy.argsort(column, kind='mergesort')
+            else:
+                index = numpy.array(self.index, dtype=numpy.intp)
+                index = index[numpy.argsort(column[index], kind='mergesort')]
+            return self.select(index.tolist())
+        column = self.base[field]
+        return self.select(sorted(self.rows(), key=column.__getitem__, reverse=reverse))
+
+    def group_by(self, field):
+        """Dict of field value to the ColumnSet of its rows"""
+        groups = {}
+        for i, value in enumerate(self.values(field)):
+            groups.setdefault(value, []).append(i)
+        result = {}
+        for value, indices in groups.items():
+            result[value] = self.take(indices)
+        return result
+
+    def row(self, index):
+        """Dict of field to value of a row"""
+        if self.index is not None:
+            index = self.index[index]
+        row = {}
+        for field in self.base:
+            value = self.base[field][index]
+            kind = self.kinds[field]
+            if kind == 'datetime':
+                value = decode_datetime(value)
+            elif kind == 'bool':
+                value = bool(value)
+            row[field] = value
+        return row
+
+    def to_model(self, index):
+        """Model holding the fields of a row"""
+        model = self.model(self.api)
+        for field, value in self.row(index).items():
+            path = field.split('.')
+            obj = model
+            for name in path[:-1]:
+                nested = getattr(obj, name, None)
+                if nested is None:
+                    nested = nested_model(type(obj), name)(self.api)
+                    setattr(obj, name, nested)
+                    if name == 'user' and isinstance(obj, Status):
+                        obj.author = nested
+                obj = nested
+            setattr(obj, path[-1], value)
+        return model
+
+    def to_models(self):
+        """ResultSet of the models of all rows"""
+        results = ResultSet()
+        for i in xrange(self.length):
+            results.append(self.to_model(i))
+        return results
+
+
+def nested_model(model, name):
+    if name in ('user', 'author', 'sender', 'recipient'):
+        return model.user_model
+    if name == 'status':
+        return model.status_model
+    return model
@@ -0,0 +1,81 @@
+# Tweepy
+# Copyright 2009-2010 Joshua Roesslein
+# See LICENSE for details.
+
+import threading
+import zlib
+
+from tweepy.error import TweepError
+
+ACCEPT_ENCODING = 'gzip, deflate'
+
+
+class TransferStats(object):
+    """Counts bytes received on the wire and after decoding"""
+
+    def __init__(self):
+        self.wire_bytes = 0
+        self.decoded_bytes = 0
+        self.lock = threading.Lock()
+
+    def add(self, wire_bytes, decoded_bytes):
+        self.lock.acquire()
+        self.wire_bytes += wire_bytes
+        self.decoded_bytes += decoded_bytes
+        self.lock.release()
+
+    def saved(self):
+        """Bytes that compression kept off the wire"""
+        return self.decoded_bytes - self.wire_bytes
+
+    def reset(self):
+        self.lock.acquire()
+        self.wire_bytes = self.decoded_bytes = 0
+        self.lock.release()
+
+
+class Decompressor(object):
+    """Incremental decoder for a gzip or deflate content encoding"""
+
+    def __init__(self, encoding):
+        encoding = (encoding or '').strip().lower()
+        if encoding in ('gzip', 'x-gzip'):
+            # +16 tells zlib to expect a gzip header and trailer
+            self._obj = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        elif encoding == 'deflate':
+            self._obj = None
+        elif encoding in ('', 'identity'):
+            self._obj = False
+        else:
+            raise TweepError('Unsupported content encoding: %s' % encoding)
+
+    def decompress(self, data):
+        if self._obj is False:
+            return data
+        if self._obj is None:
+            # "deflate" is zlib wrapped per the RFC, but some
+            # servers send a raw deflate stream. Sniff the first
+            # chunk to decide.
+            try:
+                self._obj = zlib.decompressobj()
+                return self._obj.decompress(data)
+            except zlib.error:
+                self._obj = zlib.decompressobj(-zlib.MAX_WBITS)
+        try:
+            return self._obj.decompress(data)
+        except zlib.error, e:
+            raise TweepError('Failed to decompress response: %s' % e)
+
+    def flush(self):
+        if not self._obj:
+            return ''
+        return self._obj.flush()
+
+
+def decode_payload(resp, payload, stats=None):
+    """Decode a response body according to its Content-Encoding"""
+    decoder = Decompressor(resp.getheader('content-encoding'))
+    decoded = decoder.decompress(payload) + decoder.flush()
+    if stats is not None:
+        stats.add(len(payload), len(decoded))
+    return decoded
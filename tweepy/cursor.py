@@ -3,6 +3,7 @@
 # See LICENSE for details.
 
 from tweepy.error import TweepError
+from tweepy.jsonstream import ResultIterator
 
 class Cursor(object):
     """Pagination helper class"""
@@ -56,9 +57,13 @@ class CursorIterator(BaseIterator):
     def next(self):
         if self.next_cursor == 0 or (self.limit and self.count == self.limit):
             raise StopIteration
-        data, cursors = self.method(
-                cursor=self.next_cursor, *self.args, **self.kargs
-        )
+        result = self.method(cursor=self.next_cursor, *self.args, **self.kargs)
+        if isinstance(result, ResultIterator):
+            # incremental results only know the cursors once read
+            data = list(result)
+            cursors = result.previous_cursor, result.next_cursor
+        else:
+            data, cursors = result
         self.prev_cursor, self.next_cursor = cursors
         if len(data) == 0:
             raise StopIteration
@@ -83,7 +88,11 @@ class PageIterator(BaseIterator):
     def next(self):
         self.current_page += 1
         items = self.method(page=self.current_page, *self.args, **self.kargs)
-        if len(items) == 0 or (self.limit > 0 and self.current_page > self.limit):
+        if isinstance(items, ResultIterator):
+            items = list(items)
+        # raw payloads tell if they hold no items
+        if len(items) == 0 or getattr(items, 'empty', False) or \
+                (self.limit > 0 and self.current_page > self.limit):
             raise StopIteration
         return items
 
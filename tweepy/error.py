@@ -12,3 +12,7 @@ class TweepError(Exception):
     def __str__(self):
         return self.reason
 
+
+class TweepTimeout(TweepError):
+    """Raised when a request runs out of time"""
+
@@ -0,0 +1,43 @@
+# Tweepy
+# Copyright 2009-2010 Joshua Roesslein
+# See LICENSE for details.
+
+from timeit import default_timer as timer
+
+
+class RequestEvent(object):
+    """Timing of one phase of an API call, passed to API hooks.
+
+    phase is one of:
+        cache_lookup  checking the cache if the call may be cached,
+                      cache_hit tells the outcome
+        rate_limit    waiting for rate limit budget
+        auth          signing the request
+        connect       opening a new connection
+        send          sending the request, bytes is the size
+                      of the request target and body
+        first_byte    waiting for the response status and headers
+        read          reading the response body
+        retry_wait    sleeping before a retry
+        decode        decompressing and decoding the JSON payload
+        build         building models from the decoded payload
+        cache_store   storing the result in the cache
+        complete      the whole call, from start to result,
+                      error holds the exception if it failed
+    """
+
+    def __init__(self, method, phase, started, ended, bytes=None):
+        self.phase = phase
+        self.endpoint = method.endpoint
+        self.method = method.method
+        self.url = method.url
+        self.status = method.status
+        self.retries = method.retries
+        self.cache_hit = method.cache_hit
+        self.error = method.error
+        self.started = started
+        self.duration = ended - started
+        self.bytes = bytes
+
+    def __repr__(self):
+        return '<RequestEvent %s %s %.6fs>' % (self.endpoint, self.phase, self.duration)
@@ -0,0 +1,112 @@
+# Tweepy
+# Copyright 2009-2010 Joshua Roesslein
+# See LICENSE for details.
+
+import threading
+import weakref
+
+_local = threading.local()
+
+
+def current_identity_map():
+    """Identity map active in this thread, None if there is none"""
+    return getattr(_local, 'identity_map', None)
+
+
+def activate_identity_map(identity_map):
+    """Make identity_map the active one in this thread
+    and return the one it replaces"""
+    previous = getattr(_local, 'identity_map', None)
+    _local.identity_map = identity_map
+    return previous
+
+
+def scoped_identity_map(identity_map):
+    """Map to use for one call, True stands for a new map per call"""
+    if identity_map is True:
+        return IdentityMap(weak=False)
+    return identity_map
+
+
+def fingerprint(json):
+    """Hash of the plain members of a JSON object.
+
+    Nested objects like a user's status are left out, a change there
+    also changes counters like statuses_count."""
+    items = [item for item in json.iteritems()
+            if not isinstance(item[1], (dict, list))]
+    return hash(frozenset(items))
+
+
+class IdentityMap(object):
+    """Resolves users with the same id to one shared model.
+
+    While the map is active, parsing a user that was seen before
+    returns the existing model, updated in place if the new JSON
+    differs from the last one seen. Pass it as the identity_map of an
+    API, of a single call or of a Cursor, whose pages share it. An
+    identity_map of True dedupes users within each call only.
+    """
+
+    def __init__(self, weak=True):
+        """Initialize the map
+            weak: if True users are only kept while
+                  something else references them
+        """
+        self.weak = weak
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.RLock()
+
+    def _remove(self, key, ref):
+        self.lock.acquire()
+        try:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] is ref:
+                del self.entries[key]
+        finally:
+            self.lock.release()
+
+    def resolve(self, model, api, json):
+        """Get the shared instance of model for json"""
+        key = (model, json.get('id'))
+        if key[1] is None:
+            return model.fill(model(api), api, json)
+
+        self.lock.acquire()
+        try:
+            entry = self.entries.get(key)
+            if entry is not None:
+                ref, seen = entry
+                if self.weak:
+                    instance = ref()
+                else:
+                    instance = ref
+                if instance is not None:
+                    self.hits += 1
+                    current = fingerprint(json)
+                    if current != seen:
+                        model.fill(instance, api, json)
+                        self.entries[key] = (ref, current)
+                    return instance
+
+            self.misses += 1
+            instance = model.fill(model(api), api, json)
+            if self.weak:
+                ref = weakref.ref(instance, lambda ref, key=key: self._remove(key, ref))
+            else:
+                ref = instance
+            # only a hash is kept, not the JSON
+            self.entries[key] = (ref, fingerprint(json))
+            return instance
+        finally:
+            self.lock.release()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def clear(self):
+        self.lock.acquire()
+        self.entries.clear()
+        self.lock.release()
@@ -0,0 +1,148 @@
+# Tweepy
+# Copyright 2009-2010 Joshua Roesslein
+# See LICENSE for details.
+
+import threading
+
+from tweepy.error import TweepError
+
+
+class JSONBackend(object):
+    """A JSON library as used by the parsers and streams.
+
+    loads takes the payload as a utf-8 byte string, so no backend
+    needs it decoded to unicode first. decoder has a raw_decode
+    method for JSONArrayReader, backends without one use the
+    standard library's for incremental results.
+    """
+
+    def __init__(self, name, loads, dumps, decoder=None):
+        self.name = name
+        self.loads = loads
+        self.dumps = dumps
+        self.decoder = decoder
+
+    def raw_decoder(self):
+        if self.decoder is not None:
+            return self.decoder
+        return get_backend('json').decoder
+
+    def __repr__(self):
+        return '<JSONBackend %s>' % self.name
+
+
+def load_ujson():
+    import ujson
+    return JSONBackend('ujson', ujson.loads, ujson.dumps)
+
+
+def load_yajl():
+    import yajl
+    return JSONBackend('yajl', yajl.loads, yajl.dumps)
+
+
+def load_simplejson():
+    import simplejson
+    return JSONBackend('simplejson', simplejson.loads, simplejson.dumps,
+            simplejson.JSONDecoder())
+
+
+def load_json():
+    import json  # Python 2.6+
+    return JSONBackend('json', json.loads, json.dumps, json.JSONDecoder())
+
+
+def load_django():
+    from django.utils import simplejson  # Google App Engine
+    return JSONBackend('django', simplejson.loads, simplejson.dumps,
+            simplejson.JSONDecoder())
+
+
+# Backend factories by name, a factory raises ImportError
+# if its library is not installed.
+BACKENDS = {
+    'ujson': load_ujson,
+    'yajl': load_yajl,
+    'simplejson': load_simplejson,
+    'json': load_json,
+    'django': load_django
+}
+
+# Backends tried when none is chosen, fastest first
+AUTO_ORDER = ['ujson', 'yajl', 'simplejson', 'json', 'django']
+
+_loaded = {}
+_default = None
+_lock = threading.Lock()
+
+
+def register_backend(name, factory, auto=False):
+    """Add a backend, factory returns a JSONBackend.
+    If auto is True it is tried first when none is chosen."""
+    _lock.acquire()
+    try:
+        BACKENDS[name] = factory
+        _loaded.pop(name, None)
+        if auto:
+            if name in AUTO_ORDER:
+                AUTO_ORDER.remove(name)
+            AUTO_ORDER.insert(0, name)
+    finally:
+        _lock.release()
+
+
+def _load(name):
+    backend = _loaded.get(name)
+    if backend is None:
+        try:
+            factory = BACKENDS[name]
+        except KeyError:
+            raise TweepError('Unknown JSON backend %s' % name)
+        try:
+            backend = factory()
+        except ImportError:
+            raise TweepError('JSON backend %s is not installed' % name)
+        _loaded[name] = backend
+    return backend
+
+
+def available_backends():
+    """Names of the backends whose library is installed"""
+    names = []
+    for name in AUTO_ORDER + sorted(set(BACKENDS) - set(AUTO_ORDER)):
+        try:
+            get_backend(name)
+        except TweepError:
+            continue
+        names.append(name)
+    return names
+
+
+def get_backend(backend=None):
+    """Get a JSONBackend by name. If backend is None the default is
+    returned, the first installed one of AUTO_ORDER unless set with
+    set_default_backend. A JSONBackend is returned as is."""
+    if isinstance(backend, JSONBackend):
+        return backend
+    _lock.acquire()
+    try:
+        if backend is not None:
+            return _load(backend)
+        if _default is not None:
+            return _load(_default)
+        for name in AUTO_ORDER:
+            try:
+                return _load(name)
+            except TweepError:
+                continue
+        raise TweepError("Can't load a json library")
+    finally:
+        _lock.release()
+
+
+def set_default_backend(name):
+    """Use the named backend wherever none is chosen, None auto-detects"""
+    global _default
+    if name is not None:
+        get_backend(name)
+    _default = name
@@ -0,0 +1,164 @@
+# Tweepy
+# Copyright 2009-2010 Joshua Roesslein
+# See LICENSE for details.
+
+import sys
+
+from tweepy.error import TweepError
+from tweepy.jsonlib import get_backend
+
+# Members holding the list of an object wrapped list payload
+LIST_KEYS = ('users', 'results', 'lists')
+
+WHITESPACE = ' \t\r\n'
+
+
+class JSONArrayReader(object):
+    """Decodes the items of a JSON list payload one at a time.
+
+    The payload is either a list or an object with the list in one of
+    its list_keys members. Data is pulled with read(size) as needed, so
+    only the item being decoded has to be held in memory. Once iteration
+    is over, the other members of a wrapping object are in members.
+    """
+
+    def __init__(self, read, list_keys=LIST_KEYS, chunk_size=4096, json_lib=None):
+        """Initialize the reader
+            read: callable returning up to size bytes, '' at the end
+            list_keys: names of members that may hold the list
+            chunk_size: bytes to read at once, httplib only returns
+                        once that much has arrived
+            json_lib: JSONBackend or its name, the default if None
+        """
+        self.read = read
+        self.list_keys = list_keys
+        self.chunk_size = chunk_size
+        self.decoder = get_backend(json_lib).raw_decoder()
+        self.members = {}
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        if self.eof:
+            return False
+        data = self.read(self.chunk_size)
+        if not data:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + data
+        self.pos = 0
+        return True
+
+    def _peek(self):
+        # Next character that is not whitespace, None at the end
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return None
+
+    def _expect(self, chars):
+        c = self._peek()
+        if c is None or c not in chars:
+            raise TweepError('Failed to parse JSON payload: expected %s' % ' or '.join(chars))
+        self.pos += 1
+        return c
+
+    def _value(self):
+        self._peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+            except ValueError, e:
+                # incomplete value, wait for more data
+                if not self._fill():
+                    raise TweepError('Failed to parse JSON payload: %s' % e)
+                continue
+            # a number may continue in the next chunk
+            if end == len(self.buf) and self._fill():
+                continue
+            self.pos = end
+            return value
+
+    def _items(self):
+        self._expect('[')
+        if self._peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield self._value()
+            if self._expect(',]') == ']':
+                return
+
+    def __iter__(self):
+        c = self._peek()
+        if c == '[':
+            for item in self._items():
+                yield item
+        elif c == '{':
+            self.pos += 1
+            if self._peek() == '}':
+                self.pos += 1
+                return
+            while True:
+                key = self._value()
+                self._expect(':')
+                if key in self.list_keys and self._peek() == '[':
+                    for item in self._items():
+                        yield item
+                else:
+                    self.members[key] = self._value()
+                if self._expect(',}') == '}':
+                    return
+        else:
+            raise TweepError('Failed to parse JSON payload: not a list')
+
+
+class ResultIterator(object):
+    """Iterates over the results of a list payload as they are decoded.
+
+    Members of the payload besides the list, like next_cursor, are
+    available as attributes once iteration has finished. The response
+    is released when iteration finishes or close() is called.
+    """
+
+    def __init__(self, items, reader, release):
+        self._items = iter(items)
+        self._reader = reader
+        self._release = release
+
+    def __iter__(self):
+        return self
+
+    def next(self):
+        if self._release is None:
+            raise StopIteration
+        try:
+            return self._items.next()
+        except StopIteration:
+            self.close(True)
+            raise
+        except:
+            # closing may raise and catch its own errors
+            exc_type, error, tb = sys.exc_info()
+            self.close(False)
+            raise exc_type, error, tb
+
+    def close(self, complete=False):
+        """Release the response, it can only be reused if complete"""
+        if self._release is not None:
+            release, self._release = self._release, None
+            release(complete)
+
+    def __getattr__(self, name):
+        reader = self.__dict__.get('_reader')
+        if reader is None or name not in reader.members:
+            raise AttributeError(name)
+        return reader.members[name]
+
+    def __del__(self):
+        if '_release' in self.__dict__:
+            self.close(False)
@@ -0,0 +1,257 @@
+# Tweepy
+# Copyright 2009-2010 Joshua Roesslein
+# See LICENSE for details.
+
+import threading
+import time
+
+# Latency buckets in seconds, the Prometheus client defaults
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram(object):
+    """Counts observations into buckets of upper bounds"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                break
+        else:
+            i = len(self.buckets)
+        self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        """List of (upper bound, count of observations <= bound),
+        the last bound is infinity"""
+        result = []
+        total = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+
+class EndpointMetrics(object):
+
+    def __init__(self, buckets):
+        self.latency = Histogram(buckets)
+        self.statuses = {}
+        self.errors = 0
+        self.retries = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def snapshot(self):
+        return {
+            'requests': self.latency.count,
+            'errors': self.errors,
+            'statuses': dict(self.statuses),
+            'retries': self.retries,
+            'cache_hits': self.cache_hits,
+            'cache_misses': self.cache_misses,
+            'bytes_in': self.bytes_in,
+            'bytes_out': self.bytes_out,
+            'latency': {
+                'count': self.latency.count,
+                'sum': self.latency.sum,
+                'buckets': self.latency.cumulative()
+            }
+        }
+
+
+class StreamMetrics(object):
+
+    def __init__(self):
+        self.connects = 0
+        self.messages = 0
+        self.bytes_in = 0
+        self.started = None
+
+    def snapshot(self):
+        if self.started is None:
+            uptime = 0.0
+        else:
+            uptime = time.time() - self.started
+        if uptime > 0:
+            messages_rate = self.messages / uptime
+            bytes_rate = self.bytes_in / uptime
+        else:
+            messages_rate = bytes_rate = 0.0
+        return {
+            'messages': self.messages,
+            'bytes_in': self.bytes_in,
+            'reconnects': max(0, self.connects - 1),
+            'uptime': uptime,
+            'messages_per_sec': messages_rate,
+            'bytes_per_sec': bytes_rate
+        }
+
+
+class Metrics(object):
+    """Thread-safe aggregates of API calls per endpoint and of streams.
+
+    Pass it as the metrics argument of API or Stream, one registry
+    may be shared by any number of them.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        """Initialize the registry
+            buckets: upper bounds in seconds of the latency histograms
+        """
+        self.buckets = buckets
+        self.endpoints = {}
+        self.streams = {}
+        self.lock = threading.Lock()
+
+    def _endpoint(self, name):
+        metrics = self.endpoints.get(name)
+        if metrics is None:
+            metrics = self.endpoints[name] = EndpointMetrics(self.buckets)
+        return metrics
+
+    def _stream(self, name):
+        metrics = self.streams.get(name)
+        if metrics is None:
+            metrics = self.streams[name] = StreamMetrics()
+        return metrics
+
+    def observe(self, event):
+        """API hook, aggregates a RequestEvent"""
+        self.lock.acquire()
+        try:
+            metrics = self._endpoint(event.endpoint)
+            if event.phase == 'complete':
+                metrics.latency.observe(event.duration)
+                metrics.retries += event.retries
+                if event.status is not None:
+                    metrics.statuses[event.status] = metrics.statuses.get(event.status, 0) + 1
+                if event.error is not None:
+                    metrics.errors += 1
+            elif event.phase == 'cache_lookup':
+                if event.cache_hit:
+                    metrics.cache_hits += 1
+                else:
+                    metrics.cache_misses += 1
+            elif event.phase == 'read':
+                metrics.bytes_in += event.bytes
+            elif event.phase == 'send':
+                metrics.bytes_out += event.bytes
+        finally:
+            self.lock.release()
+
+    def stream_connected(self, name):
+        """Count a stream connection, all but the first are reconnects"""
+        self.lock.acquire()
+        try:
+            metrics = self._stream(name)
+            metrics.connects += 1
+            if metrics.started is None:
+                metrics.started = time.time()
+        finally:
+            self.lock.release()
+
+    def stream_message(self, name, size):
+        """Count a message of size bytes received on a stream"""
+        self.lock.acquire()
+        try:
+            metrics = self._stream(name)
+            metrics.messages += 1
+            metrics.bytes_in += size
+        finally:
+            self.lock.release()
+
+    def snapshot(self):
+        """Get a consistent copy of all aggregates as plain dicts"""
+        self.lock.acquire()
+        try:
+            endpoints = {}
+            for name, metrics in self.endpoints.items():
+                endpoints[name] = metrics.snapshot()
+            streams = {}
+            for name, metrics in self.streams.items():
+                streams[name] = metrics.snapshot()
+            return {'endpoints': endpoints, 'streams': streams}
+        finally:
+            self.lock.release()
+
+    def reset(self):
+        """Drop all aggregates"""
+        self.lock.acquire()
+        self.endpoints.clear()
+        self.streams.clear()
+        self.lock.release()
+
+    def prometheus(self, prefix='tweepy'):
+        """Export a snapshot in the Prometheus text exposition format"""
+        snapshot = self.snapshot()
+        lines = []
+
+        def metric(name, kind, help, samples):
+            name = '%s_%s' % (prefix, name)
+            lines.append('# HELP %s %s' % (name, help))
+            lines.append('# TYPE %s %s' % (name, kind))
+            for suffix, labels, value in samples:
+                lines.append('%s%s{%s} %s' % (name, suffix, format_labels(labels),
+                        format_value(value)))
+
+        endpoints = sorted(snapshot['endpoints'].items())
+        samples = []
+        for name, metrics in endpoints:
+            latency = metrics['latency']
+            for bound, count in latency['buckets']:
+                samples.append(('_bucket', [('endpoint', name), ('le', format_value(bound))], count))
+            samples.append(('_sum', [('endpoint', name)], latency['sum']))
+            samples.append(('_count', [('endpoint', name)], latency['count']))
+        metric('request_duration_seconds', 'histogram', 'Duration of API calls.', samples)
+
+        samples = []
+        for name, metrics in endpoints:
+            for status, count in sorted(metrics['statuses'].items()):
+                samples.append(('', [('endpoint', name), ('status', status)], count))
+        metric('responses_total', 'counter', 'API responses by status code.', samples)
+
+        for key, help in (
+                ('errors', 'API calls that raised an error.'),
+                ('retries', 'Retried API requests.'),
+                ('cache_hits', 'API calls answered from the cache.'),
+                ('cache_misses', 'API calls not found in the cache.'),
+                ('bytes_in', 'Response body bytes received.'),
+                ('bytes_out', 'Request target and body bytes sent.')):
+            samples = [('', [('endpoint', name)], metrics[key]) for name, metrics in endpoints]
+            metric('%s_total' % key, 'counter', help, samples)
+
+        streams = sorted(snapshot['streams'].items())
+        for key, help in (
+                ('messages', 'Messages received on streams.'),
+                ('bytes_in', 'Message bytes received on streams.'),
+                ('reconnects', 'Stream reconnections.')):
+            samples = [('', [('stream', name)], metrics[key]) for name, metrics in streams]
+            metric('stream_%s_total' % key, 'counter', help, samples)
+
+        return '\n'.join(lines) + '\n'
+
+
+def format_labels(labels):
+    pairs = []
+    for name, value in labels:
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append('%s="%s"' % (name, value))
+    return ','.join(pairs)
+
+
+def format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
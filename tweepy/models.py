@@ -2,24 +2,85 @@
 # Copyright 2009-2010 Joshua Roesslein
 # See LICENSE for details.
 
+import copy_reg
+
 from tweepy.error import TweepError
+from tweepy.identity import current_identity_map, activate_identity_map
 from tweepy.utils import parse_datetime, parse_html_value, parse_a_href, \
         parse_search_datetime, unescape_html
 
 
+# Low cardinality fields whose values are shared between models
+INTERN_FIELDS = frozenset([
+    'lang', 'time_zone', 'location', 'profile_image_url',
+    'profile_background_image_url', 'profile_background_color',
+    'profile_link_color', 'profile_sidebar_border_color',
+    'profile_sidebar_fill_color', 'profile_text_color',
+    'iso_language_code'])
+
+# Bounded like the timestamp cache, cleared when full
+INTERN_CACHE_SIZE = 10000
+_interned = {}
+_sources = {}
+_search_sources = {}
+
+
+def intern_value(value):
+    """Get the shared copy of an equal string"""
+    shared = _interned.get(value)
+    if shared is None:
+        if len(_interned) >= INTERN_CACHE_SIZE:
+            _interned.clear()
+        _interned[value] = shared = value
+    return shared
+
+
+def parse_source(source):
+    """Name and url, or None, of a status source"""
+    parsed = _sources.get(source)
+    if parsed is None:
+        if '<' in source:
+            parsed = intern_value(parse_html_value(source)), intern_value(parse_a_href(source))
+        else:
+            parsed = intern_value(source), None
+        if len(_sources) >= INTERN_CACHE_SIZE:
+            _sources.clear()
+        _sources[source] = parsed
+    return parsed
+
+
+def parse_search_source(source):
+    """Name of a search result source"""
+    parsed = _search_sources.get(source)
+    if parsed is None:
+        parsed = intern_value(parse_html_value(unescape_html(source)))
+        if len(_search_sources) >= INTERN_CACHE_SIZE:
+            _search_sources.clear()
+        _search_sources[source] = parsed
+    return parsed
+
+
 class ResultSet(list):
     """A list like object that holds results from a Twitter API query."""
 
+    def columns(self, fields):
+        """Columnar view of fields of the results, see ColumnSet"""
+        from tweepy.columns import ColumnSet
+        return ColumnSet.from_models(self, fields)
+
 
 class Model(object):
 
+    # Subclasses get a __dict__, this only lets compact models avoid it
+    __slots__ = ()
+
     def __init__(self, api=None):
         self._api = api
 
     def __getstate__(self):
         # pickle
         pickle = dict(self.__dict__)
-        del pickle['_api']  # do not pickle the API reference
+        pickle.pop('_api', None)  # do not pickle the API reference
         return pickle
 
     @classmethod
@@ -43,19 +104,18 @@ class Status(Model):
         status = cls(api)
         for k, v in json.items():
             if k == 'user':
-                user = User.parse(api, v)
+                user = cls.user_model.parse(api, v)
                 setattr(status, 'author', user)
                 setattr(status, 'user', user)  # DEPRECIATED
             elif k == 'created_at':
                 setattr(status, k, parse_datetime(v))
             elif k == 'source':
-                if '<' in v:
-                    setattr(status, k, parse_html_value(v))
-                    setattr(status, 'source_url', parse_a_href(v))
-                else:
-                    setattr(status, k, v)
+                source, source_url = parse_source(v)
+                setattr(status, k, source)
+                if source_url is not None:
+                    setattr(status, 'source_url', source_url)
             elif k == 'retweeted_status':
-                setattr(status, k, Status.parse(api, v))
+                setattr(status, k, cls.parse(api, v))
             else:
                 setattr(status, k, v)
         return status
@@ -77,18 +137,27 @@ class User(Model):
 
     @classmethod
     def parse(cls, api, json):
-        user = cls(api)
+        identity_map = current_identity_map()
+        if identity_map is not None:
+            return identity_map.resolve(cls, api, json)
+        return cls.fill(cls(api), api, json)
+
+    @classmethod
+    def fill(cls, user, api, json):
+        """Set the fields of user from a JSON object"""
         for k, v in json.items():
             if k == 'created_at':
                 setattr(user, k, parse_datetime(v))
             elif k == 'status':
-                setattr(user, k, Status.parse(api, v))
+                setattr(user, k, cls.status_model.parse(api, v))
             elif k == 'following':
                 # twitter sets this to null if it is false
                 if v is True:
                     setattr(user, k, True)
                 else:
                     setattr(user, k, False)
+            elif k in INTERN_FIELDS and isinstance(v, basestring):
+                setattr(user, k, intern_value(v))
             else:
                 setattr(user, k, v)
         return user
@@ -142,7 +211,7 @@ class DirectMessage(Model):
         dm = cls(api)
         for k, v in json.items():
             if k == 'sender' or k == 'recipient':
-                setattr(dm, k, User.parse(api, v))
+                setattr(dm, k, cls.user_model.parse(api, v))
             elif k == 'created_at':
                 setattr(dm, k, parse_datetime(v))
             else:
@@ -197,7 +266,9 @@ class SearchResult(Model):
             if k == 'created_at':
                 setattr(result, k, parse_search_datetime(v))
             elif k == 'source':
-                setattr(result, k, parse_html_value(unescape_html(v)))
+                setattr(result, k, parse_search_source(v))
+            elif k in INTERN_FIELDS and isinstance(v, basestring):
+                setattr(result, k, intern_value(v))
             else:
                 setattr(result, k, v)
         return result
@@ -223,10 +294,10 @@ class List(Model):
 
     @classmethod
     def parse(cls, api, json):
-        lst = List(api)
+        lst = cls(api)
         for k,v in json.items():
             if k == 'user':
-                setattr(lst, k, User.parse(api, v))
+                setattr(lst, k, cls.user_model.parse(api, v))
             else:
                 setattr(lst, k, v)
         return lst
@@ -272,6 +343,252 @@ class List(Model):
         return self._api.is_subscribed_list(self.user.screen_name, self.slug, id)
 
 
+# Models nested in other models
+Status.user_model = User
+User.status_model = Status
+DirectMessage.user_model = User
+List.user_model = User
+
+
+class CompactModel(Model):
+    """Base of the compact models.
+
+    Known fields are kept in __slots__ instead of a per instance
+    __dict__, fields Twitter adds later go to an overflow dict.
+    """
+
+    __slots__ = ('_api', '_extra', '__weakref__')
+    fields = ()
+
+    def __init__(self, api=None):
+        self._api = api
+        self._extra = None
+
+    def __setattr__(self, name, value):
+        try:
+            object.__setattr__(self, name, value)
+        except AttributeError:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[name] = value
+
+    def __getattr__(self, name):
+        # only called for unset slots and unknown fields
+        if name != '_extra' and self._extra and name in self._extra:
+            return self._extra[name]
+        raise AttributeError(name)
+
+    def __getstate__(self):
+        # pickle
+        state = dict(self._extra or {})
+        for name in self.fields:
+            try:
+                state[name] = object.__getattribute__(self, name)
+            except AttributeError:
+                pass
+        return state
+
+    def __setstate__(self, state):
+        # unpickle
+        self._api = None
+        self._extra = None
+        for name, value in state.items():
+            setattr(self, name, value)
+
+
+def compact_model(model, fields):
+    """Create a compact variant of model with slots for fields"""
+    namespace = {'__slots__': tuple(fields), 'fields': tuple(fields)}
+    for name, value in model.__dict__.items():
+        if name not in ('__dict__', '__weakref__', '__slots__', '__doc__'):
+            namespace[name] = value
+    return type('Compact' + model.__name__, (CompactModel,), namespace)
+
+
+CompactStatus = compact_model(Status, [
+    'author', 'contributors', 'coordinates', 'created_at', 'entities',
+    'favorited', 'geo', 'id', 'id_str', 'in_reply_to_screen_name',
+    'in_reply_to_status_id', 'in_reply_to_status_id_str',
+    'in_reply_to_user_id', 'in_reply_to_user_id_str', 'place',
+    'retweet_count', 'retweeted', 'retweeted_status', 'source', 'source_url',
+    'text', 'truncated', 'user'])
+
+CompactUser = compact_model(User, [
+    'contributors_enabled', 'created_at', 'description', 'favourites_count',
+    'follow_request_sent', 'followers_count', 'following', 'friends_count',
+    'geo_enabled', 'id', 'id_str', 'lang', 'listed_count', 'location', 'name',
+    'notifications', 'profile_background_color',
+    'profile_background_image_url', 'profile_background_tile',
+    'profile_image_url', 'profile_link_color', 'profile_sidebar_border_color',
+    'profile_sidebar_fill_color', 'profile_text_color',
+    'profile_use_background_image', 'protected', 'screen_name',
+    'show_all_inline_media', 'status', 'statuses_count', 'time_zone', 'url',
+    'utc_offset', 'verified'])
+
+CompactDirectMessage = compact_model(DirectMessage, [
+    'created_at', 'id', 'id_str', 'recipient', 'recipient_id',
+    'recipient_screen_name', 'sender', 'sender_id', 'sender_screen_name',
+    'text'])
+
+CompactFriendship = compact_model(Friendship, [
+    'all_replies', 'blocking', 'can_dm', 'followed_by', 'following', 'id',
+    'id_str', 'marked_spam', 'notifications_enabled', 'screen_name',
+    'want_retweets'])
+
+CompactSavedSearch = compact_model(SavedSearch, [
+    'created_at', 'id', 'id_str', 'name', 'position', 'query'])
+
+CompactSearchResult = compact_model(SearchResult, [
+    'created_at', 'from_user', 'from_user_id', 'from_user_id_str', 'geo',
+    'id', 'id_str', 'iso_language_code', 'metadata', 'profile_image_url',
+    'source', 'text', 'to_user', 'to_user_id', 'to_user_id_str'])
+
+CompactList = compact_model(List, [
+    'description', 'following', 'full_name', 'id', 'id_str', 'member_count',
+    'mode', 'name', 'slug', 'subscriber_count', 'uri', 'user'])
+
+CompactStatus.user_model = CompactUser
+CompactUser.status_model = CompactStatus
+CompactDirectMessage.user_model = CompactUser
+CompactList.user_model = CompactUser
+
+
+class LazyModel(Model):
+    """Base of the lazy models.
+
+    parse only keeps the decoded JSON object, fields are converted
+    the first time they are read and then cached on the instance.
+    converters maps field names to functions building their value
+    from the model and its JSON object, other fields are returned
+    as they are.
+    """
+
+    converters = {}
+
+    @classmethod
+    def parse(cls, api, json):
+        return cls.fill(cls(api), api, json)
+
+    @classmethod
+    def fill(cls, model, api, json):
+        # drop fields converted from older JSON
+        model.__dict__.clear()
+        model._api = api
+        model._json = json
+        # nested users are built later, through the same identity map
+        identity_map = current_identity_map()
+        if identity_map is not None:
+            model._identity_map = identity_map
+        return model
+
+    def __getstate__(self):
+        # pickle
+        state = Model.__getstate__(self)
+        state.pop('_identity_map', None)
+        return state
+
+    def __setstate__(self, state):
+        # unpickle, nested models are still built without an API
+        self._api = None
+        self.__dict__.update(state)
+
+    def __getattr__(self, name):
+        # only called for fields not read yet
+        json = self.__dict__.get('_json')
+        if json is None:
+            raise AttributeError(name)
+        convert = self.converters.get(name)
+        try:
+            if convert is None:
+                value = json[name]
+            elif '_identity_map' in self.__dict__:
+                previous = activate_identity_map(self._identity_map)
+                try:
+                    value = convert(self, json)
+                finally:
+                    activate_identity_map(previous)
+            else:
+                value = convert(self, json)
+        except KeyError:
+            raise AttributeError(name)
+        self.__dict__[name] = value
+        return value
+
+
+def convert_source(model, json):
+    return parse_source(json['source'])[0]
+
+
+def convert_source_url(model, json):
+    source_url = parse_source(json['source'])[1]
+    if source_url is None:
+        raise KeyError('source_url')
+    return source_url
+
+
+def convert_interned(name):
+    def convert(model, json):
+        value = json[name]
+        if isinstance(value, basestring):
+            return intern_value(value)
+        return value
+    return convert
+
+
+def interned_converters(converters):
+    """converters plus ones sharing the values of INTERN_FIELDS"""
+    result = dict([(name, convert_interned(name)) for name in INTERN_FIELDS])
+    result.update(converters)
+    return result
+
+
+class LazyStatus(LazyModel, Status):
+
+    converters = {
+        'user': lambda status, json: status.user_model.parse(status._api, json['user']),
+        'author': lambda status, json: status.user,
+        'created_at': lambda status, json: parse_datetime(json['created_at']),
+        'source': convert_source,
+        'source_url': convert_source_url,
+        'retweeted_status': lambda status, json: status.parse(status._api, json['retweeted_status'])
+    }
+
+
+class LazyUser(LazyModel, User):
+
+    # resolved through the identity map like User
+    parse = User.__dict__['parse']
+
+    converters = interned_converters({
+        'created_at': lambda user, json: parse_datetime(json['created_at']),
+        'status': lambda user, json: user.status_model.parse(user._api, json['status']),
+        # twitter sets this to null if it is false
+        'following': lambda user, json: json['following'] is True
+    })
+
+
+class LazyDirectMessage(LazyModel, DirectMessage):
+
+    converters = {
+        'sender': lambda dm, json: dm.user_model.parse(dm._api, json['sender']),
+        'recipient': lambda dm, json: dm.user_model.parse(dm._api, json['recipient']),
+        'created_at': lambda dm, json: parse_datetime(json['created_at'])
+    }
+
+
+class LazySearchResult(LazyModel, SearchResult):
+
+    converters = interned_converters({
+        'created_at': lambda result, json: parse_search_datetime(json['created_at']),
+        'source': lambda result, json: parse_search_source(json['source'])
+    })
+
+
+LazyStatus.user_model = LazyUser
+LazyUser.status_model = LazyStatus
+LazyDirectMessage.user_model = LazyUser
+
+
 class JSONModel(Model):
 
     @classmethod
@@ -289,6 +606,75 @@ class IDModel(Model):
             return json['ids']
 
 
+class Projection(object):
+    """Fields to parse per model, like 'status: id,text; user: id'.
+
+    Models only get the fields of their projection and no conversion
+    work is done for the others, which are dropped or, if keep_raw
+    is True, set as they are in the JSON. Models without a projection
+    are parsed whole.
+    """
+
+    def __init__(self, fields, keep_raw=False):
+        """Initialize the projection
+            fields: dict of model name, as in ModelFactory, to field
+                    names, or a string like 'status: id,text; user: id'
+            keep_raw: if True keep other fields unconverted
+        """
+        if isinstance(fields, basestring):
+            spec, fields = fields, {}
+            for part in spec.split(';'):
+                if not part.strip():
+                    continue
+                try:
+                    name, names = part.split(':')
+                except ValueError:
+                    raise TweepError('Invalid projection: %s' % part.strip())
+                fields[name.strip()] = [field.strip() for field in names.split(',')]
+        self.fields = dict([(name, frozenset(names)) for name, names in fields.items()])
+        self.keep_raw = keep_raw
+        self.key = (tuple(sorted([(name, tuple(sorted(names)))
+                for name, names in self.fields.items()])), keep_raw)
+
+    def __eq__(self, other):
+        return isinstance(other, Projection) and self.key == other.key
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self.key)
+
+
+def project_model(model, fields, keep_raw):
+    """Create a variant of model that only parses fields"""
+    base = [None]
+
+    def parse(cls, api, json):
+        projected = {}
+        for name in fields:
+            if name in json:
+                projected[name] = json[name]
+        result = super(base[0], cls).parse(api, projected)
+        if keep_raw:
+            for name, value in json.items():
+                if name not in fields:
+                    setattr(result, name, value)
+        return result
+
+    base[0] = variant_model(model, parse=classmethod(parse))
+    return base[0]
+
+
+def variant_model(model, **attrs):
+    # Pickled as instances of model, factory built classes
+    # can not be found by name when unpickling.
+    def __reduce_ex__(self, protocol):
+        return copy_reg._reconstructor, (model, object, None), self.__getstate__()
+    attrs.update(__slots__=(), __reduce_ex__=__reduce_ex__)
+    return type(model.__name__, (model,), attrs)
+
+
 class ModelFactory(object):
     """
     Used by parsers for creating instances
@@ -307,3 +693,54 @@ class ModelFactory(object):
     json = JSONModel
     ids = IDModel
 
+    @classmethod
+    def project(cls, projection):
+        """Get a factory whose models parse only the fields of projection,
+        a Projection or the fields argument to create one"""
+        if not isinstance(projection, Projection):
+            projection = Projection(projection)
+        projected = cls.__dict__.get('_projected')
+        if projected is None:
+            projected = cls._projected = {}
+        factory = projected.get(projection)
+        if factory is None:
+            models = {}
+            for name, fields in projection.fields.items():
+                model = getattr(cls, name, None)
+                if model is None:
+                    raise TweepError('No model for this payload type: %s' % name)
+                models[name] = project_model(model, fields, projection.keep_raw)
+
+            # models nesting projected ones follow the projection too
+            nested = [('user_model', models.get('user')), ('status_model', models.get('status'))]
+            for name in ('status', 'user', 'direct_message', 'list'):
+                model = models.get(name) or getattr(cls, name)
+                rewire = [(attr, value) for attr, value in nested
+                        if value is not None and hasattr(model, attr)]
+                if rewire and name not in models:
+                    model = models[name] = variant_model(model)
+                for attr, value in rewire:
+                    setattr(model, attr, value)
+            factory = projected[projection] = type(cls.__name__, (cls,), models)
+        return factory
+
+
+class CompactModelFactory(ModelFactory):
+    """Creates compact models, which use far less memory"""
+
+    status = CompactStatus
+    user = CompactUser
+    direct_message = CompactDirectMessage
+    friendship = CompactFriendship
+    saved_search = CompactSavedSearch
+    search_result = CompactSearchResult
+    list = CompactList
+
+
+class LazyModelFactory(ModelFactory):
+    """Creates lazy models, which only convert the fields that are read"""
+
+    status = LazyStatus
+    user = LazyUser
+    direct_message = LazyDirectMessage
+    search_result = LazySearchResult
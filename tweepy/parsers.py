@@ -2,8 +2,12 @@
 # Copyright 2009-2010 Joshua Roesslein
 # See LICENSE for details.
 
+import re
+
 from tweepy.models import ModelFactory
-from tweepy.utils import import_simplejson
+from tweepy.identity import activate_identity_map, scoped_identity_map
+from tweepy.error import TweepError
+from tweepy.jsonlib import get_backend
 
 
 class Parser(object):
@@ -16,6 +20,13 @@ class Parser(object):
         """
         raise NotImplementedError
 
+    def parse_incremental(self, method, reader):
+        """
+        Parse the items of a list payload as a JSONArrayReader
+        decodes them. Returns an iterable of the results.
+        """
+        raise NotImplementedError
+
     def parse_error(self, payload):
         """
         Parse the error message from payload.
@@ -29,14 +40,18 @@ class JSONParser(Parser):
 
     payload_format = 'json'
 
-    def __init__(self):
-        self.json_lib = import_simplejson()
+    def __init__(self, json_lib=None):
+        """Initialize the parser
+            json_lib: JSONBackend or its name, the default if None
+        """
+        self.json_lib = get_backend(json_lib)
 
     def parse(self, method, payload):
         try:
             json = self.json_lib.loads(payload)
         except Exception, e:
             raise TweepError('Failed to parse JSON payload: %s' % e)
+        method.mark('decode')
 
         if isinstance(json, dict) and 'previous_cursor' in json and 'next_cursor' in json:
             cursors = json['previous_cursor'], json['next_cursor']
@@ -44,6 +59,57 @@ class JSONParser(Parser):
         else:
             return json
 
+    def parse_incremental(self, method, reader):
+        return reader
+
+    def parse_error(self, payload):
+        error = self.json_lib.loads(payload)
+        return error['error'] if error.has_key('error') else error['errors']
+
+
+re_previous_cursor = re.compile(r'"previous_cursor"\s*:\s*(-?\d+)')
+re_next_cursor = re.compile(r'"next_cursor"\s*:\s*(-?\d+)')
+re_empty_list = re.compile(r'^\s*\[\s*\]\s*$|"(?:users|results|lists)"\s*:\s*\[\s*\]')
+
+
+class RawPayload(str):
+    """Undecoded JSON payload of a response.
+
+    Cursors of a paged result are in previous_cursor and next_cursor,
+    empty is True if the payload holds an empty list of results.
+    """
+
+    previous_cursor = None
+    next_cursor = None
+    empty = False
+
+
+class RawParser(Parser):
+    """Returns payloads as they were received, without decoding them.
+    Cursors are found with a regular expression so Cursor works."""
+
+    payload_format = 'raw'
+
+    def __init__(self, json_lib=None):
+        """Initialize the parser
+            json_lib: JSONBackend or its name, only used for errors
+        """
+        self.json_lib = get_backend(json_lib)
+
+    def parse(self, method, payload):
+        payload = RawPayload(payload)
+        payload.empty = re_empty_list.search(payload) is not None
+        previous_cursor = re_previous_cursor.search(payload)
+        next_cursor = re_next_cursor.search(payload)
+        if previous_cursor and next_cursor:
+            payload.previous_cursor = int(previous_cursor.group(1))
+            payload.next_cursor = int(next_cursor.group(1))
+            return payload, (payload.previous_cursor, payload.next_cursor)
+        return payload
+
+    def parse_incremental(self, method, reader):
+        raise TweepError('Raw payloads can not be returned incrementally')
+
     def parse_error(self, payload):
         error = self.json_lib.loads(payload)
         return error['error'] if error.has_key('error') else error['errors']
@@ -51,14 +117,20 @@ class JSONParser(Parser):
 
 class ModelParser(JSONParser):
 
-    def __init__(self, model_factory=None):
-        JSONParser.__init__(self)
+    def __init__(self, model_factory=None, json_lib=None):
+        JSONParser.__init__(self, json_lib)
         self.model_factory = model_factory or ModelFactory
 
+    def factory(self, method):
+        """Model factory for a call, projected if it has a projection"""
+        if method.projection is None:
+            return self.model_factory
+        return self.model_factory.project(method.projection)
+
     def parse(self, method, payload):
         try:
             if method.payload_type is None: return
-            model = getattr(self.model_factory, method.payload_type)
+            model = getattr(self.factory(method), method.payload_type)
         except AttributeError:
             raise TweepError('No model for this payload type: %s' % method.payload_type)
 
@@ -68,13 +140,36 @@ class ModelParser(JSONParser):
         else:
             cursors = None
 
-        if method.payload_list:
-            result = model.parse_list(method.api, json)
-        else:
-            result = model.parse(method.api, json)
+        previous = activate_identity_map(scoped_identity_map(method.identity_map))
+        try:
+            if method.payload_list:
+                result = model.parse_list(method.api, json)
+            else:
+                result = model.parse(method.api, json)
+        finally:
+            activate_identity_map(previous)
+        method.mark('build')
 
         if cursors:
             return result, cursors
         else:
             return result
 
+    def parse_incremental(self, method, reader):
+        try:
+            if method.payload_type is None: return []
+            model = getattr(self.factory(method), method.payload_type)
+        except AttributeError:
+            raise TweepError('No model for this payload type: %s' % method.payload_type)
+
+        return self.parse_items(method.api, model,
+                scoped_identity_map(method.identity_map), reader)
+
+    def parse_items(self, api, model, identity_map, items):
+        for json in items:
+            previous = activate_identity_map(identity_map)
+            try:
+                result = model.parse(api, json)
+            finally:
+                activate_identity_map(previous)
+            yield result
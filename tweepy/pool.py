@@ -0,0 +1,196 @@
+# Tweepy
+# Copyright 2009-2010 Joshua Roesslein
+# See LICENSE for details.
+
+import httplib
+import socket
+import select
+import threading
+import time
+
+from tweepy.transport import Transport
+
+
+class ConnectionPool(Transport):
+    """Thread-safe pool of persistent HTTP/1.1 connections,
+    the default transport."""
+
+    # Methods resent on a fresh connection if a reused one fails
+    # after the request went out, like RetryPolicy.idempotent_methods
+    idempotent_methods = ('GET', 'HEAD')
+
+    def __init__(self, max_size=10, idle_timeout=60):
+        """Initialize the pool
+            max_size: max number of idle connections kept per (scheme, host)
+            idle_timeout: seconds an idle connection may be kept around
+        """
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self._idle = {}
+        self.lock = threading.Lock()
+
+    def __getstate__(self):
+        # pickle, open sockets are never carried along
+        return {'max_size': self.max_size, 'idle_timeout': self.idle_timeout}
+
+    def __setstate__(self, state):
+        # unpickle
+        self.__init__(state['max_size'], state['idle_timeout'])
+
+    def _connect(self, key):
+        scheme, host = key
+        if scheme == 'https':
+            conn = httplib.HTTPSConnection(host)
+        else:
+            conn = httplib.HTTPConnection(host)
+        conn.pool_key = key
+        return conn
+
+    def _is_dead(self, conn):
+        # An idle keep-alive socket should have nothing to read.
+        # If it is readable the server has either closed it or
+        # sent garbage, in both cases we can not reuse it.
+        if conn.sock is None:
+            return True
+        try:
+            readable = select.select([conn.sock], [], [], 0)[0]
+        except (select.error, socket.error, ValueError):
+            return True
+        return len(readable) > 0
+
+    def _get_idle(self, key):
+        self.lock.acquire()
+        try:
+            idle = self._idle.get(key)
+            while idle:
+                last_used, conn = idle.pop()
+                if self.idle_timeout > 0 and (time.time() - last_used) >= self.idle_timeout:
+                    conn.close()
+                elif self._is_dead(conn):
+                    conn.close()
+                else:
+                    return conn
+            return None
+        finally:
+            self.lock.release()
+
+    def get(self, host, secure=False):
+        """Get a connection to host, reusing an idle one if possible"""
+        if secure:
+            key = ('https', host)
+        else:
+            key = ('http', host)
+        return self._get_idle(key) or self._connect(key)
+
+    def put(self, conn):
+        """Return a connection to the pool once its response has been read"""
+        # httplib drops the socket once the server announces it will
+        # close the connection, so there is nothing left to reuse.
+        if conn.sock is None:
+            return
+        self.lock.acquire()
+        try:
+            idle = self._idle.setdefault(conn.pool_key, [])
+            if len(idle) < self.max_size:
+                idle.append((time.time(), conn))
+                return
+        finally:
+            self.lock.release()
+        conn.close()
+
+    def discard(self, conn):
+        """Close a connection that failed and must not be reused"""
+        conn.close()
+
+    def request(self, host, method, url, body=None, headers=None, secure=False,
+            connect_timeout=None, read_timeout=None, trace=None):
+        """Send a request over a pooled connection.
+
+        Returns the connection and the response. The caller must read
+        the response body and then hand the connection back with put().
+        Timeouts are in seconds, None blocks until the socket is ready.
+        trace is called with 'connect' and 'send' as those complete.
+        """
+        if secure:
+            key = ('https', host)
+        else:
+            key = ('http', host)
+        headers = headers or {}
+
+        conn = self._get_idle(key)
+        if conn is not None:
+            sent = False
+            try:
+                conn.sock.settimeout(read_timeout)
+                conn.request(method, url, body, headers)
+                sent = True
+                if trace:
+                    trace('send')
+                return conn, conn.getresponse()
+            except socket.timeout:
+                self.discard(conn)
+                raise
+            except (socket.error, httplib.HTTPException):
+                # Server dropped the connection while it sat idle,
+                # fall through and retry once on a fresh one. Once
+                # sent, the server may have seen the request, so only
+                # resend if that is safe and leave the rest to the
+                # retry policy.
+                self.discard(conn)
+                if sent and method not in self.idempotent_methods:
+                    raise
+
+        conn = self._connect(key)
+        try:
+            if connect_timeout is not None:
+                conn.timeout = connect_timeout
+            conn.connect()
+            if trace:
+                trace('connect')
+            conn.sock.settimeout(read_timeout)
+            conn.request(method, url, body, headers)
+            if trace:
+                trace('send')
+            return conn, conn.getresponse()
+        except:
+            self.discard(conn)
+            raise
+
+    def count(self):
+        """Get count of idle connections currently pooled"""
+        self.lock.acquire()
+        try:
+            c = 0
+            for idle in self._idle.values():
+                c += len(idle)
+            return c
+        finally:
+            self.lock.release()
+
+    def cleanup(self):
+        """Close idle connections that timed out or died"""
+        self.lock.acquire()
+        try:
+            for key, idle in self._idle.items():
+                alive = []
+                for last_used, conn in idle:
+                    if self.idle_timeout > 0 and (time.time() - last_used) >= self.idle_timeout:
+                        conn.close()
+                    elif self._is_dead(conn):
+                        conn.close()
+                    else:
+                        alive.append((last_used, conn))
+                self._idle[key] = alive
+        finally:
+            self.lock.release()
+
+    def clear(self):
+        """Close all idle connections"""
+        self.lock.acquire()
+        try:
+            for idle in self._idle.values():
+                for last_used, conn in idle:
+                    conn.close()
+            self._idle.clear()
+        finally:
+            self.lock.release()
@@ -0,0 +1,304 @@
+# Tweepy
+# Copyright 2009-2010 Joshua Roesslein
+# See LICENSE for details.
+
+import threading
+import time
+import os
+import mmap
+import struct
+
+try:
+    import hashlib
+except ImportError:
+    # python 2.4
+    import md5 as hashlib
+
+try:
+    import fcntl
+except ImportError:
+    # Probably on a windows system
+    pass
+
+from tweepy.error import TweepError
+
+
+class RateLimiter(object):
+    """Client-side governor keeping calls within the rate limit budget.
+
+    The budget is tracked per credential and endpoint from the
+    X-RateLimit-* headers Twitter sends back. Every call also draws
+    from the credential wide budget, seeded by rate_limit_status and
+    updated by every response, and is refused once either is spent.
+    """
+
+    def __init__(self, reserve=0, blocking=True, auto_seed=True):
+        """Initialize the limiter
+            reserve: number of hits to always leave unused
+            blocking: wait for the budget to reset instead of failing
+            auto_seed: call rate_limit_status before the first request
+                       of each credential to learn the current budget
+        """
+        self.reserve = reserve
+        self.blocking = blocking
+        self.auto_seed = auto_seed
+        self._buckets = {}
+        self._seeded = set()
+        self.lock = threading.Lock()
+
+    def _lock(self):
+        self.lock.acquire()
+
+    def _unlock(self):
+        self.lock.release()
+
+    def _load(self, key):
+        return self._buckets.get(key)
+
+    def _store(self, key, bucket):
+        self._buckets[key] = bucket
+
+    def _delete(self, key):
+        del self._buckets[key]
+
+    def _find(self, credential, endpoint):
+        key = (credential, endpoint)
+        bucket = self._load(key)
+        if bucket is None:
+            key = (credential, None)
+            bucket = self._load(key)
+        return key, bucket
+
+    def _keys(self, credential, endpoint):
+        # A call draws from its endpoint budget and from the
+        # credential wide budget, which all endpoints share.
+        if endpoint is None:
+            return [(credential, None)]
+        return [(credential, endpoint), (credential, None)]
+
+    def _reserve(self, credential, endpoint):
+        # Take one hit from the budgets. Returns 0 on success,
+        # otherwise the number of seconds until a spent budget resets.
+        self._lock()
+        try:
+            now = time.time()
+            buckets = []
+            wait = 0
+            for key in self._keys(credential, endpoint):
+                bucket = self._load(key)
+                if bucket is None:
+                    continue
+                limit, remaining, reset = bucket
+                if reset <= now:
+                    # window is over, budget unknown until next response
+                    self._delete(key)
+                elif remaining > self.reserve:
+                    buckets.append((key, bucket))
+                else:
+                    wait = max(wait, reset - now)
+            if wait:
+                return wait
+            for key, (limit, remaining, reset) in buckets:
+                self._store(key, (limit, remaining - 1, reset))
+            return 0
+        finally:
+            self._unlock()
+
+    def acquire(self, credential, endpoint=None, blocking=None, timeout=None):
+        """Reserve one hit from the budget
+            credential: identity of the credentials (see AuthHandler.get_identity)
+            endpoint: endpoint path, None for the credential wide budget
+            blocking: wait for budget to reset, defaults to self.blocking
+            timeout: max seconds to wait when blocking
+        Returns True if the call may proceed.
+        """
+        if blocking is None:
+            blocking = self.blocking
+        started = time.time()
+        while True:
+            wait = self._reserve(credential, endpoint)
+            if wait <= 0:
+                return True
+            if not blocking:
+                return False
+            if timeout is not None:
+                left = started + timeout - time.time()
+                if left < wait:
+                    return False
+            time.sleep(wait)
+
+    def update(self, credential, endpoint, limit, remaining, reset):
+        """Record the budget reported by Twitter"""
+        self._lock()
+        try:
+            # the credential wide budget is what Twitter reports
+            for key in self._keys(credential, endpoint):
+                bucket = self._load(key)
+                left = remaining
+                if bucket is not None and bucket[2] == reset:
+                    # Same window, responses may arrive out of order
+                    # so never hand back hits we already reserved.
+                    left = min(remaining, bucket[1])
+                self._store(key, (limit, left, reset))
+        finally:
+            self._unlock()
+
+    def update_from_response(self, credential, endpoint, resp):
+        """Record the budget from the X-RateLimit-* response headers"""
+        limit = resp.getheader('x-ratelimit-limit')
+        remaining = resp.getheader('x-ratelimit-remaining')
+        reset = resp.getheader('x-ratelimit-reset')
+        if limit is None or remaining is None or reset is None:
+            return
+        try:
+            self.update(credential, endpoint, int(limit), int(remaining), int(reset))
+        except ValueError:
+            return
+
+    def budget(self, credential, endpoint=None):
+        """Get the current (limit, remaining, reset) budget or None if unknown"""
+        self._lock()
+        try:
+            key, bucket = self._find(credential, endpoint)
+            if bucket is None or bucket[2] <= time.time():
+                return None
+            return bucket
+        finally:
+            self._unlock()
+
+    def is_seeded(self, credential):
+        return credential in self._seeded
+
+    def seed(self, api):
+        """Learn the credential wide budget from rate_limit_status"""
+        if api.auth:
+            credential = api.auth.get_identity()
+        else:
+            credential = None
+
+        # mark first, rate_limit_status itself passes through the limiter
+        self._seeded.add(credential)
+        try:
+            status = api.rate_limit_status()
+            self.update(credential, None, int(status['hourly_limit']),
+                    int(status['remaining_hits']),
+                    int(status['reset_time_in_seconds']))
+        except (TweepError, KeyError, TypeError, ValueError):
+            # not fatal, budget will be learned from response headers
+            pass
+
+
+class SharedRateLimiter(RateLimiter):
+    """Rate limit governor shared by all processes on one machine.
+
+    Budgets live in a memory-mapped state file, one fixed-size slot per
+    credential and endpoint family. Every read-modify-write is done while
+    holding an exclusive lock on the file, so reserving a hit is atomic
+    across processes using the same file.
+    """
+
+    # slot: md5 digest of the key, then limit, remaining and reset
+    slot_format = '16sqqq'
+    slot_size = struct.calcsize(slot_format)
+    empty_digest = '\0' * 16
+
+    def __init__(self, path, slots=1024, family=None, reserve=0, blocking=True,
+            auto_seed=True):
+        """Initialize the limiter
+            path: state file, created if it does not exist yet
+            slots: max number of budgets tracked in the file
+            family: callable mapping an endpoint path to the family sharing
+                    its budget, by default every endpoint is its own family
+        """
+        RateLimiter.__init__(self, reserve, blocking, auto_seed)
+        self.path = path
+        self.slots = slots
+        self.family = family or (lambda endpoint: endpoint)
+
+        size = self.slots * self.slot_size
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0644)
+        fcntl.lockf(self._fd, fcntl.LOCK_EX)
+        try:
+            if os.fstat(self._fd).st_size < size:
+                os.ftruncate(self._fd, size)
+        finally:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN)
+        self._map = mmap.mmap(self._fd, size)
+
+    def close(self):
+        """Release the state file"""
+        self._map.close()
+        os.close(self._fd)
+
+    def _lock(self):
+        self.lock.acquire()
+        try:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX)
+        except:
+            self.lock.release()
+            raise
+
+    def _unlock(self):
+        fcntl.lockf(self._fd, fcntl.LOCK_UN)
+        self.lock.release()
+
+    def _digest(self, key):
+        credential, endpoint = key
+        if endpoint is not None:
+            endpoint = self.family(endpoint)
+        return hashlib.md5('%s\0%s' % (credential, endpoint)).digest()
+
+    def _read_slot(self, index):
+        offset = index * self.slot_size
+        return struct.unpack(self.slot_format,
+                self._map[offset:offset + self.slot_size])
+
+    def _write_slot(self, index, digest, bucket):
+        offset = index * self.slot_size
+        self._map[offset:offset + self.slot_size] = struct.pack(
+                self.slot_format, digest, *bucket)
+
+    def _probe(self, digest):
+        # Open addressing with linear probing. Returns the slot
+        # holding digest (or None) and the first reusable slot.
+        start = struct.unpack('<I', digest[:4])[0] % self.slots
+        free = None
+        now = time.time()
+        for i in range(0, self.slots):
+            index = (start + i) % self.slots
+            slot = self._read_slot(index)
+            if slot[0] == digest:
+                return index, free
+            if slot[0] == self.empty_digest:
+                if free is None:
+                    free = index
+                return None, free
+            if free is None and slot[3] <= now:
+                # expired budget of another key, may be taken over
+                free = index
+        return None, free
+
+    def _load(self, key):
+        index, free = self._probe(self._digest(key))
+        if index is None:
+            return None
+        digest, limit, remaining, reset = self._read_slot(index)
+        if reset <= 0:
+            return None
+        return limit, remaining, reset
+
+    def _store(self, key, bucket):
+        digest = self._digest(key)
+        index, free = self._probe(digest)
+        if index is None:
+            index = free
+        if index is None:
+            raise TweepError('Rate limit state file %s is full' % self.path)
+        self._write_slot(index, digest, bucket)
+
+    def _delete(self, key):
+        # keep the digest so probe chains stay intact
+        digest = self._digest(key)
+        index, free = self._probe(digest)
+        if index is not None:
+            self._write_slot(index, digest, (0, 0, 0))
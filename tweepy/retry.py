@@ -0,0 +1,106 @@
+# Tweepy
+# Copyright 2009-2010 Joshua Roesslein
+# See LICENSE for details.
+
+import random
+import time
+from rfc822 import parsedate_tz, mktime_tz
+
+
+class RetryPolicy(object):
+    """Retry a failed request a fixed number of times with a fixed delay"""
+
+    # Methods that are safe to resend when the connection failed
+    # and we can not tell whether the server saw the request.
+    idempotent_methods = ('GET', 'HEAD')
+
+    def __init__(self, retry_count=0, retry_delay=0, retry_errors=None,
+            retry_connection_errors=True):
+        """Initialize the policy
+            retry_count: max number of retries after the first attempt
+            retry_delay: number of seconds to wait between retries
+            retry_errors: which HTTP status codes to retry,
+                          if None any error status is retried
+            retry_connection_errors: retry idempotent requests that
+                                     failed before a response arrived
+        """
+        self.retry_count = retry_count
+        self.retry_delay = retry_delay
+        self.retry_errors = retry_errors
+        self.retry_connection_errors = retry_connection_errors
+
+    def should_retry(self, method, attempt, resp=None, error=None):
+        """Return True if the request should be sent again
+            method: the APIMethod being executed
+            attempt: number of retries already performed
+            resp: the response if one was received
+            error: the TweepError raised if no response was received
+        """
+        if attempt >= self.retry_count:
+            return False
+        if error is not None:
+            return self.retry_connection_errors and \
+                    method.method in self.idempotent_methods
+        if self.retry_errors:
+            return resp.status in self.retry_errors
+        # 304 answers a revalidation of a stale cache entry
+        return resp.status not in (200, 304)
+
+    def delay(self, attempt, resp=None):
+        """Return seconds to sleep before the next retry"""
+        return self.retry_delay
+
+
+class ExponentialBackoff(RetryPolicy):
+    """Retry with capped exponential backoff and full jitter.
+
+    If the response tells us when to come back, either through a
+    Retry-After header or a rate limit reset time, that is honored
+    instead of the computed backoff.
+    """
+
+    def __init__(self, retry_count=5, base_delay=1.0, max_delay=60.0,
+            retry_errors=(420, 429, 500, 502, 503, 504), jitter=True,
+            retry_connection_errors=True):
+        """Initialize the policy
+            base_delay: delay of the first retry in seconds
+            max_delay: upper bound of the computed backoff
+            jitter: pick a random delay between 0 and the backoff,
+                    so many clients do not retry in lockstep
+        """
+        RetryPolicy.__init__(self, retry_count, base_delay, retry_errors,
+                retry_connection_errors)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+
+    def delay(self, attempt, resp=None):
+        if resp is not None:
+            delay = server_delay(resp)
+            if delay is not None:
+                return delay
+
+        backoff = min(self.max_delay, self.base_delay * (2 ** attempt))
+        if self.jitter:
+            return random.uniform(0, backoff)
+        return backoff
+
+
+def server_delay(resp):
+    """Seconds the server asked us to wait before retrying, or None"""
+    retry_after = resp.getheader('retry-after')
+    if retry_after:
+        retry_after = retry_after.strip()
+        if retry_after.isdigit():
+            return int(retry_after)
+        date = parsedate_tz(retry_after)
+        if date:
+            return max(0, mktime_tz(date) - time.time())
+
+    # Only trust the rate limit reset time once the budget is spent
+    if resp.getheader('x-ratelimit-remaining') == '0':
+        reset = resp.getheader('x-ratelimit-reset')
+        if reset and reset.isdigit():
+            return max(0, int(reset) - time.time())
+
+    return None
@@ -0,0 +1,78 @@
+# Tweepy
+# Copyright 2009-2010 Joshua Roesslein
+# See LICENSE for details.
+
+import threading
+
+from tweepy.error import TweepTimeout
+
+
+class _Flight(object):
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight(object):
+    """Coalesce identical concurrent calls into one.
+
+    While a call for a key is in flight, other threads asking for the
+    same key wait for it and share its result (or error) instead of
+    running the call themselves.
+    """
+
+    def __init__(self):
+        self._flights = {}
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def do(self, key, func, timeout=None):
+        """Run func() unless a call for key is already in flight, in
+        which case wait at most timeout seconds for its result."""
+        self.lock.acquire()
+        try:
+            flight = self._flights.get(key)
+            if flight is None:
+                leader = True
+                flight = self._flights[key] = _Flight()
+                self.misses += 1
+            else:
+                leader = False
+                self.hits += 1
+        finally:
+            self.lock.release()
+
+        if not leader:
+            flight.done.wait(timeout)
+            if not flight.done.isSet():
+                raise TweepTimeout('Timed out waiting for in-flight request')
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            try:
+                flight.result = func()
+            except Exception, e:
+                flight.error = e
+                raise
+        finally:
+            self.lock.acquire()
+            del self._flights[key]
+            self.lock.release()
+            flight.done.set()
+        return flight.result
+
+    def hit_rate(self):
+        """Fraction of calls that were served by another in-flight call"""
+        total = self.hits + self.misses
+        if total == 0:
+            return 0.0
+        return float(self.hits) / total
+
+    def in_flight(self):
+        """Get count of calls currently in flight"""
+        return len(self._flights)
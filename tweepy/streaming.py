@@ -2,7 +2,6 @@
 # Copyright 2009-2010 Joshua Roesslein
 # See LICENSE for details.
 
-import httplib
 from socket import timeout
 from threading import Thread
 from time import sleep
@@ -10,19 +9,23 @@ import urllib
 
 from tweepy.auth import BasicAuthHandler
 from tweepy.models import Status
+from tweepy.identity import activate_identity_map, scoped_identity_map
 from tweepy.api import API
 from tweepy.error import TweepError
+from tweepy.compression import ACCEPT_ENCODING, Decompressor, TransferStats
+from tweepy.pool import ConnectionPool
 
-from tweepy.utils import import_simplejson
-json = import_simplejson()
+from tweepy.jsonlib import get_backend
 
 STREAM_VERSION = 1
 
 
 class StreamListener(object):
 
-    def __init__(self, api=None):
+    def __init__(self, api=None, json_lib=None, raw=False):
         self.api = api or API()
+        self.json_lib = get_backend(json_lib)
+        self.raw = raw
 
     def on_data(self, data):
         """Called when raw data is received from connection.
@@ -30,19 +33,30 @@ class StreamListener(object):
         Override this method if you wish to manually handle
         the stream data. Return False to stop stream and close connection.
         """
+        if self.raw:
+            return self.on_raw(data)
 
         if 'in_reply_to_status_id' in data:
-            status = Status.parse(self.api, json.loads(data))
+            previous = activate_identity_map(scoped_identity_map(self.api.identity_map))
+            try:
+                status = Status.parse(self.api, self.json_lib.loads(data))
+            finally:
+                activate_identity_map(previous)
             if self.on_status(status) is False:
                 return False
         elif 'delete' in data:
-            delete = json.loads(data)['delete']['status']
+            delete = self.json_lib.loads(data)['delete']['status']
             if self.on_delete(delete['id'], delete['user_id']) is False:
                 return False
         elif 'limit' in data:
-            if self.on_limit(json.loads(data)['limit']['track']) is False:
+            if self.on_limit(self.json_lib.loads(data)['limit']['track']) is False:
                 return False
 
+    def on_raw(self, payload):
+        """Called with each undecoded message instead of
+        the other callbacks if the listener was created with raw set"""
+        return
+
     def on_status(self, status):
         """Called when a new status arrives"""
         return
@@ -69,7 +83,8 @@ class Stream(object):
     host = 'stream.twitter.com'
 
     def __init__(self, username, password, listener, timeout=5.0, retry_count = None,
-                    retry_time = 10.0, snooze_time = 5.0, buffer_size=1500, headers=None):
+                    retry_time = 10.0, snooze_time = 5.0, buffer_size=1500, headers=None,
+                    compression=False, transport=None, metrics=None):
         self.auth = BasicAuthHandler(username, password)
         self.running = False
         self.timeout = timeout
@@ -81,10 +96,16 @@ class Stream(object):
         self.api = API()
         self.headers = headers or {}
         self.body = None
+        self.compression = compression
+        self.stats = TransferStats()
+        self.transport = transport or ConnectionPool()
+        self.metrics = metrics
 
     def _run(self):
         # setup
         self.auth.apply_auth(None, None, self.headers, None)
+        if self.compression:
+            self.headers['Accept-Encoding'] = ACCEPT_ENCODING
 
         # enter loop
         error_counter = 0
@@ -93,12 +114,13 @@ class Stream(object):
             if self.retry_count and error_counter > self.retry_count:
                 # quit if error count greater than retry count
                 break
+            if conn:
+                # connections are never reused after a stream
+                self.transport.discard(conn)
+                conn = None
             try:
-                conn = httplib.HTTPConnection(self.host)
-                conn.connect()
-                conn.sock.settimeout(self.timeout)
-                conn.request('POST', self.url, self.body, headers=self.headers)
-                resp = conn.getresponse()
+                conn, resp = self.transport.request(self.host, 'POST', self.url,
+                        self.body, self.headers, read_timeout=self.timeout)
                 if resp.status != 200:
                     if self.listener.on_error(resp.status) is False:
                         break
@@ -106,13 +128,18 @@ class Stream(object):
                     sleep(self.retry_time)
                 else:
                     error_counter = 0
-                    self._read_loop(resp)
+                    if self.metrics:
+                        self.metrics.stream_connected(self.url.split('?')[0])
+                    encoding = resp.getheader('content-encoding')
+                    if encoding:
+                        self._read_loop_compressed(resp, Decompressor(encoding))
+                    else:
+                        self._read_loop(resp)
             except timeout:
                 if self.listener.on_timeout() == False:
                     break
                 if self.running is False:
                     break
-                conn.close()
                 sleep(self.snooze_time)
             except Exception:
                 # any other exception is fatal, so kill loop
@@ -121,7 +148,7 @@ class Stream(object):
         # cleanup
         self.running = False
         if conn:
-            conn.close()
+            self.transport.discard(conn)
 
     def _read_loop(self, resp):
         data = ''
@@ -133,20 +160,80 @@ class Stream(object):
             length = ''
             while True:
                 c = resp.read(1)
-                if c == '\n':
+                if c == '\n' or c == '':
                     break
                 length += c
+            if c == '':
+                # connection closed
+                break
+            received = len(length) + 1
             length = length.strip()
             if length.isdigit():
                 length = int(length)
             else:
+                self.stats.add(received, received)
                 continue
 
             # read data and pass into listener
             data = resp.read(length)
-            if self.listener.on_data(data) is False:
+            received += len(data)
+            self.stats.add(received, received)
+            if self._on_data(data) is False:
                 self.running = False
 
+    def _read_chunks(self, resp):
+        # Yield body data as each HTTP chunk arrives, resp.read(amt)
+        # would block until amt bytes of compressed data are buffered.
+        while self.running and not resp.isclosed():
+            if resp.chunked:
+                line = resp.fp.readline()
+                try:
+                    size = int(line.split(';', 1)[0], 16)
+                except ValueError:
+                    break
+                if size == 0:
+                    break
+                data = resp.fp.read(size)
+                resp.fp.read(2)  # CRLF after chunk data
+            else:
+                data = resp.read(self.buffer_size)
+            if not data:
+                break
+            yield data
+
+    def _read_loop_compressed(self, resp, decoder):
+        buf = ''
+        for chunk in self._read_chunks(resp):
+            data = decoder.decompress(chunk)
+            self.stats.add(len(chunk), len(data))
+            buf += data
+            while self.running:
+                # read length
+                end = buf.find('\n')
+                if end < 0:
+                    break
+                length = buf[:end].strip()
+                if not length.isdigit():
+                    # keep-alive newline
+                    buf = buf[end + 1:]
+                    continue
+                length = int(length)
+                if len(buf) < end + 1 + length:
+                    break
+
+                # pass data into listener
+                data = buf[end + 1:end + 1 + length]
+                buf = buf[end + 1 + length:]
+                if self._on_data(data) is False:
+                    self.running = False
+            if not self.running:
+                break
+
+    def _on_data(self, data):
+        if self.metrics:
+            self.metrics.stream_message(self.url.split('?')[0], len(data))
+        return self.listener.on_data(data)
+
     def _start(self, async):
         self.running = True
         if async:
@@ -0,0 +1,316 @@
+# Tweepy
+# Copyright 2009-2010 Joshua Roesslein
+# See LICENSE for details.
+
+import httplib
+import socket
+import threading
+import time
+import os
+import cPickle as pickle
+
+from tweepy.error import TweepError
+
+
+class Transport(object):
+    """Transport interface, sends requests for API and Stream.
+
+    ConnectionPool is the default, httplib based transport.
+    """
+
+    def request(self, host, method, url, body=None, headers=None, secure=False,
+            connect_timeout=None, read_timeout=None, trace=None):
+        """Send a request and return (conn, resp).
+
+        resp behaves like an httplib.HTTPResponse. The caller reads
+        the body and then hands conn back with put(), or with discard()
+        if reading failed or the response was abandoned. If given,
+        trace is called with 'connect' once a new connection is open
+        and with 'send' once the request is sent.
+        """
+        raise NotImplementedError
+
+    def put(self, conn):
+        """Give back a connection whose response was fully read"""
+        raise NotImplementedError
+
+    def discard(self, conn):
+        """Give back a connection that must not be reused"""
+        raise NotImplementedError
+
+
+def request_key(host, method, url, body, secure):
+    # Headers are left out, they carry nonces and timestamps
+    if secure:
+        return (method, 'https', host, url, body)
+    return (method, 'http', host, url, body)
+
+
+def load_recordings(path):
+    if not os.path.exists(path):
+        return {}
+    recordings = {}
+    datafile = open(path, 'rb')
+    try:
+        # a dict written by save(), then responses appended one by one
+        while True:
+            try:
+                record = pickle.load(datafile)
+            except EOFError:
+                return recordings
+            if isinstance(record, dict):
+                for key, responses in record.items():
+                    recordings.setdefault(key, []).extend(responses)
+            else:
+                key, chunks = record
+                recordings.setdefault(key, []).append(chunks)
+    finally:
+        datafile.close()
+
+
+class _TeeFile(object):
+    """Wraps a response file, keeping a timed copy of all data read"""
+
+    def __init__(self, fp, started, chunks):
+        self.fp = fp
+        self.started = started
+        self.chunks = chunks
+
+    def _record(self, data):
+        if data:
+            elapsed = time.time() - self.started
+            # httplib reads headers a byte at a time, merge
+            # reads that happen together into one chunk.
+            if self.chunks and elapsed - self.chunks[-1][0] < 0.001:
+                self.chunks[-1] = (self.chunks[-1][0], self.chunks[-1][1] + data)
+            else:
+                self.chunks.append((elapsed, data))
+        return data
+
+    def read(self, amt=None):
+        if amt is None:
+            return self._record(self.fp.read())
+        return self._record(self.fp.read(amt))
+
+    def readline(self, limit=-1):
+        return self._record(self.fp.readline(limit))
+
+    def __getattr__(self, name):
+        return getattr(self.fp, name)
+
+
+class RecordingTransport(Transport):
+    """Sends requests through another transport and saves each
+    response, with its timing, to a file for ReplayTransport.
+
+    Responses are appended to the file as they complete, call
+    close() once done recording.
+    """
+
+    def __init__(self, path, transport=None):
+        """Initialize the transport
+            path: file the recordings are saved to, recordings
+                  already in it are kept
+            transport: transport that sends the requests,
+                       a ConnectionPool if None
+        """
+        if transport is None:
+            from tweepy.pool import ConnectionPool
+            transport = ConnectionPool()
+        self.path = path
+        self.transport = transport
+        self.recordings = load_recordings(path)
+        self.datafile = None
+        self._active = {}
+        self.lock = threading.Lock()
+
+    def request(self, host, method, url, body=None, headers=None, secure=False,
+            connect_timeout=None, read_timeout=None, trace=None):
+        started = time.time()
+        conn, resp = self.transport.request(host, method, url, body, headers,
+                secure, connect_timeout, read_timeout, trace)
+
+        # Status line and headers were already consumed,
+        # rebuild them and record the body as it is read.
+        if resp.version == 10:
+            version = 'HTTP/1.0'
+        else:
+            version = 'HTTP/1.1'
+        head = '%s %i %s\r\n%s\r\n' % (version, resp.status, resp.reason,
+                ''.join(resp.msg.headers))
+        chunks = [(time.time() - started, head)]
+        resp.fp = _TeeFile(resp.fp, started, chunks)
+
+        self.lock.acquire()
+        self._active[id(conn)] = (request_key(host, method, url, body, secure), chunks)
+        self.lock.release()
+        return conn, resp
+
+    def _finish(self, conn):
+        self.lock.acquire()
+        try:
+            recording = self._active.pop(id(conn), None)
+            if recording is None:
+                return
+            key, chunks = recording
+            self.recordings.setdefault(key, []).append(chunks)
+            if self.datafile is None:
+                self.datafile = open(self.path, 'ab')
+            pickle.dump(recording, self.datafile, pickle.HIGHEST_PROTOCOL)
+            self.datafile.flush()
+        finally:
+            self.lock.release()
+
+    def put(self, conn):
+        self._finish(conn)
+        self.transport.put(conn)
+
+    def discard(self, conn):
+        self._finish(conn)
+        self.transport.discard(conn)
+
+    def save(self):
+        """Rewrite the file with all recordings at once"""
+        self.lock.acquire()
+        try:
+            self._close()
+            datafile = open(self.path, 'wb')
+            try:
+                pickle.dump(self.recordings, datafile, pickle.HIGHEST_PROTOCOL)
+            finally:
+                datafile.close()
+        finally:
+            self.lock.release()
+
+    def _close(self):
+        if self.datafile is not None:
+            self.datafile.close()
+            self.datafile = None
+
+    def close(self):
+        """Close the file, recording more reopens it"""
+        self.lock.acquire()
+        try:
+            self._close()
+        finally:
+            self.lock.release()
+
+
+class _ReplayFile(object):
+    """File over recorded response data, optionally paced
+    to arrive with the recorded latencies."""
+
+    def __init__(self, chunks, realtime, timeout):
+        self.chunks = chunks
+        self.realtime = realtime
+        self.timeout = timeout
+        self.started = time.time()
+        self.index = 0
+        self.buf = ''
+
+    def _fill(self):
+        if self.index >= len(self.chunks):
+            return False
+        elapsed, data = self.chunks[self.index]
+        if self.realtime:
+            wait = elapsed - (time.time() - self.started)
+            if wait > 0:
+                if self.timeout is not None and wait > self.timeout:
+                    time.sleep(self.timeout)
+                    raise socket.timeout('timed out')
+                time.sleep(wait)
+        self.index += 1
+        self.buf += data
+        return True
+
+    def read(self, amt=None):
+        if amt is None or amt < 0:
+            while self._fill():
+                pass
+            amt = len(self.buf)
+        else:
+            while len(self.buf) < amt and self._fill():
+                pass
+        data = self.buf[:amt]
+        self.buf = self.buf[amt:]
+        return data
+
+    def readline(self, limit=-1):
+        while '\n' not in self.buf and self._fill():
+            pass
+        end = self.buf.find('\n') + 1
+        if end == 0:
+            end = len(self.buf)
+        if limit >= 0:
+            end = min(end, limit)
+        data = self.buf[:end]
+        self.buf = self.buf[end:]
+        return data
+
+    def close(self):
+        pass
+
+
+class _ReplaySocket(object):
+
+    def __init__(self, chunks, realtime, timeout):
+        self.chunks = chunks
+        self.realtime = realtime
+        self.timeout = timeout
+
+    def makefile(self, mode='rb', bufsize=-1):
+        return _ReplayFile(self.chunks, self.realtime, self.timeout)
+
+    def close(self):
+        pass
+
+
+class ReplayTransport(Transport):
+    """Serves responses saved by RecordingTransport without touching
+    the network. Requests are matched on method, scheme, host, url and
+    body, repeated requests get the recorded responses in order.
+    """
+
+    def __init__(self, path, realtime=False):
+        """Initialize the transport
+            path: file holding the recordings
+            realtime: if True responses arrive with the recorded
+                      latencies, else as fast as they can be read
+        """
+        self.path = path
+        self.realtime = realtime
+        self.recordings = load_recordings(path)
+        self._next = {}
+        self.lock = threading.Lock()
+
+    def request(self, host, method, url, body=None, headers=None, secure=False,
+            connect_timeout=None, read_timeout=None, trace=None):
+        key = request_key(host, method, url, body, secure)
+        self.lock.acquire()
+        try:
+            recordings = self.recordings.get(key)
+            if not recordings:
+                raise TweepError('No recorded response for %s %s%s' % (method, host, url))
+            # keep serving the last response once all were replayed
+            index = self._next.get(key, 0)
+            self._next[key] = index + 1
+            chunks = recordings[min(index, len(recordings) - 1)]
+        finally:
+            self.lock.release()
+
+        conn = _ReplaySocket(chunks, self.realtime, read_timeout)
+        resp = httplib.HTTPResponse(conn, method=method)
+        resp.begin()
+        return conn, resp
+
+    def put(self, conn):
+        pass
+
+    def discard(self, conn):
+        pass
+
+    def rewind(self):
+        """Start replaying every request from its first response again"""
+        self.lock.acquire()
+        self._next.clear()
+        self.lock.release()
@@ -3,21 +3,48 @@
 # See LICENSE for details.
 
 from datetime import datetime
-import time
 import htmlentitydefs
 import re
-import locale
 
 
-def parse_datetime(string):
-    # Set locale for date parsing
-    locale.setlocale(locale.LC_TIME, 'C')
+MONTHS = {
+    'Jan': 1, 'Feb': 2, 'Mar': 3, 'Apr': 4, 'May': 5, 'Jun': 6,
+    'Jul': 7, 'Aug': 8, 'Sep': 9, 'Oct': 10, 'Nov': 11, 'Dec': 12
+}
+
+# Parsed timestamps by string, statuses of a page share a few
+# user creation dates and often seconds. Cleared when full.
+DATETIME_CACHE_SIZE = 4096
+_datetime_cache = {}
+_search_datetime_cache = {}
+
+
+def make_datetime(year, month, day, clock):
+    hour, minute, second = clock.split(':')
+    return datetime(int(year), MONTHS[month], int(day),
+            int(hour), int(minute), int(second))
+
+
+def cache_datetime(cache, string, date):
+    # dict operations are atomic, no lock needed
+    if len(cache) >= DATETIME_CACHE_SIZE:
+        cache.clear()
+    cache[string] = date
 
-    # We must parse datetime this way to work in python 2.4
-    date = datetime(*(time.strptime(string, '%a %b %d %H:%M:%S +0000 %Y')[0:6]))
 
-    # Reset locale back to the default setting
-    locale.setlocale(locale.LC_TIME, '')
+def parse_datetime(string):
+    # Wed Aug 25 18:27:03 +0000 2010, parsed by hand since strptime
+    # needs the C locale and switching it is slow and not thread-safe
+    date = _datetime_cache.get(string)
+    if date is None:
+        try:
+            weekday, month, day, clock, offset, year = string.split(' ')
+            if offset != '+0000':
+                raise ValueError
+            date = make_datetime(year, month, day, clock)
+        except (ValueError, KeyError):
+            raise ValueError('time data %r does not match the Twitter date format' % string)
+        cache_datetime(_datetime_cache, string, date)
     return date
 
 
@@ -34,14 +61,17 @@ def parse_a_href(atag):
 
 
 def parse_search_datetime(string):
-    # Set locale for date parsing
-    locale.setlocale(locale.LC_TIME, 'C')
-
-    # We must parse datetime this way to work in python 2.4
-    date = datetime(*(time.strptime(string, '%a, %d %b %Y %H:%M:%S +0000')[0:6]))
-
-    # Reset locale back to the default setting
-    locale.setlocale(locale.LC_TIME, '')
+    # Wed, 25 Aug 2010 18:27:03 +0000
+    date = _search_datetime_cache.get(string)
+    if date is None:
+        try:
+            weekday, day, month, year, clock, offset = string.split(' ')
+            if offset != '+0000':
+                raise ValueError
+            date = make_datetime(year, month, day, clock)
+        except (ValueError, KeyError):
+            raise ValueError('time data %r does not match the search date format' % string)
+        cache_datetime(_search_datetime_cache, string, date)
     return date
 
 
@@ -96,3 +126,15 @@ def list_to_csv(item_list):
     if item_list:
         return ','.join([str(i) for i in item_list])
 
+def unique_list(item_list):
+    """Drop duplicates from item_list keeping first occurrence order.
+    Items are compared case-insensitively as strings, like screen names."""
+    seen = set()
+    result = []
+    for item in item_list or []:
+        key = str(item).lower()
+        if key not in seen:
+            seen.add(key)
+            result.append(item)
+    return result
+